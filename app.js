@@ -259,8 +259,8 @@ function handleFileUpload() {
   if (!file) return;
 
   const fileExt = file.name.split('.').pop().toLowerCase();
-  if (!['xlsx', 'xls', 'xml'].includes(fileExt)) {
-    alert('Пожалуйста, выберите файл Excel (.xlsx, .xls) или XML');
+  if (!['xlsx', 'xls', 'xml', 'mxl'].includes(fileExt)) {
+    alert('Пожалуйста, выберите файл Excel (.xlsx, .xls), 1С (.mxl) или XML');
     return;
   }
 
@@ -389,6 +389,17 @@ socket.on('progress_update', (data) => {
     return;
   }
   
+  // Partial results of a running analysis
+  if (data.delta) {
+    applyDelta(data.delta);
+  }
+  
+  // Events without progress only update the message
+  if (data.progress === undefined) {
+    progressText.textContent = data.message;
+    return;
+  }
+  
   const progress = data.progress || 0;
   progressFill.style.width = `${progress}%`;
   progressText.textContent = `${data.message} (${Math.round(progress)}%)`;
@@ -403,6 +414,80 @@ socket.on('progress_update', (data) => {
   }
 });
 
+// Results streamed during analysis: product id -> {product, matches}
+const liveResults = {
+  byProduct: {},
+  renderPending: false
+};
+
+function resetLiveResults() {
+  liveResults.byProduct = {};
+  appState.results = [];
+}
+
+// Convert a match from the server (MatchResult.to_dict) to a results row
+function matchToRow(match) {
+  return {
+    site: match.marketplace || '',
+    title: match.scraped_product_title || '',
+    price: match.price_scraped || 0,
+    url: match.url || '',
+    similarity: Math.round((match.similarity_score || 0) * 100)
+  };
+}
+
+function ensureLiveProduct(product) {
+  const productId = product.id || product.name || '';
+  if (!liveResults.byProduct[productId]) {
+    liveResults.byProduct[productId] = {
+      product: {
+        name: product.name || '',
+        article: product.id || '',
+        price: product.price || 0,
+        stock: product.stock || 0
+      },
+      matches: []
+    };
+  }
+  return liveResults.byProduct[productId];
+}
+
+function applyDelta(delta) {
+  if (delta.type === 'site_result') {
+    (delta.members || []).forEach(ensureLiveProduct);
+  } else if (delta.type === 'match') {
+    (delta.matches || []).forEach(match => {
+      const entry = ensureLiveProduct({
+        id: match.product_1c_id,
+        name: match.product_1c_name,
+        price: match.price_1c
+      });
+      const row = matchToRow(match);
+      if (!entry.matches.some(m => m.url === row.url && m.site === row.site)) {
+        entry.matches.push(row);
+      }
+    });
+  } else {
+    return;
+  }
+  scheduleLiveRender();
+}
+
+// Render at most once per frame - deltas arrive in bursts
+function scheduleLiveRender() {
+  if (liveResults.renderPending) return;
+  liveResults.renderPending = true;
+  requestAnimationFrame(() => {
+    liveResults.renderPending = false;
+    appState.results = Object.values(liveResults.byProduct);
+    if (stepResults.style.display !== 'block') {
+      stepResults.style.display = 'block';
+      updateSiteFilter();
+    }
+    renderResults();
+  });
+}
+
 // Parse XML (simplified - in real app would parse actual CommerceML)
 function parseXML(xmlString) {
   // This function is not used in the current implementation
@@ -548,6 +633,7 @@ async function runAnalysis() {
     if (progressContainer) progressContainer.style.display = 'block';
     if (progressFill) progressFill.style.width = '0%';
     if (progressText) progressText.textContent = 'Начало анализа...';
+    resetLiveResults();
     
     const threshold = parseFloat(document.getElementById('thresholdSlider').value) / 100;
     const maxProducts = parseInt(document.getElementById('maxProductsSlider').value);
@@ -617,13 +703,7 @@ async function runAnalysis() {
           };
         }
         
-        matchesByProduct[productId].matches.push({
-          site: match.marketplace || match['marketplace'] || '',
-          title: match.scraped_product_title || match['scraped_product_title'] || '',
-          price: match.price_scraped || match['price_scraped'] || 0,
-          url: match.url || match['url'] || '',
-          similarity: Math.round((match.similarity_score || match['similarity_score'] || 0) * 100)
-        });
+        matchesByProduct[productId].matches.push(matchToRow(match));
       });
       
       // Convert to array
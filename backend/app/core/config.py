@@ -36,6 +36,8 @@ class Settings(BaseSettings):
     redis_url: str = ""
     celery_broker_url: str | None = None
     celery_result_backend: str | None = None
+    # Route (query, site) scrape subtasks to per-site queues "scrape.<site>"
+    scrape_site_queues: bool = False
 
     google_credentials: str = ""
     google_service_account_email: str = ""
@@ -15,6 +15,7 @@ class TaskCreateRequest(BaseModel):
 
 class ParseTaskPayload(BaseModel):
     query: str
+    queries: list[str] | None = None
     marketplaces: list[str] | None = None
     max_products: int = Field(50, ge=1, le=1000)
 
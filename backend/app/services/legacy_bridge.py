@@ -1,3 +1,4 @@
+import os
 from typing import Any, Dict, List, Optional
 
 from ..core.logging import get_logger
@@ -10,7 +11,7 @@ except ImportError:
     Improved1CParser = None
 
 try:
-    from commerceml_parser import CommerceMLParser
+    from commerceml_parser import CommerceMLParser, find_offers_file
 except ImportError:
     CommerceMLParser = None
 
@@ -21,6 +22,7 @@ except ImportError:
 
 try:
     from scrapers.scraper_manager import ScraperManager
+    from scrapers.driver_factory import get_driver_factory
 except ImportError:
     ScraperManager = None
 
@@ -31,6 +33,19 @@ class LegacyBridge:
     def __init__(self):
         self.scraper_manager = ScraperManager(headless=True) if ScraperManager else None
 
+    def isolate_browser_profiles(self) -> None:
+        """Per-process Chrome profiles: Chrome refuses a profile already open in another process."""
+        if not self.scraper_manager:
+            return
+        try:
+            from billiard import current_process
+            worker = f"worker-{current_process().index}"
+        except (ImportError, AttributeError):
+            worker = f"worker-{os.getpid()}"
+        factory = get_driver_factory()
+        factory.profiles_dir = factory.profiles_dir / worker
+        logger.info("Chrome profiles for this process: %s", factory.profiles_dir)
+
     def parse_1c(self, file_path: str) -> List[Dict[str, Any]]:
         if not Improved1CParser:
             raise RuntimeError("parse_1c_improved module недоступен.")
@@ -41,7 +56,7 @@ class LegacyBridge:
         if not CommerceMLParser:
             raise RuntimeError("commerceml_parser module недоступен.")
         parser = CommerceMLParser()
-        products = parser.parse_file(file_path)
+        products = parser.parse_file(file_path, find_offers_file(file_path))
         return [
             product.__dict__ if hasattr(product, "__dict__") else product
             for product in products
@@ -66,3 +81,27 @@ class LegacyBridge:
         )
         return {site: [item.to_dict() for item in items] for site, items in results.items()}
 
+    def resolve_marketplaces(self, marketplaces: Optional[List[str]] = None) -> List[str]:
+        """Canonical site keys for the requested marketplaces (all supported if None)."""
+        if not self.scraper_manager:
+            raise RuntimeError("scraper_manager module недоступен.")
+        return self.scraper_manager.resolve_sites(marketplaces)
+
+    def scrape_site(self, query: str, site: str, max_products: int = 50) -> List[Dict[str, Any]]:
+        """Single (query, site) search; the worker's browser for the site stays warm."""
+        if not self.scraper_manager:
+            raise RuntimeError("scraper_manager module недоступен.")
+        # Each subtask is its own run: no queue or attempt counters left over from earlier ones
+        self.scraper_manager.reset_deferred()
+        items = self.scraper_manager.search(site, query, max_products)
+        if not items and len(self.scraper_manager.deferred):
+            # Captcha: retry only this (site, query) with a fresh session
+            retried = self.scraper_manager.retry_deferred(site, query)
+            items = next(iter(retried.values()), [])
+        self.scraper_manager.flush_stats()
+        reason = self.scraper_manager.failure_reason(site, query)
+        if not items and reason:
+            # Empty list from a skipped/blocked/failed search is not "nothing found"
+            raise RuntimeError(f"{site}: {reason}")
+        return [item.to_dict() for item in items]
+
@@ -3,11 +3,13 @@ import json
 import uuid
 from datetime import datetime, timedelta, timezone
 
-from celery import states
+from celery import chord, group, states
 from celery.schedules import crontab
+from celery.signals import worker_process_init
 from sqlalchemy import select
 
 from ..clients.redis_client import get_redis_client
+from ..core.config import settings
 from ..core.logging import get_logger
 from ..db.session import AsyncSessionLocal
 from ..models import ArchivedTask, ParsingTask, TaskLog, UploadedFile
@@ -32,6 +34,14 @@ bridge = LegacyBridge()
 google_service = GoogleSheetsService()
 
 
+@worker_process_init.connect
+def setup_worker_process(**kwargs):
+    if not settings.scrape_site_queues:
+        # Без очередей по сайтам подзадачи одного сайта идут в разных процессах prefork,
+        # а Chrome не открывает один профиль дважды
+        bridge.isolate_browser_profiles()
+
+
 def _now():
     return datetime.now(tz=timezone.utc)
 
@@ -80,10 +90,9 @@ async def _execute(task_id: uuid.UUID, task_type: TaskType, payload: dict):
     result_data = {}
     try:
         if task_type == TaskType.PARSE_MARKETPLACE:
-            query = payload.get("query")
-            marketplaces = payload.get("marketplaces")
-            scraped = bridge.scrape_marketplace(query, marketplaces)
-            result_data = {"marketplaces": scraped}
+            # Задачу завершит finalize_marketplace, когда отработают все подзадачи
+            await _dispatch_marketplace(task_id, payload)
+            return
         elif task_type == TaskType.IMPORT_COMMERCEML:
             file_path = payload["file_path"]
             result_data = {"products": bridge.parse_commerceml(file_path)}
@@ -105,30 +114,128 @@ async def _execute(task_id: uuid.UUID, task_type: TaskType, payload: dict):
         else:
             raise ValueError(f"Неизвестный тип задачи: {task_type}")
 
-        await _update_task(
-            task_id,
-            status=TaskStatus.COMPLETED,
-            progress_percentage=100,
-            completed_at=_now(),
-            result_data=result_data,
-            error_message=None,
-        )
-        await _publish_progress(task_id, TaskStatus.COMPLETED, 100, {"result": result_data})
-        await _log_task(task_id, "Задача успешно завершена.")
+        await _complete_task(task_id, result_data)
     except Exception as exc:
         logger.exception("Task %s failed: %s", task_id, exc)
-        await _update_task(
-            task_id,
-            status=TaskStatus.FAILED,
-            progress_percentage=100,
-            completed_at=_now(),
-            error_message=str(exc),
-        )
-        await _publish_progress(task_id, TaskStatus.FAILED, 100, {"error": str(exc)})
-        await _log_task(task_id, f"Ошибка выполнения: {exc}", level="ERROR")
+        await _fail_task(task_id, exc)
         raise
 
 
+async def _complete_task(task_id: uuid.UUID, result_data: dict) -> None:
+    await _update_task(
+        task_id,
+        status=TaskStatus.COMPLETED,
+        progress_percentage=100,
+        completed_at=_now(),
+        result_data=result_data,
+        error_message=None,
+    )
+    await _publish_progress(task_id, TaskStatus.COMPLETED, 100, {"result": result_data})
+    await _log_task(task_id, "Задача успешно завершена.")
+
+
+async def _fail_task(task_id: uuid.UUID, exc: Exception) -> None:
+    await _update_task(
+        task_id,
+        status=TaskStatus.FAILED,
+        progress_percentage=100,
+        completed_at=_now(),
+        error_message=str(exc),
+    )
+    await _publish_progress(task_id, TaskStatus.FAILED, 100, {"error": str(exc)})
+    await _log_task(task_id, f"Ошибка выполнения: {exc}", level="ERROR")
+
+
+def _marketplace_queries(payload: dict) -> list[str]:
+    queries = payload.get("queries") or [payload.get("query")]
+    return [query for query in dict.fromkeys(queries) if query]
+
+
+async def _dispatch_marketplace(task_id: uuid.UUID, payload: dict) -> None:
+    """Fan out PARSE_MARKETPLACE into one scrape_site subtask per (query, site)."""
+    queries = _marketplace_queries(payload)
+    sites = bridge.resolve_marketplaces(payload.get("marketplaces"))
+    if not queries or not sites:
+        raise ValueError("Нет запросов или площадок для парсинга.")
+    max_products = payload.get("max_products", 50)
+
+    subtasks = []
+    for query in queries:
+        for site in sites:
+            signature = scrape_site.s(str(task_id), query, site, max_products)
+            if settings.scrape_site_queues:
+                # Worker, слушающий scrape.<site>, держит прогретый браузер этого сайта
+                signature = signature.set(queue=f"scrape.{site}")
+            subtasks.append(signature)
+
+    redis = get_redis_client()
+    await redis.hset(
+        f"task:{task_id}", mapping={"subtasks_total": len(subtasks), "subtasks_done": 0}
+    )
+    callback = finalize_marketplace.s(str(task_id))
+    # Упавшая подзадача не дает chord вызвать finalize - задачу закрывает errback
+    callback.link_error(fail_marketplace.s(str(task_id)))
+    chord(group(subtasks))(callback)
+    await _log_task(
+        task_id,
+        f"Парсинг разбит на {len(subtasks)} подзадач "
+        f"({len(queries)} запросов × {len(sites)} площадок).",
+    )
+
+
+async def _scrape_site(task_id: uuid.UUID, query: str, site: str, max_products: int) -> dict:
+    entry = {"query": query, "site": site, "products": [], "error": None}
+    try:
+        entry["products"] = bridge.scrape_site(query, site, max_products)
+    except Exception as exc:
+        # Ошибка одной площадки не должна ронять весь chord
+        logger.exception("Subtask %s/%s for task %s failed: %s", site, query, task_id, exc)
+        entry["error"] = str(exc)
+        await _log_task(task_id, f"{site}: ошибка парсинга «{query}»: {exc}", level="WARNING")
+
+    redis = get_redis_client()
+    key = f"task:{task_id}"
+    done = await redis.hincrby(key, "subtasks_done", 1)
+    total = int(await redis.hget(key, "subtasks_total") or done)
+    progress = 5 + int(90 * done / max(total, 1))
+    await _update_task(task_id, progress_percentage=progress)
+    await _publish_progress(
+        task_id,
+        TaskStatus.PROCESSING,
+        progress,
+        {"site": site, "query": query, "found": len(entry["products"]), "completed": done, "total": total},
+    )
+    return entry
+
+
+def _aggregate_marketplace(results: list[dict]) -> dict:
+    marketplaces: dict[str, list] = {}
+    queries: dict[str, dict[str, int]] = {}
+    failed = []
+    for entry in results:
+        items = marketplaces.setdefault(entry["site"], [])
+        items.extend({**product, "query": entry["query"]} for product in entry["products"])
+        queries.setdefault(entry["query"], {})[entry["site"]] = len(entry["products"])
+        if entry.get("error"):
+            failed.append({"query": entry["query"], "site": entry["site"], "error": entry["error"]})
+    return {"marketplaces": marketplaces, "queries": queries, "failed_subtasks": failed}
+
+
+async def _fail_marketplace(task_id: uuid.UUID, exc: Exception) -> None:
+    task = await _get_task(task_id)
+    if task.status in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+        return
+    await _fail_task(task_id, exc)
+
+
+async def _finalize_marketplace(task_id: uuid.UUID, results: list[dict]) -> None:
+    result_data = _aggregate_marketplace(results)
+    if results and len(result_data["failed_subtasks"]) == len(results):
+        await _fail_task(task_id, RuntimeError("Все подзадачи парсинга завершились ошибкой."))
+        return
+    await _complete_task(task_id, result_data)
+
+
 async def _get_task(task_id: uuid.UUID) -> ParsingTask:
     async with AsyncSessionLocal() as session:
         task = await session.get(ParsingTask, task_id)
@@ -195,3 +302,18 @@ def process_task(self, task_id: str, task_type: str, payload: dict):
     self.update_state(state=states.STARTED, meta={"task_id": task_id})
     asyncio.run(_execute(uuid.UUID(task_id), TaskType(task_type), payload))
 
+
+@celery_app.task(name="app.workers.tasks.scrape_site")
+def scrape_site(task_id: str, query: str, site: str, max_products: int = 50) -> dict:
+    return asyncio.run(_scrape_site(uuid.UUID(task_id), query, site, max_products))
+
+
+@celery_app.task(name="app.workers.tasks.finalize_marketplace")
+def finalize_marketplace(results: list, task_id: str):
+    asyncio.run(_finalize_marketplace(uuid.UUID(task_id), results))
+
+
+@celery_app.task(name="app.workers.tasks.fail_marketplace")
+def fail_marketplace(request, exc, traceback, task_id: str):
+    logger.error("Marketplace task %s failed in subtask %s: %s", task_id, request.id, exc)
+    asyncio.run(_fail_marketplace(uuid.UUID(task_id), exc))
@@ -0,0 +1,102 @@
+"""
+Бенчмарк чтения выгрузок 1С
+
+Сравнивает источники строк для Improved1CParser на одних и тех же данных:
+время разбора (медиана по повторам), пиковую память Python и число товаров.
+
+    python benchmark_1c.py Ostatki7noyabrya.mxl "Ostatki7noyabrya (1).mxl.xlsx" --repeat 5
+
+Замер (--repeat 3, pandas 3.0, openpyxl 3.1; товары у всех способов совпадают):
+
+    Файл                              Способ             сек    пик МБ   товаров
+    Ostatki7noyabrya.mxl              mxl              0.123       8.0      1561
+    Ostatki7noyabrya (1).mxl.xlsx     xlsx-stream      1.198       8.3      1561
+    Ostatki7noyabrya (1).mxl.xlsx     xlsx-pandas      1.541      12.2      1561
+    Snegokhodka10noyabr.mxl.xlsx      xlsx-stream      0.087       0.9        71
+    Snegokhodka10noyabr.mxl.xlsx      xlsx-pandas      0.092       1.0        71
+"""
+
+import argparse
+import logging
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from parse_1c_improved import Improved1CParser, OPENPYXL_AVAILABLE, PANDAS_AVAILABLE
+from mxl_reader import iter_mxl_rows
+
+
+def pandas_rows(parser: Improved1CParser, path: str) -> Iterable:
+    """Весь лист в DataFrame, затем столбец A"""
+    import pandas as pd
+    df = pd.read_excel(path, header=None)
+    return df.iloc[parser.HEADER_ROWS:, 0].tolist()
+
+
+def xlsx_stream_rows(parser: Improved1CParser, path: str) -> Iterable:
+    """Столбец A потоком через openpyxl read_only"""
+    return parser.iter_xlsx_rows(path)
+
+
+def mxl_rows(parser: Improved1CParser, path: str) -> Iterable:
+    """Текст MOXCEL потоком"""
+    return iter_mxl_rows(path, skip_rows=parser.HEADER_ROWS)
+
+
+def readers_for(path: str) -> List[Tuple[str, Callable]]:
+    """Доступные способы чтения файла"""
+    if Path(path).suffix.lower() == '.mxl':
+        return [('mxl', mxl_rows)]
+    readers = []
+    if OPENPYXL_AVAILABLE:
+        readers.append(('xlsx-stream', xlsx_stream_rows))
+    if PANDAS_AVAILABLE:
+        readers.append(('xlsx-pandas', pandas_rows))
+    return readers
+
+
+def measure(reader: Callable, path: str, repeat: int) -> Dict:
+    """Медиана времени, пиковая память (отдельный прогон) и число товаров"""
+    times = []
+    products = []
+    for _ in range(repeat):
+        parser = Improved1CParser()
+        start = time.perf_counter()
+        products = parser.parse_rows(reader(parser, path))
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    parser = Improved1CParser()
+    parser.parse_rows(reader(parser, path))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'seconds': statistics.median(times), 'peak_mb': peak / 1024 / 1024, 'products': len(products)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк чтения выгрузок 1С')
+    parser.add_argument('files', nargs='+', help='файлы .mxl и .xlsx')
+    parser.add_argument('--repeat', type=int, default=3, help='повторов каждого замера')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"{'Файл':<34}{'Способ':<14}{'сек':>8}{'пик МБ':>10}{'товаров':>10}")
+    for path in args.files:
+        readers = readers_for(path)
+        if not readers:
+            print(f"{Path(path).name[:32]:<34}⚠️ нет доступного способа чтения (нужен pandas/openpyxl)")
+            continue
+        for name, reader in readers:
+            result = measure(reader, path, args.repeat)
+            print(
+                f"{Path(path).name[:32]:<34}{name:<14}{result['seconds']:>8.3f}"
+                f"{result['peak_mb']:>10.1f}{result['products']:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,26 @@
 """
 Парсер CommerceML для системы конкурентного анализа
 Поддерживает CommerceML 2.x и 3.x форматы
+
+Выгрузки import.xml из 1С бывают на сотни мегабайт, поэтому документ читается
+потоково (iterparse): группы берутся из Классификатора, товары отдаются по мере
+закрытия элементов Товар, разобранные элементы сразу удаляются из дерева.
+
+    for product in CommerceMLParser().iter_products('import.xml'):
+        ...
+
+В обмене CommerceML 2.x цены и остатки лежат в отдельном offers.xml
+(ПакетПредложений/Предложения/Предложение). Его можно передать вторым файлом:
+предложения индексируются словарем по Ид товара (часть Ид до '#'), и каждый
+товар import.xml получает свои предложения одним поиском в словаре.
+Предложение с Ид вида "товар#характеристика" дает отдельный товар-вариант.
+
+    parser.iter_products('import.xml', offers_path='offers.xml')
 """
 
 import xml.etree.ElementTree as ET
-from dataclasses import dataclass
-from typing import List, Dict, Optional
+from dataclasses import asdict, dataclass, field, replace
+from typing import Iterator, List, Dict, Optional, Tuple
 import re
 from pathlib import Path
 
@@ -29,6 +44,36 @@ class Product:
         if self.characteristics is None:
             self.characteristics = {}
 
+    def to_dict(self) -> Dict:
+        """Словарь в формате товаров 1С системы анализа"""
+        data = asdict(self)
+        data['source'] = '1C'
+        return data
+
+@dataclass
+class Offer:
+    """Предложение из offers.xml: цена и остаток товара или его характеристики"""
+    id: str
+    name: str = ""
+    price: float = 0.0
+    stock: Optional[int] = None
+    characteristics: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def product_id(self) -> str:
+        """Ид товара без характеристики"""
+        return self.id.partition('#')[0]
+
+
+def find_offers_file(import_path: str) -> Optional[str]:
+    """offers.xml из того же обмена, что и import.xml (import0_1.xml -> offers0_1.xml)"""
+    path = Path(import_path)
+    if 'import' not in path.name:
+        return None
+    offers_path = path.with_name(path.name.replace('import', 'offers', 1))
+    return str(offers_path) if offers_path.exists() else None
+
+
 class CommerceMLParser:
     """Универсальный парсер CommerceML файлов"""
 
@@ -37,22 +82,79 @@ class CommerceMLParser:
         self.groups = {}
         self.products = []
 
-    def parse_file(self, file_path: str) -> List[Product]:
-        """Парсинг XML файла CommerceML"""
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-
-        # Определяем namespace
-        self.namespace = self._extract_namespace(root)
-
-        # Сначала парсим группы
-        self._parse_groups(root)
-
-        # Затем парсим товары
-        self._parse_products(root)
+    # Пути от корня документа до разбираемых элементов
+    IMPORT_PATHS = {('Классификатор',), ('Каталог', 'Товары', 'Товар')}
+    OFFERS_PATHS = {('ПакетПредложений', 'Предложения', 'Предложение')}
 
+    def parse_file(self, file_path: str, offers_path: Optional[str] = None) -> List[Product]:
+        """Парсинг XML файла CommerceML (и offers.xml того же обмена, если передан)"""
+        self.products.extend(self.iter_products(file_path, offers_path))
         return self.products
 
+    def iter_products(self, file_path: str, offers_path: Optional[str] = None) -> Iterator[Product]:
+        """
+        Потоковый парсинг: товары отдаются по мере чтения файла
+
+        Группы разрешаются по Классификатору, который в выгрузке идет перед
+        Каталогом. Разобранные Товар и Классификатор удаляются из дерева,
+        так что память не растет с размером каталога.
+
+        Args:
+            file_path: import.xml (или полная выгрузка с ценами внутри Товар)
+            offers_path: offers.xml с ценами и остатками; товар с предложениями
+                по характеристикам отдается отдельным товаром на каждую
+        """
+        offers = self.index_offers(offers_path) if offers_path else {}
+
+        for name, elem in self._iter_elements(file_path, self.IMPORT_PATHS):
+            if name == 'Классификатор':
+                self._parse_classifier(elem)
+                continue
+
+            product = self._parse_single_product(elem)
+            if not product:
+                continue
+            # pop: предложения нужны один раз, индекс по ходу освобождается
+            product_offers = self._take_offers(offers, product.id)
+            if not product_offers:
+                yield product
+                continue
+            for offer in product_offers:
+                yield self._apply_offer(product, offer)
+
+    def index_offers(self, offers_path: str) -> Dict[str, List[Offer]]:
+        """Предложения offers.xml по Ид товара: {Ид товара: [Offer, ...]}"""
+        index: Dict[str, List[Offer]] = {}
+        for _, elem in self._iter_elements(offers_path, self.OFFERS_PATHS):
+            offer = self._parse_offer(elem)
+            if offer:
+                index.setdefault(offer.product_id, []).append(offer)
+        return index
+
+    def _iter_elements(self, file_path: str, paths) -> Iterator[Tuple[str, ET.Element]]:
+        """
+        Закрытые элементы по путям от корня (имена без namespace)
+
+        После обработки вызывающим кодом элемент удаляется из дерева.
+        """
+        path: List[str] = []   # локальные имена открытых элементов
+        open_elems = []        # сами открытые элементы (для удаления из родителя)
+
+        for event, elem in ET.iterparse(file_path, events=('start', 'end')):
+            if event == 'start':
+                if not open_elems:
+                    # Определяем namespace по корню
+                    self.namespace = self._extract_namespace(elem)
+                path.append(self._local_name(elem.tag))
+                open_elems.append(elem)
+                continue
+
+            name = path.pop()
+            open_elems.pop()
+            if tuple(path[1:]) + (name,) in paths:
+                yield name, elem
+                self._release(open_elems[-1], elem)
+
     def _extract_namespace(self, root) -> Optional[str]:
         """Извлечение namespace из XML"""
         tag = root.tag
@@ -60,19 +162,28 @@ class CommerceMLParser:
             return tag.split('}')[0] + '}'
         return None
 
+    @staticmethod
+    def _local_name(tag: str) -> str:
+        """Имя тега без namespace"""
+        return tag.rpartition('}')[2]
+
+    @staticmethod
+    def _release(parent, elem):
+        """Освобождает разобранный элемент"""
+        elem.clear()
+        parent.remove(elem)
+
     def _make_tag(self, tag_name: str) -> str:
         """Создание тега с учетом namespace"""
         if self.namespace:
             return f"{self.namespace}{tag_name}"
         return tag_name
 
-    def _parse_groups(self, root):
-        """Парсинг групп товаров"""
-        classifier = root.find(self._make_tag('Классификатор'))
-        if classifier is not None:
-            groups_elem = classifier.find(self._make_tag('Группы'))
-            if groups_elem is not None:
-                self._parse_group_recursive(groups_elem, "")
+    def _parse_classifier(self, classifier):
+        """Парсинг групп товаров из Классификатора"""
+        groups_elem = classifier.find(self._make_tag('Группы'))
+        if groups_elem is not None:
+            self._parse_group_recursive(groups_elem, "")
 
     def _parse_group_recursive(self, groups_elem, parent_name: str):
         """Рекурсивный парсинг групп"""
@@ -88,17 +199,6 @@ class CommerceMLParser:
             if sub_groups is not None:
                 self._parse_group_recursive(sub_groups, full_name)
 
-    def _parse_products(self, root):
-        """Парсинг товаров"""
-        catalog = root.find(self._make_tag('Каталог'))
-        if catalog is not None:
-            products_elem = catalog.find(self._make_tag('Товары'))
-            if products_elem is not None:
-                for product_elem in products_elem.findall(self._make_tag('Товар')):
-                    product = self._parse_single_product(product_elem)
-                    if product:
-                        self.products.append(product)
-
     def _parse_single_product(self, product_elem) -> Optional[Product]:
         """Парсинг одного товара"""
         product_id = self._get_text(product_elem, 'Ид')
@@ -135,6 +235,85 @@ class CommerceMLParser:
 
         return product
 
+    def _parse_offer(self, offer_elem) -> Optional[Offer]:
+        """Парсинг одного предложения offers.xml"""
+        offer_id = self._get_text(offer_elem, 'Ид')
+        if not offer_id:
+            return None
+
+        offer = Offer(id=offer_id, name=self._get_text(offer_elem, 'Наименование'))
+        self._parse_prices(offer_elem, offer)
+
+        # Общее Количество предложения; если его нет - сумма по складам
+        quantity = self._get_text(offer_elem, 'Количество')
+        quantities = [quantity] if quantity else self._warehouse_quantities(offer_elem)
+        if quantities:
+            try:
+                offer.stock = int(sum(float(quantity) for quantity in quantities))
+            except ValueError:
+                offer.stock = 0
+
+        chars_elem = offer_elem.find(self._make_tag('ХарактеристикиТовара'))
+        if chars_elem is not None:
+            for char_elem in chars_elem.findall(self._make_tag('ХарактеристикаТовара')):
+                char_name = self._get_text(char_elem, 'Наименование')
+                char_value = self._get_text(char_elem, 'Значение')
+                if char_name and char_value:
+                    offer.characteristics[char_name] = char_value
+        return offer
+
+    def _warehouse_quantities(self, offer_elem) -> List[str]:
+        """Остатки по складам: Остатки/Остаток (2.03) и <Склад КоличествоНаСкладе=".."> (2.04+)"""
+        quantities = []
+        stock_elem = offer_elem.find(self._make_tag('Остатки'))
+        if stock_elem is not None:
+            for stock_item in stock_elem.findall(self._make_tag('Остаток')):
+                warehouse = stock_item.find(self._make_tag('Склад'))
+                quantities.append(self._get_text(stock_item, 'Количество') or
+                                  (self._get_text(warehouse, 'Количество') if warehouse is not None else ''))
+        for warehouse in offer_elem.findall(self._make_tag('Склад')):
+            quantities.append((warehouse.get('КоличествоНаСкладе') or '').strip())
+        return [quantity for quantity in quantities if quantity]
+
+    @staticmethod
+    def _take_offers(offers: Dict[str, List[Offer]], product_id: str) -> List[Offer]:
+        """
+        Забирает из индекса предложения товара
+
+        Товар import.xml с Ид вида 'товар#характеристика' получает только свое
+        предложение; предложения других характеристик остаются в индексе.
+        """
+        if product_id in offers:
+            return offers.pop(product_id)
+        base_id, separator, _ = product_id.partition('#')
+        if not separator or base_id not in offers:
+            return []
+        own = [offer for offer in offers[base_id] if offer.id == product_id]
+        rest = [offer for offer in offers[base_id] if offer.id != product_id]
+        if rest:
+            offers[base_id] = rest
+        else:
+            del offers[base_id]
+        return own
+
+    def _apply_offer(self, product: Product, offer: Offer) -> Product:
+        """Товар с ценой и остатком из предложения (вариант - для Ид с '#')"""
+        if offer.id != product.id:
+            product = replace(
+                product,
+                id=offer.id,
+                name=offer.name or product.name,
+                brand="",
+                size="",
+                characteristics={**product.characteristics, **offer.characteristics},
+            )
+        if offer.price:
+            product.price = offer.price
+        if offer.stock is not None:
+            product.stock = offer.stock
+        self._extract_brand_and_size(product)
+        return product
+
     def _parse_prices(self, product_elem, product: Product):
         """Парсинг цен товара"""
         prices_elem = product_elem.find(self._make_tag('Цены'))
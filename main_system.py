@@ -5,14 +5,20 @@
 
 import logging
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import json
 import csv
 from datetime import datetime
 
-from scrapers.scraper_manager import ScraperManager, ScrapedProduct
-from commerceml_parser import CommerceMLParser
+from scrapers.scraper_manager import ScraperManager
+from scrapers.product import to_plain, write_ndjson
+from scrapers.product_dedup import ProductDeduplicator
+from scrapers.relevance import build_reference
+from scrapers.price_history import PriceHistoryStore
+from commerceml_parser import CommerceMLParser, find_offers_file
 from product_matcher import ProductMatcher
+from query_planner import QueryPlanner
+from refresh_scheduler import RefreshScheduler
 
 logging.basicConfig(
     level=logging.INFO,
@@ -42,11 +48,22 @@ class CompetitiveAnalysisSystem:
         self.scraper_manager = ScraperManager(headless=headless)
         self.xml_parser = CommerceMLParser()
         self.matcher = ProductMatcher()
+        self.query_planner = QueryPlanner()
+        self.refresh_scheduler = RefreshScheduler(self.scraper_manager)
+        # История цен между запусками (без нее анализ работает как раньше)
+        try:
+            self.price_history = PriceHistoryStore()
+        except Exception as e:
+            self.price_history = None
+            logging.getLogger(__name__).warning(f"⚠️ История цен недоступна: {e}")
         
         # Данные
         self.products_1c = []
         self.products_1c_limited = []  # Ограниченный список для парсинга и сопоставления
         self.scraped_products = []
+        self.results_by_product = {}  # id товара 1С -> товары, найденные по его запросу
+        self.group_matches = {}  # id списка товаров группы -> (порог, размер списка, совпадения)
+        self.last_run_stats = {}  # статистика последнего парсинга (товары, пропуски и замеры по сайтам)
         self.matches = []
         
         self.logger = logging.getLogger(__name__)
@@ -69,13 +86,16 @@ class CompetitiveAnalysisSystem:
             file_ext = Path(file_path).suffix.lower()
             
             if file_ext in ['.xml']:
-                # XML файл
-                success = self.xml_parser.parse(file_path)
-                if success:
-                    self.products_1c = self.xml_parser.get_products()
+                # XML файл (CommerceML), читается потоково; цены и остатки - из offers.xml рядом, если есть
+                offers_path = find_offers_file(file_path)
+                if offers_path:
+                    self.logger.info(f"💰 Цены и остатки: {offers_path}")
+                self.products_1c = [
+                    product.to_dict() for product in self.xml_parser.iter_products(file_path, offers_path)
+                ]
             
-            elif file_ext in ['.xlsx', '.xls']:
-                # Excel файл (файл из 1С)
+            elif file_ext in ['.mxl', '.xlsx', '.xls']:
+                # Табличный документ 1С (.mxl читается напрямую) или его копия в Excel
                 from parse_1c_improved import Improved1CParser
                 parser = Improved1CParser()
                 self.products_1c = parser.parse(file_path)
@@ -99,7 +119,10 @@ class CompetitiveAnalysisSystem:
         self,
         sites: Optional[List[str]] = None,
         max_products_per_site: int = 20,
-        max_products_from_1c: int = 5
+        max_products_from_1c: int = 5,
+        force_refresh: bool = False,
+        on_event: Optional[Callable[[str, Dict], None]] = None,
+        match_threshold: Optional[float] = None
     ) -> Dict[str, int]:
         """
         Парсит конкурентов
@@ -108,6 +131,12 @@ class CompetitiveAnalysisSystem:
             sites: список сайтов (None = все)
             max_products_per_site: макс товаров с каждого сайта
             max_products_from_1c: количество товаров из 1С для парсинга
+            force_refresh: игнорировать кеш результатов и парсить заново
+            on_event: приемник событий по ходу парсинга - вызывается как on_event(тип, данные):
+                'site_result' - завершен поиск по паре (запрос, сайт),
+                'match' - совпадения товаров группы (если задан match_threshold)
+            match_threshold: порог для сопоставления каждой группы сразу после ее
+                парсинга (match_products с тем же порогом берет эти совпадения готовыми)
         
         Returns:
             статистика {сайт: количество}
@@ -122,9 +151,16 @@ class CompetitiveAnalysisSystem:
         
         # Очищаем данные перед новым парсингом
         self.scraped_products = []
+        self.results_by_product = {}
+        self.group_matches = {}
         self.matches = []
         
         stats = {}
+        # Карточка, найденная по нескольким запросам, попадает в список один раз
+        dedup = ProductDeduplicator()
+        self.scraper_manager.reset_skipped_sites()
+        self.scraper_manager.reset_metrics()
+        self.scraper_manager.reset_deferred()
         
         # ВАЖНО: Ограничиваем список товаров для парсинга И для сопоставления
         # Сохраняем ограниченный список для использования в match_products и generate_report
@@ -132,37 +168,238 @@ class CompetitiveAnalysisSystem:
         
         self.logger.info(f"   Обрабатываем {len(self.products_1c_limited)} товаров из 1С (всего в каталоге: {len(self.products_1c)})")
         
-        for idx, product_1c in enumerate(self.products_1c_limited, 1):
-            query = product_1c.get('name', '')
-            
-            if not query:
-                continue
-            
-            self.logger.info(f"\n📦 [{idx}/{len(self.products_1c_limited)}] Товар: {query}")
+        # Варианты одной модели (размер/цвет) ищем одним запросом
+        query_plan = self.query_planner.plan(self.products_1c_limited)
+        
+        # Товары каждой группы: (список записей, id уже добавленных записей)
+        group_results = {}
+        total_pairs = len(query_plan) * len(self.scraper_manager.resolve_sites(sites))
+        done_pairs = 0
+        
+        def site_done(group, site, products):
+            nonlocal done_pairs
+            done_pairs += 1
+            self._emit(on_event, 'site_result', {
+                'query': group.query,
+                'site': site,
+                'found': len(products),
+                'completed': done_pairs,
+                'total': total_pairs,
+                'members': [self._member_summary(member) for member in group.members],
+                'products': [
+                    {'title': p.title, 'price': p.price, 'url': p.url, 'source': p.source}
+                    for p in products
+                ],
+            })
+        
+        for idx, group in enumerate(query_plan, 1):
+            self.logger.info(
+                f"\n📦 [{idx}/{len(query_plan)}] Запрос: {group.query} "
+                f"(товаров 1С: {len(group.members)})"
+            )
             
             # Поиск на всех сайтах
             results = self.scraper_manager.search_all(
-                query=query,
+                query=group.query,
                 sites=sites,
-                max_products=max_products_per_site
+                max_products=max_products_per_site,
+                force_refresh=force_refresh,
+                # Цена и бренд 1С отсекают аксессуары и чужие модели еще до сопоставления
+                reference=build_reference(group.members),
+                on_result=(lambda site, products, group=group: site_done(group, site, products)) if on_event else None
             )
             
             # Собираем результаты
+            group_results[group.query] = ([], set())
             for site, products in results.items():
-                if site not in stats:
-                    stats[site] = 0
-                
-                stats[site] += len(products)
-                
-                # Добавляем в общий список
-                for product in products:
-                    self.scraped_products.append(product.to_dict())
+                self._collect_products(dedup, stats, group, site, products, group_results[group.query])
+            
+            # Раздаем результаты группы каждому товару 1С из нее (список общий - дополняется при повторах)
+            for member in group.members:
+                self.results_by_product[self._member_key(member)] = group_results[group.query][0]
+            
+            self._emit_group_matches(on_event, match_threshold, group, group_results[group.query][0])
+        
+        # Запросы, упершиеся в капчу, повторяем в новой сессии браузера
+        groups_by_query = {group.query: group for group in query_plan}
+        for (site, query), products in self.scraper_manager.retry_deferred().items():
+            if query in groups_by_query:
+                group = groups_by_query[query]
+                self._collect_products(dedup, stats, group, site, products, group_results[query])
+                if on_event:
+                    done_pairs -= 1  # пара уже учтена в основном проходе
+                    site_done(group, site, products)
+                self._emit_group_matches(on_event, match_threshold, group, group_results[query][0])
+        deferred = self.scraper_manager.get_deferred()
+        
+        self.scraped_products = dedup.products
+        if self.price_history:
+            try:
+                points = self.price_history.record(self.scraped_products)
+                self.logger.info(f"📈 История цен: записано {points} точек")
+            except Exception as e:
+                self.logger.warning(f"⚠️ Не удалось записать историю цен: {e}")
         
         self.logger.info(f"\n✅ Парсинг завершен")
         self.logger.info(f"   Всего найдено: {len(self.scraped_products)} товаров")
+        if dedup.duplicates:
+            self.logger.info(f"   Объединено дубликатов между запросами: {dedup.duplicates}")
+        if deferred['dropped']:
+            self.logger.info(f"   Не выполнено из-за капчи: {len(deferred['dropped'])} запросов")
+        
+        skipped_sites = self.scraper_manager.get_skipped_sites()
+        if skipped_sites:
+            self.logger.info(f"   Пропущено (сайт недоступен): {skipped_sites}")
+        
+        metrics = self.scraper_manager.get_metrics()
+        rejected_irrelevant = {}
+        for site_metrics in metrics.values():
+            for name, count in site_metrics['cards'].items():
+                if name in ('rejected_tokens', 'rejected_brand', 'rejected_price'):
+                    reason = name[len('rejected_'):]
+                    rejected_irrelevant[reason] = rejected_irrelevant.get(reason, 0) + count
+        if rejected_irrelevant:
+            self.logger.info(f"   Отброшено нерелевантных карточек: {rejected_irrelevant}")
+        self.last_run_stats = {
+            'products_by_site': stats,
+            'skipped_sites': skipped_sites,
+            'duplicates_merged': dedup.duplicates,
+            'rejected_irrelevant': rejected_irrelevant,
+            'deferred': deferred,
+            'metrics': metrics,
+        }
+        
+        return stats
+    
+    def refresh_catalog(
+        self,
+        sites: Optional[List[str]] = None,
+        max_requests: Optional[int] = 50,
+        max_seconds: Optional[float] = None,
+        max_products_per_site: int = 20
+    ) -> Dict[str, int]:
+        """
+        Инкрементально обновляет весь каталог 1С
+        
+        Парсятся только самые устаревшие и волатильные пары (запрос, сайт)
+        в пределах бюджета; для остальных берутся результаты прошлых циклов.
+        
+        Args:
+            sites: список сайтов (None = все)
+            max_requests: бюджет поисков за цикл
+            max_seconds: бюджет времени за цикл
+            max_products_per_site: макс товаров с каждого сайта
+        
+        Returns:
+            статистика {сайт: количество}
+        """
+        if not self.products_1c:
+            self.logger.warning("⚠️ Сначала загрузите каталог из 1С")
+            return {}
+        
+        self.scraped_products = []
+        self.results_by_product = {}
+        self.group_matches = {}
+        self.matches = []
+        self.scraper_manager.reset_skipped_sites()
+        self.scraper_manager.reset_metrics()
+        self.scraper_manager.reset_deferred()
+        
+        # Обновляется весь каталог - сопоставление тоже идет по всем товарам
+        self.products_1c_limited = self.products_1c
+        query_plan = self.query_planner.plan(self.products_1c)
+        site_keys = self.scraper_manager.resolve_sites(sites)
+        
+        cycle = self.refresh_scheduler.run_cycle(
+            query_plan,
+            sites=site_keys,
+            max_requests=max_requests,
+            max_seconds=max_seconds,
+            max_products=max_products_per_site,
+        )
         
+        stats = {}
+        dedup = ProductDeduplicator()
+        stored = self.refresh_scheduler.load_results(query_plan, site_keys)
+        for group in query_plan:
+            bucket = ([], set())
+            for site, products in stored.get(group.key, {}).items():
+                self._collect_products(dedup, stats, group, site, products, bucket)
+            for member in group.members:
+                self.results_by_product[self._member_key(member)] = bucket[0]
+        self.scraped_products = dedup.products
+        
+        self.logger.info(
+            f"✅ Обновлено пар: {cycle['refreshed']}, из прошлых циклов: {cycle['kept']}, "
+            f"всего товаров: {len(self.scraped_products)}"
+        )
+        self.last_run_stats = {
+            'products_by_site': stats,
+            'skipped_sites': self.scraper_manager.get_skipped_sites(),
+            'duplicates_merged': dedup.duplicates,
+            'deferred': self.scraper_manager.get_deferred(),
+            'refresh': cycle,
+            'metrics': self.scraper_manager.get_metrics(),
+        }
         return stats
     
+    def _emit(self, on_event: Optional[Callable[[str, Dict], None]], event: str, data: Dict):
+        """Передает событие приемнику; ошибка приемника не прерывает парсинг"""
+        if not on_event:
+            return
+        try:
+            on_event(event, data)
+        except Exception as e:
+            self.logger.debug(f"Ошибка приемника событий ({event}): {e}")
+    
+    def _emit_group_matches(self, on_event, threshold: Optional[float], group, group_products: List):
+        """
+        Сопоставляет товары группы и отправляет совпадения приемнику
+        
+        Результат запоминается: match_products с тем же порогом его переиспользует.
+        """
+        if not on_event or threshold is None or not group_products:
+            return
+        try:
+            matches = self.matcher.match_products(group.members, group_products, threshold=threshold, debug=False)
+        except Exception as e:
+            self.logger.debug(f"Ошибка предварительного сопоставления: {e}")
+            return
+        self.group_matches[id(group_products)] = (threshold, len(group_products), matches)
+        if matches:
+            self._emit(on_event, 'match', {
+                'query': group.query,
+                'matches': [match.to_dict() for match in matches],
+            })
+    
+    @staticmethod
+    def _member_key(product_1c: Dict) -> str:
+        """Ключ товара 1С в results_by_product"""
+        return product_1c.get('id', product_1c.get('name', ''))
+    
+    @staticmethod
+    def _member_summary(product_1c: Dict) -> Dict:
+        """Товар 1С для событий интерфейса (без описания и вариаций)"""
+        return {
+            'id': product_1c.get('id', ''),
+            'name': product_1c.get('name', ''),
+            'price': product_1c.get('price', 0),
+            'stock': product_1c.get('stock', 0),
+        }
+    
+    @staticmethod
+    def _collect_products(dedup, stats, group, site, products, bucket):
+        """Добавляет товары сайта в общий список и в список группы (дубликаты сливаются)"""
+        group_products, group_record_ids = bucket
+        stats[site] = stats.get(site, 0) + len(products)
+        for product in products:
+            product_dict = product.view()
+            product_dict['query'] = group.query
+            record = dedup.add(product_dict, group.query)
+            if id(record) not in group_record_ids:
+                group_record_ids.add(id(record))
+                group_products.append(record)
+    
     def match_products(self, threshold: float = 0.75) -> bool:
         """
         Сопоставляет товары из 1С с найденными
@@ -182,14 +419,41 @@ class CompetitiveAnalysisSystem:
         # Используем ограниченный список товаров из 1С для сопоставления
         products_for_matching = self.products_1c_limited if self.products_1c_limited else self.products_1c
         
-        self.matches = self.matcher.match_products(
-            products_for_matching,
-            self.scraped_products,
-            threshold=threshold
-        )
+        # Каждый товар 1С сравнивается только с выдачей по своему запросу;
+        # товары одной группы делят один список - сопоставляем их вместе
+        batches = {}
+        for product_1c in products_for_matching:
+            candidates = self.results_by_product.get(self._member_key(product_1c))
+            if candidates:
+                batches.setdefault(id(candidates), (candidates, []))[1].append(product_1c)
+        
+        matches = []
+        debug = True  # отладочный вывод сопоставителя - только для первой группы
+        for key, (candidates, members) in batches.items():
+            cached = self.group_matches.get(key)
+            if cached and cached[0] == threshold and cached[1] == len(candidates):
+                # Группа уже сопоставлена по ходу парсинга с тем же порогом и той же выдачей
+                member_ids = {member.get('id', '') for member in members}
+                matches.extend(match for match in cached[2] if match.product_1c_id in member_ids)
+                continue
+            matches.extend(self.matcher.match_products(members, candidates, threshold=threshold, debug=debug))
+            debug = False
+        self.matches = sorted(matches, key=lambda match: match.similarity_score, reverse=True)
         
         self.logger.info(f"✅ Найдено совпадений: {len(self.matches)}")
         
+        # Привязываем найденные предложения к товарам 1С - для траекторий цен
+        if self.price_history:
+            urls_by_product = {}
+            for match in self.matches:
+                if match.product_1c_id and match.url:
+                    urls_by_product.setdefault(match.product_1c_id, []).append(match.url)
+            try:
+                for product_id, urls in urls_by_product.items():
+                    self.price_history.link_product(product_id, urls)
+            except Exception as e:
+                self.logger.warning(f"⚠️ Не удалось привязать историю цен: {e}")
+        
         return True
     
     def generate_report(self, format: str = 'json') -> str:
@@ -197,7 +461,7 @@ class CompetitiveAnalysisSystem:
         Генерирует отчет
         
         Args:
-            format: формат отчета (json, csv, excel)
+            format: формат отчета (json, csv, excel, ndjson)
         
         Returns:
             путь к файлу отчета
@@ -230,7 +494,7 @@ class CompetitiveAnalysisSystem:
             }
             
             with open(report_path, 'w', encoding='utf-8') as f:
-                json.dump(report_data, f, ensure_ascii=False, indent=2)
+                json.dump(report_data, f, ensure_ascii=False, indent=2, default=to_plain)
         
         elif format == 'csv':
             import pandas as pd
@@ -371,8 +635,19 @@ class CompetitiveAnalysisSystem:
                         df_scraped['rating'] = df_scraped['rating'].apply(
                             lambda x: str(x).replace('.', ',') if x and x != 0 and pd.notna(x) else ''
                         )
+                    # Запросы, по которым найдена карточка, - одной ячейкой
+                    if 'queries' in df_scraped.columns:
+                        df_scraped['queries'] = df_scraped['queries'].apply(
+                            lambda x: ', '.join(x) if isinstance(x, list) else x
+                        )
                     df_scraped.to_excel(writer, sheet_name='Спарсено', index=False)
         
+        elif format == 'ndjson':
+            # Спарсенные товары построчно - файл можно читать потоково
+            report_path = report_dir / f'scraped_products_{timestamp}.ndjson'
+            with open(report_path, 'w', encoding='utf-8') as f:
+                write_ndjson(self.scraped_products, f)
+        
         else:
             self.logger.error(f"❌ Неизвестный формат: {format}")
             return ""
@@ -493,11 +768,15 @@ class CompetitiveAnalysisSystem:
     
     def get_status(self) -> Dict:
         """Возвращает статус системы"""
+        scraper_status = self.scraper_manager.get_status()
         return {
             'products_1c_loaded': len(self.products_1c),
             'scraped_products': len(self.scraped_products),
             'matches_found': len(self.matches),
             'supported_sites': list(self.scraper_manager.get_supported_sites().keys()),
+            'scrape_cache': scraper_status['cache'],
+            'rate_limits': scraper_status['rate_limits'],
+            'scrape_metrics': scraper_status['metrics'],
         }
 
 
@@ -0,0 +1,68 @@
+"""
+Потоковое чтение табличных документов 1С (MOXCEL, .mxl)
+Файл .mxl - это заголовок 'MOXCEL' и текст в UTF-8: вложенные записи
+{...}, разделенные переводами строк CRLF, значения ячеек - {"#","..."}.
+Раньше файл перед разбором сохраняли в .xlsx, где каждая строка текста
+становилась ячейкой столбца A. Читатель отдает те же строки напрямую,
+без pandas и openpyxl и без загрузки файла целиком.
+
+    for row in iter_mxl_rows('Ostatki7noyabrya.mxl', skip_rows=34):
+        ...
+"""
+
+import codecs
+from pathlib import Path
+from typing import Iterator, Union
+
+MXL_SIGNATURE = b'MOXCEL'
+UTF8_BOM = codecs.BOM_UTF8
+# Служебные байты заголовка (версия формата) идут до BOM; ищем его в начале файла
+HEADER_SCAN_BYTES = 64
+ROW_SEPARATOR = '\r\n'
+CHUNK_SIZE = 1 << 20
+
+
+def is_mxl(path: Union[str, Path]) -> bool:
+    """Начинается ли файл с сигнатуры MOXCEL"""
+    with open(path, 'rb') as f:
+        return f.read(len(MXL_SIGNATURE)) == MXL_SIGNATURE
+
+
+def iter_mxl_rows(path: Union[str, Path], skip_rows: int = 0, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Строки текста MOXCEL (то же, что столбец A сконвертированного .xlsx)
+
+    Args:
+        path: путь к файлу .mxl
+        skip_rows: сколько первых строк пропустить (шапка отчета)
+        chunk_size: размер блока чтения в байтах
+
+    Raises:
+        ValueError: файл не в формате MOXCEL
+    """
+    with open(path, 'rb') as f:
+        head = f.read(HEADER_SCAN_BYTES)
+        if not head.startswith(MXL_SIGNATURE):
+            raise ValueError(f"Файл не в формате MOXCEL: {path}")
+        bom = head.find(UTF8_BOM)
+        # Без BOM текст начинается с первой записи
+        start = bom + len(UTF8_BOM) if bom >= 0 else max(head.find(b'{'), len(MXL_SIGNATURE))
+        f.seek(start)
+
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        index = 0
+        tail = ''
+        while True:
+            chunk = f.read(chunk_size)
+            final = not chunk
+            rows = (tail + decoder.decode(chunk, final=final)).split(ROW_SEPARATOR)
+            # Последний кусок может оборваться посреди строки (или посреди CRLF)
+            tail = rows.pop()
+            if final and tail:
+                rows.append(tail)
+            for row in rows:
+                if index >= skip_rows:
+                    yield row
+                index += 1
+            if final:
+                break
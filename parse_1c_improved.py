@@ -1,105 +1,153 @@
 """
 Парсер для файла из 1С
 Работает через маркеры "#" - определяет тип поля и извлекает значение
+
+Источники строк:
+- .mxl (MOXCEL) - читается напрямую потоково, без pandas
+- .xlsx - столбец A листа (файл .mxl, сохраненный в Excel): openpyxl в режиме
+  read_only отдает ячейки потоком; pandas - запасной вариант для .xls
 """
 
-import pandas as pd
 import re
 import logging
-from typing import List, Dict, Optional, Tuple
+from enum import Enum
+from pathlib import Path
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+
+from mxl_reader import iter_mxl_rows
+
+# openpyxl - потоковое чтение .xlsx
+try:
+    from openpyxl import load_workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+# pandas нужен для .xls и экспорта в CSV
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class CellKind(Enum):
+    """Тип ячейки выгрузки для конечного автомата парсера"""
+    SKIP = 0         # пустая ячейка, служебная запись или нераспознанное значение
+    NAME_NEXT = 1    # запись {20,2...}: следующий маркер - название товара
+    NAME = 2
+    PRICE = 3
+    VARIATION = 4
+    STOCK = 5
+    DESCRIPTION = 6
+
+
+# Шаблоны компилируются один раз на модуль
+MARKER_PREFIX = '{"#'
+NAME_NEXT_PREFIX = '{20,2'
+MARKER_RE = re.compile(r'\{"#","(.*?)"\}', re.DOTALL)
+LETTERS_RE = re.compile(r'[A-Za-zА-Яа-я]')
+NON_DIGITS_RE = re.compile(r'\D+')
+# Обозначения рубля не мешают значению быть ценой
+PRICE_UNITS_RE = re.compile(r'руб|р')
+# Остаток: цифры и разделители, допускаются '#', 'шт' и пробелы (в т.ч. неразрывные)
+STOCK_RE = re.compile(r'(?:[# \u00a0\u202f]|шт)*[\d,.](?:[\d,.# \u00a0\u202f]|шт)*')
+
+NAME_STOP_WORDS = ('цвет:', 'color:', 'размер:', 'size:', 'наименование')
+VARIATION_WORDS = ('цвет', 'color', 'размер', 'size', 'вариа')
+PRICE_SEPARATORS = frozenset(',. \u00a0\u202f')
+SERVICE_VALUES = frozenset({'1#', '2#', '3#', '#'})
+NAME_MAX_LENGTH = 120
+
+
+def classify_value(value: str, price_wanted: bool = True) -> CellKind:
+    """
+    Тип значения маркера за один проход
+
+    Признаки (буквы, цифры, ключевые слова) считаются один раз, приоритет
+    типов: название, цена (если у товара ее еще нет), вариация, остаток, описание.
+
+    Args:
+        value: значение маркера (без пробелов по краям, непустое)
+        price_wanted: у текущего товара еще нет цены
+    """
+    lowered = value.lower()
+    has_letters = LETTERS_RE.search(value) is not None
+    length = len(value)
+
+    if (
+        has_letters
+        and 3 <= length <= NAME_MAX_LENGTH
+        and lowered not in SERVICE_VALUES
+        and '•' not in value
+        and '\n' not in value
+        and not any(word in lowered for word in NAME_STOP_WORDS)
+    ):
+        return CellKind.NAME
+
+    if price_wanted and '#' not in value:
+        digits = NON_DIGITS_RE.sub('', value)
+        if (
+            (len(digits) >= 2 or not PRICE_SEPARATORS.isdisjoint(value))
+            and LETTERS_RE.search(PRICE_UNITS_RE.sub('', lowered)) is None
+        ):
+            return CellKind.PRICE
+
+    if any(word in lowered for word in VARIATION_WORDS):
+        return CellKind.VARIATION
+    if STOCK_RE.fullmatch(value):
+        return CellKind.STOCK
+    if has_letters and length > 2 and value not in SERVICE_VALUES:
+        return CellKind.DESCRIPTION
+    return CellKind.SKIP
+
+
+def classify_cell(cell, price_wanted: bool = True) -> Tuple[CellKind, Optional[str]]:
+    """
+    Тип ячейки и значение маркера {"#","..."}
+
+    Returns:
+        (тип, значение); значение есть только у типов с маркером
+    """
+    # NaN (пустая ячейка Excel) не строка
+    if not isinstance(cell, str):
+        if cell is None or cell != cell:
+            return CellKind.SKIP, None
+        cell = str(cell)
+    if cell.lstrip().startswith(NAME_NEXT_PREFIX):
+        return CellKind.NAME_NEXT, None
+    # Большинство строк выгрузки - служебные записи без маркера
+    if MARKER_PREFIX not in cell:
+        return CellKind.SKIP, None
+    match = MARKER_RE.search(cell)
+    if not match:
+        return CellKind.SKIP, None
+    value = match.group(1).strip()
+    if not value:
+        return CellKind.SKIP, None
+    return classify_value(value, price_wanted), value
+
+
 class Improved1CParser:
     """Парсер для файла из 1С с маркерами #"""
     
+    # Шапка отчета 1С (первые 34 строки) товаров не содержит
+    HEADER_ROWS = 34
+    
     def __init__(self):
         self.products = []
     
     def parse(self, file_path: str) -> List[Dict]:
-        """Парсит файл из 1С"""
+        """Парсит файл из 1С (.mxl или .xlsx)"""
         logger.info(f"📦 Парсинг файла: {file_path}")
         
         try:
-            # Читаем файл Excel
-            df = pd.read_excel(file_path, header=None)
-            logger.info(f"📊 Загружено строк: {len(df)}")
-            
-            # Пропускаем первые 34 строки
-            df = df.iloc[34:].reset_index(drop=True)
-            logger.info(f"📊 Обрабатываем строк: {len(df)} (первые 34 пропущены)")
-            
-            products = []
-            rows = df.iloc[:, 0].tolist()
-            total_rows = len(rows)
-            i = 0
-            current_product: Dict[str, str] = {}
-            expecting_name = False
-            
-            while i < total_rows:
-                raw_cell = rows[i]
-                raw_text = str(raw_cell)
-                
-                if isinstance(raw_cell, str) and raw_text.strip().startswith('{20,2'):
-                    expecting_name = True
-                    i += 1
-                    continue
-                
-                marker_value = self._extract_marker_value(raw_cell)
-                
-                if not marker_value:
-                    i += 1
-                    continue
-                
-                if expecting_name or self._looks_like_name(marker_value):
-                    expecting_name = False
-                    if current_product and 'price' in current_product:
-                        product = self._create_product(current_product)
-                        if product:
-                            products.append(product)
-                            if len(products) <= 3:
-                                logger.info(f"   ✔️ Товар #{len(products)} сохранен: {product['name'][:50]}")
-                    current_product = {'name': marker_value}
-                    i += 1
-                    continue
-                
-                if not current_product:
-                    i += 1
-                    continue
-                
-                if 'price' not in current_product and self._looks_like_price(marker_value):
-                    price = self._parse_price(marker_value)
-                    if price:
-                        current_product['price'] = price
-                    i += 1
-                    continue
-                
-                if self._looks_like_variation(marker_value):
-                    current_product['variation'] = self._append_text(current_product.get('variation'), marker_value)
-                    i += 1
-                    continue
-                
-                if self._looks_like_stock_value(marker_value):
-                    current_product['stock'] = self._parse_stock(marker_value)
-                    i += 1
-                    continue
-                
-                if self._looks_like_description(marker_value):
-                    current_product['description'] = self._append_text(current_product.get('description'), marker_value)
-                
-                i += 1
-            
-            if current_product and 'price' in current_product:
-                product = self._create_product(current_product)
-                if product:
-                    products.append(product)
-                    logger.info(f"   ✔️ Товар #{len(products)} сохранен: {product['name'][:50]}")
-            
+            products = self.parse_rows(self.iter_rows(file_path))
             self.products = products
             logger.info(f"✅ Успешно распарсено товаров: {len(products)}")
-            
             return products
             
         except Exception as e:
@@ -108,6 +156,93 @@ class Improved1CParser:
             traceback.print_exc()
             return []
     
+    def iter_rows(self, file_path: str) -> Iterator:
+        """Ячейки столбца A после шапки: из .mxl напрямую, из .xlsx - потоком openpyxl"""
+        suffix = Path(file_path).suffix.lower()
+        if suffix == '.mxl':
+            return iter_mxl_rows(file_path, skip_rows=self.HEADER_ROWS)
+        
+        if suffix != '.xls' and OPENPYXL_AVAILABLE:
+            return self.iter_xlsx_rows(file_path)
+        
+        if not PANDAS_AVAILABLE:
+            raise RuntimeError("Для чтения Excel нужен openpyxl (.xlsx) или pandas (.xls)")
+        df = pd.read_excel(file_path, header=None)
+        logger.info(f"📊 Загружено строк: {len(df)}")
+        return iter(df.iloc[self.HEADER_ROWS:, 0].tolist())
+    
+    def iter_xlsx_rows(self, file_path: str) -> Iterator:
+        """
+        Столбец A листа .xlsx потоком (openpyxl read_only)
+        
+        Остальные столбцы и весь лист в память не загружаются.
+        """
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            for row in sheet.iter_rows(min_row=self.HEADER_ROWS + 1, max_col=1, values_only=True):
+                yield row[0] if row else None
+        finally:
+            workbook.close()
+    
+    def parse_rows(self, rows: Iterable) -> List[Dict]:
+        """
+        Собирает товары из последовательности ячеек (строки после шапки)
+        
+        Ячейки обрабатываются по одной, поэтому подходит и генератор.
+        Тип каждой ячейки определяет classify_cell за один проход.
+        """
+        products = []
+        current_product: Dict[str, str] = {}
+        expecting_name = False
+        total_rows = 0
+        
+        for raw_cell in rows:
+            total_rows += 1
+            
+            kind, marker_value = classify_cell(raw_cell, price_wanted='price' not in current_product)
+            
+            if kind is CellKind.NAME_NEXT:
+                expecting_name = True
+                continue
+            
+            if marker_value is None:
+                continue
+            
+            if expecting_name or kind is CellKind.NAME:
+                expecting_name = False
+                if current_product and 'price' in current_product:
+                    product = self._create_product(current_product)
+                    if product:
+                        products.append(product)
+                        if len(products) <= 3:
+                            logger.info(f"   ✔️ Товар #{len(products)} сохранен: {product['name'][:50]}")
+                current_product = {'name': marker_value}
+                continue
+            
+            if not current_product:
+                continue
+            
+            if kind is CellKind.PRICE:
+                price = self._parse_price(marker_value)
+                if price:
+                    current_product['price'] = price
+            elif kind is CellKind.VARIATION:
+                current_product['variation'] = self._append_text(current_product.get('variation'), marker_value)
+            elif kind is CellKind.STOCK:
+                current_product['stock'] = self._parse_stock(marker_value)
+            elif kind is CellKind.DESCRIPTION:
+                current_product['description'] = self._append_text(current_product.get('description'), marker_value)
+        
+        if current_product and 'price' in current_product:
+            product = self._create_product(current_product)
+            if product:
+                products.append(product)
+                logger.info(f"   ✔️ Товар #{len(products)} сохранен: {product['name'][:50]}")
+        
+        logger.info(f"📊 Обработано строк: {total_rows} (первые {self.HEADER_ROWS} пропущены)")
+        return products
+    
     def _create_product(self, product_data: Dict) -> Optional[Dict]:
         """Создает объект товара из собранных данных"""
         try:
@@ -168,106 +303,6 @@ class Improved1CParser:
         base = base.strip('_')
         return base[:50] if base else "product"
     
-    def _extract_marker_value(self, cell: Optional[str]) -> Optional[str]:
-        """Извлекает значение из строки вида {"#","..."}"""
-        if cell is None or (isinstance(cell, float) and pd.isna(cell)):
-            return None
-        text = str(cell).strip()
-        if not text or '{\"#' not in text:
-            return None
-        
-        match = re.search(r'\{\"#\",\"(.*?)\"\}', text, flags=re.DOTALL)
-        if match:
-            return match.group(1).strip()
-        return None
-    
-    def _consume_next_marker(self, rows: List[str], start_idx: int) -> Tuple[int, Optional[str]]:
-        """Возвращает индекс после следующего маркера и его значение"""
-        j = start_idx
-        total = len(rows)
-        while j < total:
-            value = self._extract_marker_value(rows[j])
-            j += 1
-            if value is None:
-                continue
-            return j, value
-        return j, None
-    
-    def _looks_like_name(self, value: str) -> bool:
-        """Грубая эвристика, что строка является названием товара"""
-        if not value:
-            return False
-        lowered = value.lower()
-        if any(keyword in lowered for keyword in ['цвет:', 'color:', 'размер:', 'size:']):
-            return False
-        if lowered.strip() in {'1#', '2#', '3#'}:
-            return False
-        if 'наименование' in lowered:
-            return False
-        if not re.search(r'[A-Za-zА-Яа-я]', value):
-            return False
-        stripped = value.strip()
-        if '•' in stripped or '\n' in stripped:
-            return False
-        if len(stripped) > 120:
-            return False
-        cleaned = re.sub(r'[\s#]+', '', value)
-        if not cleaned or cleaned.isdigit():
-            return False
-        return len(value.strip()) >= 3
-    
-    def _looks_like_variation(self, value: Optional[str]) -> bool:
-        if not value:
-            return False
-        lowered = value.lower()
-        keywords = ['цвет', 'color', 'размер', 'size', 'вариа']
-        return any(key in lowered for key in keywords)
-    
-    def _looks_like_description(self, value: Optional[str]) -> bool:
-        if not value:
-            return False
-        value = value.strip()
-        if value in {'1#', '2#', '#'}:
-            return False
-        has_letters = re.search(r'[A-Za-zА-Яа-я]', value) is not None
-        return has_letters and len(value) > 2
-    
-    def _looks_like_price(self, value: Optional[str]) -> bool:
-        if not value:
-            return False
-        if '#' in value:
-            return False
-        cleaned = (value.replace('\u00a0', ' ')
-                         .replace('\u202f', ' ')
-                         .replace('\ufffd', ' ')
-                         .lower()
-                         .replace('руб', '')
-                         .replace('р.', '')
-                         .replace('р', '')
-                         .replace('₽', '')
-                         .replace('~', '')
-                         .strip())
-        digits_only = re.sub(r'\D', '', cleaned)
-        has_separator = any(ch in value for ch in [',', '.', ' ', '\u00a0', '\u202f'])
-        if len(digits_only) < 2 and not has_separator:
-            return False
-        if re.search(r'[A-Za-zА-Яа-я]', cleaned):
-            return False
-        return True
-    
-    def _looks_like_stock_value(self, value: Optional[str]) -> bool:
-        if not value:
-            return False
-        cleaned = (value.strip()
-                        .replace('#', '')
-                        .replace('шт', '')
-                        .replace('шт.', '')
-                        .replace(' ', '')
-                        .replace('\u00a0', '')
-                        .replace('\u202f', ''))
-        cleaned = cleaned.replace(' ', '')
-        return bool(re.fullmatch(r'[\d,.]+', cleaned))
-    
     def _parse_price(self, value: Optional[str]) -> Optional[float]:
         if not value:
             return None
@@ -306,6 +341,10 @@ class Improved1CParser:
             logger.warning("⚠️ Нет товаров для экспорта")
             return
         
+        if not PANDAS_AVAILABLE:
+            logger.warning("⚠️ Для экспорта в CSV нужен pandas")
+            return
+        
         df = pd.DataFrame(self.products)
         df.to_csv(output_path, index=False, encoding='utf-8-sig')
         logger.info(f"✅ Экспортировано в: {output_path}")
@@ -105,19 +105,25 @@ class ProductMatcher:
                 json.dump(default_config, f, ensure_ascii=False, indent=2)
             return default_config
 
-    def match_products(self, products_1c: List[Dict], scraped_products: List[Dict], threshold: float = None) -> List[MatchResult]:
-        """Основной метод сопоставления товаров"""
+    def match_products(self, products_1c: List[Dict], scraped_products: List[Dict], threshold: float = None,
+                       debug: bool = True) -> List[MatchResult]:
+        """
+        Основной метод сопоставления товаров
+
+        debug=False - без отладочного вывода (для частых вызовов по группам)
+        """
         # Используем переданный порог или из конфигурации
         match_threshold = threshold if threshold is not None else self.config['threshold']
+        log = self.logger.info if debug else self.logger.debug
         
-        self.logger.info(f"🔍 Сопоставление: порог={match_threshold}, товаров 1С={len(products_1c)}, спарсено={len(scraped_products)}")
+        log(f"🔍 Сопоставление: порог={match_threshold}, товаров 1С={len(products_1c)}, спарсено={len(scraped_products)}")
         
         matches = []
         top_scores = []  # Для отладки - сохраняем топ-5 лучших совпадений
 
         for idx, product_1c in enumerate(products_1c):
             # Включаем отладку для первых 2 товаров
-            debug_mode = (idx < 2)
+            debug_mode = debug and idx < 2
             best_matches = self._find_best_matches(product_1c, scraped_products, debug=debug_mode)
             
             # Сортируем по убыванию схожести
@@ -139,11 +145,11 @@ class ProductMatcher:
         # Выводим топ-5 лучших совпадений для отладки
         if top_scores:
             top_scores.sort(key=lambda x: x['score'], reverse=True)
-            self.logger.info(f"📊 Топ-5 лучших совпадений (все сайты):")
+            log(f"📊 Топ-5 лучших совпадений (все сайты):")
             for i, item in enumerate(top_scores[:5], 1):
-                self.logger.info(f"   {i}. {item['score']:.2%} | {item['marketplace']} | {item['product_1c']} ↔ {item['scraped']}")
+                log(f"   {i}. {item['score']:.2%} | {item['marketplace']} | {item['product_1c']} ↔ {item['scraped']}")
 
-        self.logger.info(f"✅ Найдено совпадений выше порога {match_threshold:.0%}: {len(matches)}")
+        log(f"✅ Найдено совпадений выше порога {match_threshold:.0%}: {len(matches)}")
         return sorted(matches, key=lambda x: x.similarity_score, reverse=True)
 
     def _find_best_matches(self, product_1c: Dict, scraped_products: List[Dict], debug: bool = False) -> List[MatchResult]:
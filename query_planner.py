@@ -0,0 +1,70 @@
+"""
+Планировщик поисковых запросов
+Группирует товары 1С по каноническому запросу (без размеров и цветов),
+чтобы варианты одной модели парсились один раз.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from scrapers.query_normalizer import canonicalize_product_name, normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryGroup:
+    """Группа товаров 1С с общим поисковым запросом"""
+    query: str                      # строка, которая уходит в поиск
+    key: str                        # нормализованный ключ группы
+    members: List[Dict] = field(default_factory=list)  # товары 1С
+
+
+class QueryPlanner:
+    """Строит план поиска: один запрос на группу вариантов"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def plan(self, products_1c: List[Dict]) -> List[QueryGroup]:
+        """
+        Группирует товары по каноническому запросу
+
+        Args:
+            products_1c: товары из 1С (словарь с 'name' и, опционально, 'variation')
+
+        Returns:
+            группы в порядке первого появления
+        """
+        groups: Dict[str, QueryGroup] = {}
+        total = 0
+
+        for product in products_1c:
+            name = product.get('name', '')
+            if not name:
+                continue
+            total += 1
+
+            query = canonicalize_product_name(name, product.get('variation', ''))
+            key = normalize_query(query)
+
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = QueryGroup(query=query, key=key)
+            group.members.append(product)
+
+        plan = list(groups.values())
+        if total:
+            self.logger.info(
+                f"🧭 План запросов: {total} товаров -> {len(plan)} запросов "
+                f"(сокращение {self.reduction_ratio(total, len(plan)):.0%})"
+            )
+        return plan
+
+    @staticmethod
+    def reduction_ratio(total_products: int, total_queries: int) -> float:
+        """Доля запросов, которые не придется выполнять"""
+        if not total_products:
+            return 0.0
+        return 1 - total_queries / total_products
@@ -0,0 +1,244 @@
+"""
+Планировщик инкрементального обновления
+Вместо полного перепарсинга каталога каждый цикл обновляет только часть
+пар (запрос, сайт): давно не обновлявшиеся и те, где цены часто меняются.
+Остальные пары отдают результаты прошлых циклов из data/refresh_state.sqlite3.
+
+Приоритет пары:
+    возраст / интервал сайта * (1 + вес * волатильность)
+где интервал - TTL кеша результатов для сайта, а волатильность -
+сглаженное относительное изменение медианной цены между обновлениями.
+"""
+
+import json
+import logging
+import sqlite3
+import statistics
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from query_planner import QueryGroup
+from scrapers.product import Product
+from scrapers.relevance import build_reference
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """Выбирает и обновляет самые устаревшие и волатильные пары (запрос, сайт)"""
+
+    DEFAULT_PATH = 'data/refresh_state.sqlite3'
+    DEFAULT_INTERVAL = 24 * 3600
+
+    def __init__(
+        self,
+        scraper_manager,
+        db_path: str = DEFAULT_PATH,
+        volatility_weight: float = 4.0,
+        smoothing: float = 0.3,
+        min_priority: float = 0.5,
+    ):
+        """
+        Args:
+            scraper_manager: ScraperManager, через который идут поиски
+            db_path: путь к файлу SQLite с состоянием
+            volatility_weight: насколько волатильность ускоряет обновление
+            smoothing: вес нового изменения цены в сглаженной волатильности
+            min_priority: пары с меньшим приоритетом в цикле не обновляются
+        """
+        self.scraper_manager = scraper_manager
+        self.volatility_weight = volatility_weight
+        self.smoothing = smoothing
+        self.min_priority = min_priority
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS refresh_state (
+                query_key TEXT NOT NULL,
+                site TEXT NOT NULL,
+                last_scraped REAL NOT NULL,
+                median_price REAL,
+                volatility REAL NOT NULL DEFAULT 0,
+                scrapes INTEGER NOT NULL DEFAULT 0,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (query_key, site)
+            )
+            '''
+        )
+        self._conn.commit()
+
+    def interval(self, site: str) -> float:
+        """Желаемый интервал обновления сайта (TTL кеша результатов)"""
+        cache = self.scraper_manager.cache
+        return cache.get_ttl(site) if cache else self.DEFAULT_INTERVAL
+
+    def priority(self, site: str, state: Optional[Tuple[float, float]], now: float) -> float:
+        """Приоритет пары; state - (last_scraped, volatility) или None для новой пары"""
+        if state is None:
+            return float('inf')
+        last_scraped, volatility = state
+        age = max(0.0, now - last_scraped)
+        return age / self.interval(site) * (1 + self.volatility_weight * volatility)
+
+    def select(
+        self,
+        groups: List[QueryGroup],
+        sites: List[str],
+        max_requests: Optional[int] = None,
+        now: Optional[float] = None,
+    ) -> List[Tuple[float, QueryGroup, str]]:
+        """
+        Пары для обновления по убыванию приоритета (не больше max_requests)
+
+        Сайты с открытым предохранителем пропускаются: поиск на них все равно не пойдет.
+        """
+        now = now if now is not None else time.time()
+        breaker = self.scraper_manager.circuit_breaker
+        sites = [site for site in sites if not breaker.is_open(site)]
+        with self._lock:
+            states = {
+                (query_key, site): (last_scraped, volatility)
+                for query_key, site, last_scraped, volatility in self._conn.execute(
+                    'SELECT query_key, site, last_scraped, volatility FROM refresh_state'
+                )
+            }
+
+        candidates = []
+        for group in groups:
+            for site in sites:
+                priority = self.priority(site, states.get((group.key, site)), now)
+                if priority >= self.min_priority:
+                    candidates.append((priority, group, site))
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        return candidates[:max_requests] if max_requests is not None else candidates
+
+    def run_cycle(
+        self,
+        groups: List[QueryGroup],
+        sites: Optional[List[str]] = None,
+        max_requests: Optional[int] = 50,
+        max_seconds: Optional[float] = None,
+        max_products: int = 20,
+    ) -> Dict:
+        """
+        Один цикл обновления в пределах бюджета
+
+        Args:
+            groups: план запросов по всему каталогу
+            sites: сайты (None - все поддерживаемые)
+            max_requests: бюджет поисков за цикл
+            max_seconds: бюджет времени за цикл
+            max_products: максимум товаров с сайта
+
+        Returns:
+            статистика цикла: выбрано, обновлено, не обновлено из-за блокировок и ошибок
+        """
+        sites = self.scraper_manager.resolve_sites(sites)
+        selected = self.select(groups, sites, max_requests)
+        total_pairs = len(groups) * len(sites)
+        started = time.perf_counter()
+        self.logger.info(
+            f"♻️ Инкрементальное обновление: {len(selected)} из {total_pairs} пар "
+            f"(бюджет: {max_requests or '∞'} запросов, {max_seconds or '∞'} сек)"
+        )
+
+        refreshed = 0
+        failed = set()
+        for index, (priority, group, site) in enumerate(selected):
+            if max_seconds is not None and time.perf_counter() - started >= max_seconds:
+                self.logger.info(f"⏱️ Бюджет времени исчерпан, отложено пар: {len(selected) - index}")
+                break
+            products = self.scraper_manager.search(
+                site, group.query, max_products, force_refresh=True, reference=build_reference(group.members)
+            )
+            if self.scraper_manager.failure_reason(site, group.query):
+                # Поиск пропущен, отложен или упал - пара осталась устаревшей
+                failed.add((site, group.query))
+                continue
+            self.update(group.key, site, products)
+            refreshed += 1
+
+        # Пары, упершиеся в капчу, повторяем в новой сессии
+        groups_by_query = {group.query: group for group in groups}
+        for (site, query), products in self.scraper_manager.retry_deferred().items():
+            # Выдача из кеша - не обновление: время и волатильность пары не трогаем
+            if query in groups_by_query and not any((product.extra or {}).get('scraped_at') for product in products):
+                self.update(groups_by_query[query].key, site, products)
+                if (site, query) in failed:
+                    failed.discard((site, query))
+                    refreshed += 1
+        self.scraper_manager.flush_stats()
+
+        return {
+            'pairs_total': total_pairs,
+            'selected': len(selected),
+            'refreshed': refreshed,
+            'failed': len(failed),
+            'kept': total_pairs - refreshed,
+            'seconds': round(time.perf_counter() - started, 1),
+        }
+
+    def update(self, query_key: str, site: str, products: List[Product], now: Optional[float] = None):
+        """
+        Сохраняет результат поиска пары и пересчитывает волатильность
+
+        Вызывается только для состоявшихся поисков (капча и сбои сюда не попадают);
+        пустая выдача не затирает прошлые товары - обновляется только время.
+        """
+        now = now if now is not None else time.time()
+        prices = [product.price for product in products if product.price]
+        median_price = statistics.median(prices) if prices else None
+
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT median_price, volatility, scrapes, payload FROM refresh_state WHERE query_key = ? AND site = ?',
+                (query_key, site),
+            ).fetchone()
+            previous_median, volatility, scrapes, payload = row if row else (None, 0.0, 0, '[]')
+
+            if products:
+                payload = json.dumps([product.to_dict() for product in products], ensure_ascii=False)
+            if median_price and previous_median:
+                change = abs(median_price - previous_median) / previous_median
+                volatility = self.smoothing * change + (1 - self.smoothing) * volatility
+            if not median_price:
+                median_price = previous_median
+
+            self._conn.execute(
+                'INSERT OR REPLACE INTO refresh_state '
+                '(query_key, site, last_scraped, median_price, volatility, scrapes, payload) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (query_key, site, now, median_price, volatility, scrapes + 1, payload),
+            )
+            self._conn.commit()
+
+    def load_results(self, groups: List[QueryGroup], sites: List[str]) -> Dict[str, Dict[str, List[Product]]]:
+        """Последние сохраненные товары: {ключ группы: {сайт: [товары]}}"""
+        keys = {group.key for group in groups}
+        sites = set(sites)
+        results: Dict[str, Dict[str, List[Product]]] = {}
+        with self._lock:
+            rows = self._conn.execute('SELECT query_key, site, payload FROM refresh_state').fetchall()
+        for query_key, site, payload in rows:
+            if query_key in keys and site in sites:
+                results.setdefault(query_key, {})[site] = [Product.from_dict(item) for item in json.loads(payload)]
+        return results
+
+    def get_stats(self) -> Dict:
+        """Сколько пар отслеживается и насколько они свежие"""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute('SELECT site, last_scraped, volatility FROM refresh_state').fetchall()
+        stale = sum(1 for site, last_scraped, _ in rows if now - last_scraped > self.interval(site))
+        return {
+            'pairs': len(rows),
+            'stale': stale,
+            'volatile': sum(1 for _, _, volatility in rows if volatility >= 0.05),
+        }
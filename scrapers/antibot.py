@@ -0,0 +1,66 @@
+"""
+Распознавание капчи и анти-бот заглушек
+Общая проверка для всех скраперов: по адресу и заголовку страницы, без
+загрузки page_source. Скрапер, попавший на капчу, не ждет и не парсит пустую
+страницу, а сразу бросает BlockedError - менеджер откладывает запрос в
+очередь повторов и переходит к следующему сайту.
+"""
+
+import re
+from typing import Optional
+
+# Адрес страницы проверки: Яндекс /showcaptcha, OZON /abt/, Cloudflare /cdn-cgi/challenge
+CAPTCHA_URL_RE = re.compile(r'captcha|/abt/|/challenge|/blocked|/firewall', re.IGNORECASE)
+
+# Заголовки заглушек маркетплейсов и CDN
+BLOCK_TITLE_RE = re.compile(
+    r'вы не робот|подтвердите, что запросы|доступ ограничен|почти готово|'
+    r'проверка браузера|access denied|just a moment|attention required|are you a robot',
+    re.IGNORECASE,
+)
+
+# Для HTML без браузера (статический движок): заголовок ищется в начале документа
+TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+HTML_HEAD_LIMIT = 20000
+
+
+class BlockedError(Exception):
+    """Сайт показал капчу или анти-бот заглушку вместо выдачи"""
+
+    def __init__(self, site: str, reason: str, url: str = ""):
+        self.site = site
+        self.reason = reason
+        self.url = url
+        super().__init__(f"{site}: {reason} ({url})")
+
+
+def detect_block(url: str = "", title: str = "", html: str = "") -> Optional[str]:
+    """
+    Причина блокировки ('captcha', 'antibot') или None
+
+    Args:
+        url: текущий адрес страницы
+        title: заголовок страницы
+        html: HTML (используется, если заголовок не передан)
+    """
+    if url and CAPTCHA_URL_RE.search(url):
+        return 'captcha'
+    if not title and html:
+        match = TITLE_RE.search(html[:HTML_HEAD_LIMIT])
+        title = match.group(1) if match else ""
+    if title and BLOCK_TITLE_RE.search(title):
+        return 'antibot'
+    return None
+
+
+def check_driver(driver, site: str):
+    """Бросает BlockedError, если драйвер стоит на странице проверки"""
+    try:
+        url = driver.current_url
+        title = driver.title
+    except Exception:
+        # Состояние драйвера прочитать не удалось - решает обычная обработка ошибок
+        return
+    reason = detect_block(url, title)
+    if reason:
+        raise BlockedError(site, reason, url)
@@ -3,42 +3,40 @@ Selenium скрапер для Avito
 На основе детального отчета по парсингу Avito
 """
 
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
 import time
 import re
 import logging
-from dataclasses import dataclass
 from typing import List, Optional
 from urllib.parse import quote
 import random
 
-@dataclass
-class Product:
-    title: str
-    price: float
-    old_price: Optional[float] = None
-    url: str = ""
-    source: str = "Avito"
-    availability: str = "unknown"
-    location: str = ""
-    seller: str = ""
-    image_url: str = ""
-    reviews_count: int = 0
-    rating: float = 0.0
-
+from .antibot import BlockedError, check_driver
+from .html_parsing import make_soup
+from .instrumentation import PhaseTimer
+from .product import Product
+from .driver_factory import get_driver_factory
+from .rate_limiter import get_rate_limiter
+from .scroll_controller import ScrollController
 
 class AvitoScraper:
     """Selenium скрапер для Avito"""
     
+    # Карточка товара на странице поиска (для подсчета при прокрутке)
+    CARD_SELECTOR = "[data-marker='item']"
+    
+    # Сколько страниц выдачи открывать, если на первой не хватило товаров
+    MAX_PAGES = 3
+    
     def __init__(self, headless: bool = True, city: str = "rossiya"):
         self.headless = headless
         self.city = city  # rossiya, moskva, sankt-peterburg и т.д.
         self.driver = None
         self.logger = logging.getLogger(__name__)
+        self.rate_limiter = get_rate_limiter()
+        self.timer = PhaseTimer()  # замеры последнего поиска
         logging.basicConfig(level=logging.INFO)
     
     def _init_driver(self):
@@ -47,20 +45,9 @@ class AvitoScraper:
             return
         
         try:
-            options = uc.ChromeOptions()
-            
-            if self.headless:
-                options.add_argument('--headless=new')
-            
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-gpu')
-            options.add_argument('--window-size=1920,1080')
-            options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-            
-            self.driver = uc.Chrome(options=options)
-            self.driver.set_page_load_timeout(60)  # Увеличен timeout для Avito (часто медленный)
+            self.driver = get_driver_factory().create(
+                'avito', headless=self.headless, page_load_timeout=60
+            )
             
             self.logger.info("✅ Chrome драйвер инициализирован")
             
@@ -71,9 +58,11 @@ class AvitoScraper:
     def search(self, query: str, max_products: int = 20) -> List[Product]:
         """Поиск товаров на Avito"""
         products = []
+        timer = self.timer = PhaseTimer()
         
         try:
             self._init_driver()
+            timer.lap('driver_init')
             
             # Avito URL: https://www.avito.ru/{город}?q={запрос}
             search_url = f"https://www.avito.ru/{self.city}?q={quote(query)}"
@@ -81,54 +70,79 @@ class AvitoScraper:
             self.logger.info(f"🔍 Поиск на Avito: {query}")
             self.logger.info(f"📍 URL: {search_url}")
             
-            self.driver.get(search_url)
-            
-            # Ждем загрузки
-            time.sleep(random.uniform(3, 5))
-            
-            # Прокручиваем
-            self._scroll_page()
-            
-            # Парсим
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            
-            # Avito использует data-marker для элементов
-            cards = soup.find_all(attrs={'data-marker': 'item'})
-            
-            if not cards:
-                # Альтернативный поиск
-                cards = soup.find_all('div', class_=lambda x: x and 'item' in str(x).lower())
-            
-            self.logger.info(f"📦 Найдено карточек: {len(cards)}")
-            
-            for card in cards[:max_products]:
-                try:
-                    product = self._parse_product_card(card)
-                    if product:
-                        products.append(product)
-                except Exception as e:
-                    self.logger.debug(f"Ошибка парсинга карточки: {e}")
-                    continue
+            seen_urls = set()
+            for page in range(1, self.MAX_PAGES + 1):
+                page_url = search_url if page == 1 else f"{search_url}&p={page}"
+                if page > 1:
+                    self.logger.info(f"📄 Страница {page}: {page_url}")
+                
+                self.rate_limiter.acquire(page_url)
+                timer.lap('rate_limit')
+                self.driver.get(page_url)
+                get_driver_factory().mark_first_page('avito')
+                timer.lap('navigate')
+                
+                # Ждем загрузки
+                time.sleep(random.uniform(3, 5))
+                timer.lap('wait')
+                check_driver(self.driver, 'avito')
+                
+                # Прокручиваем
+                self._scroll_page(max_products - len(products))
+                timer.lap('scroll')
+                
+                # Парсим
+                html = self.driver.page_source
+                timer.lap('page_source')
+                soup = make_soup(html)
+                
+                # Avito использует data-marker для элементов
+                cards = soup.find_all(attrs={'data-marker': 'item'})
+                
+                if not cards:
+                    # Альтернативный поиск
+                    cards = soup.find_all('div', class_=lambda x: x and 'item' in str(x).lower())
+                
+                self.logger.info(f"📦 Найдено карточек: {len(cards)}")
+                timer.count('found', len(cards))
+                timer.lap('parse')
+                
+                added = 0
+                for card in cards:
+                    if len(products) >= max_products:
+                        break
+                    try:
+                        product = self._parse_product_card(card)
+                        if not product:
+                            timer.count('rejected')
+                        elif product.url not in seen_urls:
+                            seen_urls.add(product.url)
+                            products.append(product)
+                            timer.count('parsed')
+                            added += 1
+                    except Exception as e:
+                        timer.count('rejected')
+                        self.logger.debug(f"Ошибка парсинга карточки: {e}")
+                        continue
+                
+                timer.lap('convert')
+                
+                # Товаров хватает или следующая страница ничего не добавила
+                if len(products) >= max_products or not added:
+                    break
             
             self.logger.info(f"✅ Успешно спарсено: {len(products)} товаров")
             
+        except BlockedError:
+            raise
         except Exception as e:
             self.logger.error(f"❌ Ошибка поиска: {e}")
         
         return products
     
-    def _scroll_page(self):
-        """Прокручивает страницу"""
-        try:
-            for i in range(3):
-                self.driver.execute_script(f"window.scrollTo(0, {1000 * (i + 1)});")
-                time.sleep(1.5)
-            
-            self.driver.execute_script("window.scrollTo(0, 500);")
-            time.sleep(1)
-            
-        except Exception as e:
-            pass
+    def _scroll_page(self, max_products: int):
+        """Прокручивает страницу, пока не подгрузится max_products карточек"""
+        ScrollController(self.driver, self.CARD_SELECTOR).scroll_until(max_products)
     
     def _parse_product_card(self, card) -> Optional[Product]:
         """
@@ -212,6 +226,7 @@ class AvitoScraper:
 
             # Фильтрация продавцов с отзывами < 50
             if reviews_count < 50:
+                self.timer.count('rejected_reviews')
                 return None
             
             # Изображение
@@ -0,0 +1,117 @@
+"""
+Бенчмарк памяти: отдельный Chrome на каждый сайт против общих браузеров с вкладками
+
+Выполняет полный поиск по всем 9 сайтам в каждом режиме и замеряет
+суммарную память (RSS) дочерних процессов Chrome/chromedriver.
+
+Запуск:
+    python -m scrapers.browser_benchmark "мотошлем" --max-products 10 --max-browsers 2
+"""
+
+import argparse
+import logging
+import threading
+import time
+from typing import Dict
+
+from .scraper_manager import ScraperManager
+
+# Попытка импорта psutil (нужен для замеров памяти)
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+class MemorySampler:
+    """Фоновый замер суммарной памяти дочерних процессов"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.peak_bytes = 0
+        self.peak_processes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+
+    def sample(self):
+        total = 0
+        children = psutil.Process().children(recursive=True)
+        for child in children:
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                continue
+        self.peak_bytes = max(self.peak_bytes, total)
+        self.peak_processes = max(self.peak_processes, len(children))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+
+def run_mode(share_browser: bool, query: str, max_products: int, max_browsers: int) -> Dict:
+    """Полный прогон по всем сайтам в одном режиме"""
+    manager = ScraperManager(
+        headless=True,
+        use_cache=False,
+        share_browser=share_browser,
+        max_browsers=max_browsers,
+    )
+    # Небольшие магазины должны идти через Selenium, иначе сравнение нечестное
+    manager.static_engine = None
+
+    start = time.perf_counter()
+    with MemorySampler() as sampler:
+        results = manager.search_all(query, max_products=max_products, force_refresh=True)
+        sampler.sample()
+    elapsed = time.perf_counter() - start
+
+    manager.close_all()
+
+    return {
+        'mode': 'shared' if share_browser else 'separate',
+        'peak_mb': round(sampler.peak_bytes / 1024 / 1024, 1),
+        'peak_processes': sampler.peak_processes,
+        'elapsed_sec': round(elapsed, 1),
+        'products': sum(len(items) for items in results.values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк памяти браузеров для полного прогона')
+    parser.add_argument('query', nargs='?', default='мотошлем')
+    parser.add_argument('--max-products', type=int, default=10)
+    parser.add_argument('--max-browsers', type=int, default=2, help='браузеров в общем режиме')
+    args = parser.parse_args()
+
+    if not PSUTIL_AVAILABLE:
+        print("⚠️ Для замеров памяти установите psutil: pip install psutil")
+        return
+
+    logging.disable(logging.INFO)
+
+    rows = [
+        run_mode(False, args.query, args.max_products, args.max_browsers),
+        run_mode(True, args.query, args.max_products, args.max_browsers),
+    ]
+
+    print(f"{'Режим':<10}{'пик, МБ':>10}{'процессов':>11}{'время, с':>10}{'товаров':>9}")
+    for row in rows:
+        print(
+            f"{row['mode']:<10}{row['peak_mb']:>10}{row['peak_processes']:>11}"
+            f"{row['elapsed_sec']:>10}{row['products']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
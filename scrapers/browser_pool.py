@@ -0,0 +1,159 @@
+"""
+Общие браузеры для скраперов
+Вместо отдельного Chrome на каждый сайт несколько экземпляров Chrome
+держат сайты во вкладках. Скрапер получает TabDriver - обертку над
+общим драйвером, которая перед каждой командой переключается на свою вкладку.
+"""
+
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from .driver_factory import get_driver_factory
+
+logger = logging.getLogger(__name__)
+
+
+class SharedBrowser:
+    """Один процесс Chrome с несколькими вкладками"""
+
+    # Фоновые вкладки не должны замедляться, пока работают другие сайты
+    TAB_ARGUMENTS = (
+        '--disable-background-timer-throttling',
+        '--disable-backgrounding-occluded-windows',
+        '--disable-renderer-backgrounding',
+    )
+
+    def __init__(self, profile: str, headless: bool = True, page_load_timeout: int = 60):
+        self.driver = get_driver_factory().create(
+            profile, headless=headless, page_load_timeout=page_load_timeout,
+            extra_arguments=self.TAB_ARGUMENTS,
+        )
+        self.lock = threading.RLock()
+        self.tabs: Dict[str, str] = {}      # владелец -> handle вкладки
+        self._free_handles: List[str] = [self.driver.current_window_handle]
+        self._active_handle: Optional[str] = self.driver.current_window_handle
+
+    def open_tab(self, owner: str) -> 'TabDriver':
+        """Открывает (или переиспользует свободную) вкладку для владельца"""
+        with self.lock:
+            if self._free_handles:
+                handle = self._free_handles.pop()
+            else:
+                self.driver.switch_to.new_window('tab')
+                handle = self.driver.current_window_handle
+                self._active_handle = handle
+            self.tabs[owner] = handle
+            return TabDriver(self, owner, handle)
+
+    def activate(self, handle: str):
+        """Переключает драйвер на вкладку (без лишних команд, если она уже активна)"""
+        if self._active_handle != handle:
+            self.driver.switch_to.window(handle)
+            self._active_handle = handle
+
+    def close_tab(self, owner: str):
+        """Закрывает вкладку владельца; последняя вкладка остается пустой"""
+        with self.lock:
+            handle = self.tabs.pop(owner, None)
+            if not handle:
+                return
+            if len(self.tabs) + len(self._free_handles) == 0:
+                # Последнее окно не закрываем - иначе завершится весь браузер
+                self.activate(handle)
+                self.driver.get('about:blank')
+                self._free_handles.append(handle)
+                return
+            self.activate(handle)
+            self.driver.close()
+            self._active_handle = None
+
+    def quit(self):
+        with self.lock:
+            try:
+                self.driver.quit()
+            finally:
+                self.tabs.clear()
+                self._free_handles.clear()
+
+
+class TabDriver:
+    """
+    Драйвер вкладки: проксирует вызовы к общему драйверу,
+    переключаясь на свою вкладку под блокировкой браузера
+    """
+
+    def __init__(self, browser: SharedBrowser, owner: str, handle: str):
+        self._browser = browser
+        self._owner = owner
+        self._handle = handle
+
+    @property
+    def window_handle(self) -> str:
+        return self._handle
+
+    def __getattr__(self, name):
+        browser = self._browser
+        with browser.lock:
+            browser.activate(self._handle)
+            value = getattr(browser.driver, name)
+
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            with browser.lock:
+                browser.activate(self._handle)
+                return value(*args, **kwargs)
+
+        return call
+
+    def quit(self):
+        """Для скрапера вкладка - это его браузер: закрываем только вкладку"""
+        self._browser.close_tab(self._owner)
+
+
+class BrowserPool:
+    """
+    Распределяет сайты по нескольким общим браузерам
+
+    Браузеры запускаются лениво; вкладки раздаются по кругу.
+    """
+
+    def __init__(self, headless: bool = True, max_browsers: int = 2):
+        """
+        Args:
+            headless: режим без окна
+            max_browsers: сколько процессов Chrome держать для всех сайтов
+        """
+        self.headless = headless
+        self.max_browsers = max(1, max_browsers)
+        self.browsers: List[SharedBrowser] = []
+        self._next = 0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def open_tab(self, owner: str) -> TabDriver:
+        """Вкладка для скрапера (owner - его ключ в ScraperManager)"""
+        with self._lock:
+            if len(self.browsers) < self.max_browsers:
+                browser = SharedBrowser(f'shared_{len(self.browsers) + 1}', self.headless)
+                self.browsers.append(browser)
+                self.logger.info(f"✅ Общий Chrome #{len(self.browsers)} запущен")
+            else:
+                browser = self.browsers[self._next % len(self.browsers)]
+                self._next += 1
+
+        tab = browser.open_tab(owner)
+        self.logger.info(f"🗂️ {owner}: вкладка в общем Chrome ({len(browser.tabs)} вкладок)")
+        return tab
+
+    def close(self):
+        """Завершает все общие браузеры"""
+        with self._lock:
+            for browser in self.browsers:
+                try:
+                    browser.quit()
+                except Exception as e:
+                    self.logger.debug(f"Ошибка закрытия общего браузера: {e}")
+            self.browsers.clear()
@@ -0,0 +1,147 @@
+"""
+Предохранитель (circuit breaker) для сайтов
+Если сайт подряд падает, показывает капчу или отдает пустую выдачу,
+он временно пропускается, чтобы не ждать таймауты на каждом товаре.
+После паузы пропускается один пробный запрос (half-open).
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Состояния по каждому сайту:
+
+    - closed: запросы идут как обычно
+    - open: сайт пропускается до окончания паузы
+    - half_open: разрешен один пробный запрос; успех закрывает цепь, неудача снова открывает
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 600.0):
+        """
+        Args:
+            failure_threshold: сколько неудач подряд открывает цепь
+            cooldown: пауза в секундах до пробного запроса
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._sites: Dict[str, Dict] = {}
+        self._skipped: Dict[str, int] = {}
+
+    def allow(self, site: str) -> bool:
+        """Можно ли сейчас обращаться к сайту (пропуски учитываются в статистике)"""
+        with self._lock:
+            state = self._site(site)
+
+            if state['state'] == self.OPEN:
+                if time.time() - state['opened_at'] >= self.cooldown:
+                    state['state'] = self.HALF_OPEN
+                    self.logger.info(f"🔌 {site}: пробный запрос после паузы")
+                    return True
+            elif state['state'] == self.CLOSED:
+                return True
+
+            # Цепь открыта или пробный запрос уже выполняется
+            self._skipped[site] = self._skipped.get(site, 0) + 1
+            return False
+
+    def is_open(self, site: str) -> bool:
+        """Открыта ли цепь и пауза еще не истекла (без изменения состояния)"""
+        with self._lock:
+            state = self._sites.get(site)
+            return bool(
+                state and state['state'] == self.OPEN
+                and time.time() - state['opened_at'] < self.cooldown
+            )
+
+    def record_success(self, site: str):
+        """Успешный запрос закрывает цепь"""
+        with self._lock:
+            state = self._site(site)
+            if state['state'] != self.CLOSED:
+                self.logger.info(f"✅ {site}: сайт снова доступен")
+            state.update(state=self.CLOSED, failures=0, opened_at=None, last_reason=None)
+
+    def record_failure(self, site: str, reason: str = 'error'):
+        """
+        Неудачный запрос ('error', 'empty', 'captcha')
+
+        Неудача пробного запроса сразу открывает цепь на новую паузу.
+        """
+        with self._lock:
+            state = self._site(site)
+            state['failures'] += 1
+            state['last_reason'] = reason
+
+            if state['state'] == self.HALF_OPEN or state['failures'] >= self.failure_threshold:
+                if state['state'] != self.OPEN:
+                    state['trips'] += 1
+                state['state'] = self.OPEN
+                state['opened_at'] = time.time()
+                self.logger.warning(
+                    f"⛔ {site}: {state['failures']} неудач подряд ({reason}), "
+                    f"сайт пропускается {self.cooldown:.0f} сек"
+                )
+
+    def last_reason(self, site: str) -> Optional[str]:
+        """Причина последней неудачи сайта (None, если сайт работает)"""
+        with self._lock:
+            state = self._sites.get(site)
+            return state['last_reason'] if state else None
+
+    def reset(self, site: str):
+        """Закрывает цепь без пробного запроса (новая сессия браузера начинает с чистого листа)"""
+        with self._lock:
+            state = self._site(site)
+            state.update(state=self.CLOSED, failures=0, opened_at=None, last_reason=None)
+
+    def get_skipped(self) -> Dict[str, int]:
+        """Сколько запросов к каждому сайту пропущено с последнего reset_skipped()"""
+        with self._lock:
+            return dict(self._skipped)
+
+    def reset_skipped(self):
+        """Сбрасывает счетчики пропусков (в начале нового запуска)"""
+        with self._lock:
+            self._skipped = {}
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Состояние цепей по сайтам"""
+        with self._lock:
+            now = time.time()
+            result = {}
+            for site, state in self._sites.items():
+                retry_in: Optional[float] = None
+                if state['state'] == self.OPEN:
+                    retry_in = round(max(0.0, self.cooldown - (now - state['opened_at'])), 1)
+                result[site] = {
+                    'state': state['state'],
+                    'failures': state['failures'],
+                    'trips': state['trips'],
+                    'last_reason': state['last_reason'],
+                    'retry_in_sec': retry_in,
+                    'skipped': self._skipped.get(site, 0),
+                }
+            return result
+
+    def _site(self, site: str) -> Dict:
+        if site not in self._sites:
+            self._sites[site] = {
+                'state': self.CLOSED,
+                'failures': 0,
+                'trips': 0,
+                'opened_at': None,
+                'last_reason': None,
+            }
+        return self._sites[site]
@@ -0,0 +1,263 @@
+"""
+Фабрика Chrome-драйверов
+- патченный chromedriver сохраняется в data/ и переиспользуется между запусками;
+  если он не подходит к обновившемуся Chrome - удаляется и скачивается заново
+- у каждого сайта свой постоянный профиль (cookies и анти-бот токены сохраняются)
+- драйверы можно заранее запустить в фоне при старте сервера
+- время запуска и время до первой страницы собираются в статистику
+"""
+
+import logging
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import undetected_chromedriver as uc
+
+from .replay import wrap_driver
+
+logger = logging.getLogger(__name__)
+
+# Полная строка браузера: усеченный UA (без KHTML/Chrome/Safari) проваливает проверку Cloudflare на WB,
+# а общие браузеры открывают вкладки всех сайтов с одним UA
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+)
+
+
+def build_chrome_options(headless: bool = True, extra_arguments: Iterable[str] = ()):
+    """Опции Chrome, общие для всех скраперов"""
+    options = uc.ChromeOptions()
+
+    if headless:
+        options.add_argument('--headless=new')
+
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--window-size=1920,1080')
+    options.add_argument(f'--user-agent={USER_AGENT}')
+    for argument in extra_arguments:
+        options.add_argument(argument)
+    return options
+
+
+class DriverFactory:
+    """Создает драйверы с кешированным chromedriver и постоянными профилями"""
+
+    DEFAULT_PROFILES_DIR = 'data/chrome_profiles'
+    DEFAULT_DRIVER_DIR = 'data/chromedriver'
+
+    def __init__(self, profiles_dir: str = DEFAULT_PROFILES_DIR, driver_dir: str = DEFAULT_DRIVER_DIR):
+        """
+        Args:
+            profiles_dir: папка с профилями Chrome по сайтам
+            driver_dir: папка для патченного chromedriver
+        """
+        self.profiles_dir = Path(profiles_dir)
+        self.driver_dir = Path(driver_dir)
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._warm: Dict[str, Tuple[object, bool]] = {}  # site -> (заранее запущенный драйвер, headless)
+        self._prelaunching: Dict[str, threading.Event] = {}
+        self._requested_at: Dict[str, float] = {}
+        self._stats: Dict[str, Dict] = {}
+
+    @property
+    def driver_path(self) -> Path:
+        name = 'chromedriver.exe' if sys.platform.startswith('win') else 'chromedriver'
+        return self.driver_dir / name
+
+    def profile_dir(self, site: str) -> str:
+        """Постоянный профиль Chrome для сайта"""
+        path = self.profiles_dir / site.replace('/', '_')
+        path.mkdir(parents=True, exist_ok=True)
+        return str(path.resolve())
+
+    def create(
+        self,
+        site: str,
+        headless: bool = True,
+        page_load_timeout: int = 45,
+        extra_arguments: Iterable[str] = (),
+    ):
+        """
+        Драйвер для сайта: заранее запущенный, если есть, иначе новый
+
+        Args:
+            site: ключ сайта (имя профиля)
+            headless: режим без окна
+            page_load_timeout: таймаут загрузки страницы в секундах
+            extra_arguments: дополнительные аргументы Chrome
+        """
+        self._requested_at[site] = time.perf_counter()
+
+        # Если драйвер сейчас запускается в фоне - дожидаемся его
+        event = self._prelaunching.get(site)
+        if event:
+            event.wait()
+
+        with self._lock:
+            driver, warm_headless = self._warm.pop(site, (None, headless))
+        if driver is not None and warm_headless != headless:
+            # Заранее запущен в другом режиме окна - такой драйвер не подходит
+            self._quit(driver)
+            driver = None
+        if driver is not None:
+            self.logger.info(f"♨️ {site}: используется заранее запущенный Chrome")
+            self._stats.setdefault(site, {})['prelaunched'] = True
+        else:
+            driver = self._launch(site, headless, extra_arguments)
+            self._stats.setdefault(site, {})['prelaunched'] = False
+
+        driver.set_page_load_timeout(page_load_timeout)
+        # В режиме записи/воспроизведения фикстур драйвер оборачивается
+        return wrap_driver(driver)
+
+    def mark_first_page(self, site: str):
+        """Фиксирует время от запроса драйвера до первой загруженной страницы"""
+        requested_at = self._requested_at.pop(site, None)
+        if requested_at is None:
+            return
+        seconds = time.perf_counter() - requested_at
+        self._stats.setdefault(site, {})['time_to_first_page_sec'] = round(seconds, 2)
+        self.logger.info(f"⏱️ {site}: первая страница через {seconds:.1f} сек")
+
+    def prelaunch(self, sites: Iterable[str], headless: bool = True) -> threading.Thread:
+        """Запускает драйверы сайтов в фоновом потоке (по одному, чтобы не гонять патчер)"""
+        sites = [site for site in sites if site not in self._warm]
+        for site in sites:
+            self._prelaunching[site] = threading.Event()
+
+        def runner():
+            for site in sites:
+                try:
+                    driver = self._launch(site, headless)
+                    with self._lock:
+                        self._warm[site] = (driver, headless)
+                except Exception as e:
+                    self.logger.warning(f"⚠️ Не удалось заранее запустить Chrome для {site}: {e}")
+                finally:
+                    self._prelaunching.pop(site).set()
+
+        thread = threading.Thread(target=runner, name='driver-prelaunch', daemon=True)
+        thread.start()
+        self.logger.info(f"🚀 Фоновый запуск Chrome: {', '.join(sites)}")
+        return thread
+
+    def reset_profile(self, site: str):
+        """
+        Удаляет профиль сайта и заранее запущенный драйвер
+
+        Используется после капчи: cookies и токены профиля уже помечены
+        анти-бот защитой, следующая сессия начинается с чистого профиля.
+        """
+        with self._lock:
+            driver, _ = self._warm.pop(site, (None, None))
+        if driver is not None:
+            self._quit(driver)
+        path = self.profiles_dir / site.replace('/', '_')
+        shutil.rmtree(path, ignore_errors=True)
+        self.logger.info(f"🧽 {site}: профиль Chrome сброшен")
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Время запуска и до первой страницы по сайтам"""
+        return {site: dict(stats) for site, stats in self._stats.items()}
+
+    def close(self):
+        """Закрывает заранее запущенные и не востребованные драйверы"""
+        with self._lock:
+            drivers = [driver for driver, _ in self._warm.values()]
+            self._warm.clear()
+        for driver in drivers:
+            self._quit(driver)
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            self.logger.debug(f"Ошибка закрытия драйвера: {e}")
+
+    def _launch(self, site: str, headless: bool, extra_arguments: Iterable[str] = ()):
+        start = time.perf_counter()
+        cached = self.driver_path.exists()
+
+        try:
+            driver = self._start_chrome(site, headless, extra_arguments, cached)
+        except Exception as e:
+            if not cached:
+                raise
+            # Chrome обновился, а сохраненный chromedriver собран под старую версию
+            self.logger.warning(f"⚠️ Сохраненный chromedriver не подошел ({e}), загружаем заново")
+            self._drop_driver_binary()
+            cached = False
+            driver = self._start_chrome(site, headless, extra_arguments, cached)
+
+        if not cached:
+            self._cache_driver_binary(driver)
+
+        seconds = time.perf_counter() - start
+        self._stats.setdefault(site, {}).update(launch_sec=round(seconds, 2), cached_driver=cached)
+        self.logger.info(f"✅ Chrome для {site} запущен за {seconds:.1f} сек")
+        return driver
+
+    def _start_chrome(self, site: str, headless: bool, extra_arguments: Iterable[str], cached: bool):
+        """Запуск Chrome; при ошибке закрывает уже стартовавший процесс браузера (он держит профиль)"""
+        options = build_chrome_options(headless, extra_arguments)
+        kwargs = {'options': options, 'user_data_dir': self.profile_dir(site)}
+        if cached:
+            kwargs['driver_executable_path'] = str(self.driver_path)
+        try:
+            return uc.Chrome(**kwargs)
+        except Exception:
+            # uc запускает браузер до подключения chromedriver и привязывает сессию к options
+            browser_pid = getattr(getattr(options, '_session', None), 'browser_pid', None)
+            if browser_pid:
+                try:
+                    os.kill(browser_pid, signal.SIGTERM)
+                except OSError:
+                    pass
+            raise
+
+    def _drop_driver_binary(self):
+        """Удаляет сохраненный chromedriver"""
+        with self._lock:
+            try:
+                self.driver_path.unlink()
+                self.logger.info(f"🗑️ chromedriver удален: {self.driver_path}")
+            except FileNotFoundError:
+                pass
+
+    def _cache_driver_binary(self, driver):
+        """Сохраняет патченный chromedriver, чтобы не скачивать и не патчить его снова"""
+        try:
+            source = driver.patcher.executable_path
+            self.driver_dir.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                if not self.driver_path.exists():
+                    shutil.copy2(source, self.driver_path)
+                    os.chmod(self.driver_path, 0o755)
+                    self.logger.info(f"💾 chromedriver сохранен: {self.driver_path}")
+        except Exception as e:
+            self.logger.debug(f"Не удалось сохранить chromedriver: {e}")
+
+
+_factory: Optional[DriverFactory] = None
+_factory_lock = threading.Lock()
+
+
+def get_driver_factory() -> DriverFactory:
+    """Общая фабрика процесса"""
+    global _factory
+    with _factory_lock:
+        if _factory is None:
+            _factory = DriverFactory()
+        return _factory
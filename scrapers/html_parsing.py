@@ -0,0 +1,157 @@
+"""
+Общий слой разбора HTML
+Все скраперы строят дерево через lxml (если установлен), а CSS-селекторы
+из конфигурации сайтов компилируются один раз и переиспользуются для
+каждой карточки и каждой страницы. Порядок перебора селекторов сайта
+берется из накопленной статистики срабатываний (selector_stats).
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+import soupsieve as sv
+
+from .selector_stats import get_selector_stats
+
+# Попытка импорта lxml (без него используется встроенный html.parser)
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+HTML_PARSER = 'lxml' if LXML_AVAILABLE else 'html.parser'
+
+logger = logging.getLogger(__name__)
+
+
+def make_soup(html: str, parser: str = HTML_PARSER) -> BeautifulSoup:
+    """Строит дерево документа самым быстрым доступным парсером"""
+    return BeautifulSoup(html, parser)
+
+
+@lru_cache(maxsize=512)
+def compile_selector(css: str) -> Optional[sv.SoupSieve]:
+    """Компилирует CSS-селектор (None - селектор не поддерживается)"""
+    try:
+        return sv.compile(css)
+    except Exception as e:
+        logger.debug(f"Некорректный селектор '{css}': {e}")
+        return None
+
+
+class SelectorPlan:
+    """
+    Скомпилированный список селекторов одного поля
+
+    Элемент конфигурации - строка CSS (берется текст) или
+    словарь {'selector': css, 'attr': имя атрибута}.
+    Если заданы site и group, попытки учитываются в статистике селекторов.
+    """
+
+    def __init__(self, selectors: Optional[List] = None, site: Optional[str] = None, group: str = ''):
+        self.site = site
+        self.group = group
+        self.fields = []
+        for selector in selectors or []:
+            css, attr = selector, 'text'
+            if isinstance(selector, dict):
+                css = selector.get('selector')
+                attr = selector.get('attr', 'text')
+            pattern = compile_selector(css) if css else None
+            if pattern is not None:
+                self.fields.append((css, pattern, attr))
+
+    def reorder(self):
+        """Ставит первыми селекторы, которые чаще срабатывали на этом сайте"""
+        if not self.site or len(self.fields) < 2:
+            return
+        by_css = {field[0]: field for field in self.fields}
+        ranked = get_selector_stats().rank(self.site, self.group, list(by_css))
+        self.fields = [by_css[css] for css in ranked]
+
+    def extract(self, node) -> str:
+        """Текст/атрибут первого подходящего элемента"""
+        stats = get_selector_stats() if self.site else None
+        for css, pattern, attr in self.fields:
+            element = pattern.select_one(node)
+            value = None
+            if element:
+                if attr == 'text':
+                    value = element.get_text(strip=True)
+                else:
+                    value = element.get(attr)
+
+            if stats:
+                stats.observe(self.site, self.group, css, bool(value))
+            if value:
+                return str(value).strip()
+
+        return ""
+
+
+class SitePlan:
+    """Скомпилированные селекторы карточек и полей одного сайта"""
+
+    # Слова в классах, по которым карточки ищутся, если селекторы не сработали
+    FALLBACK_CARD_WORDS = ('product', 'item', 'goods', 'catalog')
+
+    def __init__(self, config: Dict, site: Optional[str] = None):
+        """
+        Args:
+            config: конфигурация селекторов сайта
+            site: ключ сайта для статистики селекторов (None - фиксированный порядок)
+        """
+        self.site = site
+        self.card_selectors = []
+        for css in config.get('product_card_selectors') or []:
+            self.card_selectors.append((css, compile_selector(css)))
+
+        self.title = SelectorPlan(config.get('title_selectors'), site, 'title')
+        self.brand = SelectorPlan(config.get('brand_selectors'), site, 'brand')
+        self.price = SelectorPlan(config.get('price_selectors'), site, 'price')
+
+    def find_cards(self, soup) -> List:
+        """Карточки товаров по первому сработавшему селектору"""
+        stats = None
+        if self.site:
+            # Каждая страница - новый запуск: пересчитываем порядок селекторов
+            stats = get_selector_stats()
+            stats.begin_run(self.site)
+            ranked = stats.rank(self.site, 'cards', [css for css, _ in self.card_selectors])
+            by_css = dict(self.card_selectors)
+            self.card_selectors = [(css, by_css[css]) for css in ranked]
+            for plan in (self.title, self.brand, self.price):
+                plan.reorder()
+
+        for css, pattern in self.card_selectors:
+            if pattern is not None:
+                cards = pattern.select(soup)
+            elif '.' in css:
+                # Падаем обратно на find_all для простых селекторов
+                tag, class_name = css.split('.', 1)
+                cards = soup.find_all(tag, class_=lambda x: x and class_name in str(x))
+            else:
+                cards = soup.find_all(css)
+            if stats:
+                stats.observe(self.site, 'cards', css, bool(cards), len(cards))
+            if cards:
+                return cards
+
+        # Если ничего не найдено, ищем универсально
+        return soup.find_all('div', class_=lambda x: x and any(
+            word in str(x).lower() for word in self.FALLBACK_CARD_WORDS
+        ))
+
+
+_SITE_PLANS: Dict[str, SitePlan] = {}
+
+
+def get_site_plan(site: str, config: Dict) -> SitePlan:
+    """Скомпилированный план сайта (строится при первом обращении)"""
+    plan = _SITE_PLANS.get(site)
+    if plan is None:
+        plan = _SITE_PLANS[site] = SitePlan(config, site)
+    return plan
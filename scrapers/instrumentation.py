@@ -0,0 +1,127 @@
+"""
+Замеры времени по фазам поиска
+Скрапер отмечает конец каждой фазы (lap), время между отметками
+суммируется по имени фазы: driver_init, navigate, wait, scroll,
+page_source, parse, convert. Счетчики карточек (found, parsed, rejected)
+ведутся там же. ScrapeMetrics сводит замеры поисков по сайтам и пишет
+каждый поиск в лог одной JSON-строкой (логгер scrapers.metrics).
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+metrics_logger = logging.getLogger('scrapers.metrics')
+
+
+class PhaseTimer:
+    """
+    Секундомер с кругами
+
+        timer = PhaseTimer()
+        self.driver.get(url)
+        timer.lap('navigate')
+        time.sleep(3)
+        timer.lap('wait')
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._started = time.perf_counter()
+        self._last = self._started
+
+    def lap(self, phase: str) -> float:
+        """Добавляет время с предыдущей отметки к фазе и возвращает его"""
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+        self._last = now
+        return elapsed
+
+    def count(self, name: str, amount: int = 1):
+        """Увеличивает счетчик карточек (found, parsed, rejected, rejected_<причина>)"""
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def skip(self):
+        """Начинает отсчет заново, не относя прошедшее время ни к одной фазе"""
+        self._last = time.perf_counter()
+
+    @property
+    def total(self) -> float:
+        """Время с создания таймера"""
+        return time.perf_counter() - self._started
+
+    def as_dict(self) -> Dict[str, float]:
+        """Фазы в секундах (округлено) плюс общее время"""
+        result = {phase: round(seconds, 3) for phase, seconds in self.phases.items()}
+        result['total'] = round(self.total, 3)
+        return result
+
+    def report(self) -> Dict:
+        """Фазы и счетчики карточек"""
+        return {'phases': self.as_dict(), 'cards': dict(self.counters)}
+
+
+class ScrapeMetrics:
+    """Сводка замеров по сайтам: суммы фаз, счетчики карточек, число поисков"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sites: Dict[str, Dict] = {}
+
+    def record(
+        self,
+        site: str,
+        query: str,
+        source: str,
+        phases: Dict[str, float],
+        cards: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Добавляет замеры одного поиска
+
+        Args:
+            site: ключ сайта
+            query: поисковый запрос
+            source: откуда результат (selenium, static, cache, skipped)
+            phases: секунды по фазам (включая total)
+            cards: счетчики карточек
+        """
+        cards = cards or {}
+        metrics_logger.info(json.dumps({
+            'event': 'scrape',
+            'site': site,
+            'query': query,
+            'source': source,
+            'phases': phases,
+            'cards': cards,
+        }, ensure_ascii=False))
+
+        with self._lock:
+            summary = self.sites.setdefault(site, {'searches': 0, 'sources': {}, 'phases': {}, 'cards': {}})
+            summary['searches'] += 1
+            summary['sources'][source] = summary['sources'].get(source, 0) + 1
+            for phase, seconds in phases.items():
+                summary['phases'][phase] = summary['phases'].get(phase, 0.0) + seconds
+            for name, amount in cards.items():
+                summary['cards'][name] = summary['cards'].get(name, 0) + amount
+
+    def summary(self) -> Dict[str, Dict]:
+        """Сводка по сайтам (секунды округлены)"""
+        with self._lock:
+            return {
+                site: {
+                    'searches': data['searches'],
+                    'sources': dict(data['sources']),
+                    'phases': {phase: round(seconds, 3) for phase, seconds in data['phases'].items()},
+                    'cards': dict(data['cards']),
+                }
+                for site, data in self.sites.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self.sites.clear()
@@ -3,40 +3,38 @@ Selenium скрапер для OZON
 На основе подробного отчета по парсингу OZON.RU
 """
 
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
 import time
 import re
 import logging
-from dataclasses import dataclass
 from typing import List, Optional
 from urllib.parse import quote
 import random
 
-@dataclass
-class Product:
-    title: str
-    price: float
-    old_price: Optional[float] = None
-    url: str = ""
-    source: str = "OZON"
-    availability: str = "unknown"
-    brand: str = ""
-    rating: float = 0.0
-    reviews_count: int = 0
-    image_url: str = ""
-
+from .antibot import BlockedError, check_driver
+from .html_parsing import make_soup
+from .instrumentation import PhaseTimer
+from .product import Product
+from .driver_factory import get_driver_factory
+from .rate_limiter import get_rate_limiter
+from .scroll_controller import ScrollController
+from .structured_data import StructuredDataExtractor, merge_products
 
 class OzonScraper:
     """Selenium скрапер для OZON"""
     
+    # Ссылки на товары (считаются уникальные href при прокрутке)
+    CARD_SELECTOR = "a[href*='/product/']"
+    
     def __init__(self, headless: bool = True):
         self.headless = headless
         self.driver = None
         self.logger = logging.getLogger(__name__)
+        self.rate_limiter = get_rate_limiter()
+        self.timer = PhaseTimer()  # замеры последнего поиска
+        self.structured_extractor = StructuredDataExtractor('https://www.ozon.ru')
         logging.basicConfig(level=logging.INFO)
     
     def _init_driver(self):
@@ -45,20 +43,9 @@ class OzonScraper:
             return
         
         try:
-            options = uc.ChromeOptions()
-            
-            if self.headless:
-                options.add_argument('--headless=new')
-            
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-gpu')
-            options.add_argument('--window-size=1920,1080')
-            options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-            
-            self.driver = uc.Chrome(options=options)
-            self.driver.set_page_load_timeout(45)  # Увеличен timeout
+            self.driver = get_driver_factory().create(
+                'ozon', headless=self.headless, page_load_timeout=45
+            )
             
             self.logger.info("✅ Chrome драйвер инициализирован")
             
@@ -69,22 +56,42 @@ class OzonScraper:
     def search(self, query: str, max_products: int = 20) -> List[Product]:
         """Поиск товаров на OZON"""
         products = []
+        structured = []
+        timer = self.timer = PhaseTimer()
         
         try:
             self._init_driver()
+            timer.lap('driver_init')
             
             search_url = f"https://www.ozon.ru/search/?text={quote(query)}"
             
             self.logger.info(f"🔍 Поиск на OZON: {query}")
             self.logger.info(f"📍 URL: {search_url}")
             
+            self.rate_limiter.acquire(search_url)
+            timer.lap('rate_limit')
             self.driver.get(search_url)
+            get_driver_factory().mark_first_page('ozon')
+            timer.lap('navigate')
             
             # Ждем загрузки
             time.sleep(random.uniform(4, 6))
+            timer.lap('wait')
+            check_driver(self.driver, 'ozon')
+            
+            # Сначала пробуем встроенные JSON-данные (JSON-LD, состояние страницы)
+            structured = self.structured_extractor.extract_products(self.driver, "OZON", max_products, timer)
+            timer.lap('parse')
+            if len(structured) >= max_products:
+                self.logger.info(f"✅ Успешно спарсено из JSON-данных: {len(structured)} товаров")
+                return structured
+            if structured:
+                # Данных меньше, чем нужно - добираем карточки из DOM
+                self.logger.info(f"📦 Из JSON-данных: {len(structured)} товаров, дополняем из DOM")
             
             # Прокручиваем
-            self._scroll_page()
+            self._scroll_page(max_products)
+            timer.lap('scroll')
             
             # Сначала пробуем извлечь через Selenium (более надежно для динамического контента)
             try:
@@ -108,6 +115,7 @@ class OzonScraper:
                         if not href or href in seen_urls:
                             continue
                         seen_urls.add(href)
+                        timer.count('found')
                         
                         # Пробуем извлечь название через Selenium
                         title = ""
@@ -178,7 +186,7 @@ class OzonScraper:
                                 # Получаем HTML карточки для парсинга
                                 card_html = link_elem.find_element(By.XPATH, "./ancestor::div[contains(@class, 'tile') or contains(@data-widget, 'search')][1]")
                                 card_html_source = card_html.get_attribute('outerHTML')
-                                soup_card = BeautifulSoup(card_html_source, 'html.parser')
+                                soup_card = make_soup(card_html_source)
                                 product = self._parse_product_card(soup_card, href=href)
                             except Exception as e:
                                 product = None
@@ -279,16 +287,22 @@ class OzonScraper:
                         
                         if product:
                             products.append(product)
+                            timer.count('parsed')
+                        else:
+                            timer.count('rejected')
                     
                     except Exception as e:
-                        pass
+                        timer.count('rejected')
             
             except Exception as e:
                 pass
+            timer.lap('convert')
             
             # Если через Selenium ничего не нашли, используем BeautifulSoup (старый метод)
             if len(products) == 0:
-                soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+                html = self.driver.page_source
+                timer.lap('page_source')
+                soup = make_soup(html)
                 
                 # OZON использует разные классы для карточек
                 cards = soup.find_all('div', {'data-widget': 'searchResultsV2'})
@@ -320,35 +334,35 @@ class OzonScraper:
                             continue
                 
                 self.logger.info(f"📦 Найдено карточек: {len(cards)}")
+                timer.count('found', len(cards))
+                timer.lap('parse')
                 
                 for card in cards[:max_products]:
                     try:
                         product = self._parse_product_card(card)
                         if product:
                             products.append(product)
+                            timer.count('parsed')
+                        else:
+                            timer.count('rejected')
                     except Exception as e:
+                        timer.count('rejected')
                         self.logger.debug(f"Ошибка парсинга карточки: {e}")
                         continue
+                timer.lap('convert')
             
             self.logger.info(f"✅ Успешно спарсено: {len(products)} товаров")
             
+        except BlockedError:
+            raise
         except Exception as e:
             self.logger.error(f"❌ Ошибка поиска: {e}")
         
-        return products
+        return merge_products(structured, products, max_products)
     
-    def _scroll_page(self):
-        """Прокручивает страницу"""
-        try:
-            for i in range(3):
-                self.driver.execute_script(f"window.scrollTo(0, {1000 * (i + 1)});")
-                time.sleep(1.5)
-            
-            self.driver.execute_script("window.scrollTo(0, 500);")
-            time.sleep(1)
-            
-        except Exception as e:
-            pass
+    def _scroll_page(self, max_products: int):
+        """Прокручивает страницу, пока не подгрузится max_products карточек"""
+        ScrollController(self.driver, self.CARD_SELECTOR, unique_href=True).scroll_until(max_products)
     
     def _parse_product_card(self, card, href: str = None) -> Optional[Product]:
         """
@@ -0,0 +1,126 @@
+"""
+Бенчмарк разбора сохраненных страниц поиска
+
+Сравнивает старый путь (html.parser + разбор строк селекторов для каждой
+карточки) с новым (lxml + скомпилированные планы сайтов).
+
+Страницы раскладываются по папкам доменов:
+    data/pages/mr-moto.ru/шлем.html
+    data/pages/flipup.ru/куртка.html
+
+Запуск:
+    python -m scrapers.parse_benchmark data/pages --repeat 20
+"""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from .html_parsing import HTML_PARSER, SitePlan, make_soup
+from .universal_scraper import UniversalScraper
+
+
+def legacy_extract(soup, config: Dict, max_products: int) -> int:
+    """Старый путь: селекторы передаются строками и разбираются на каждом вызове"""
+    cards = []
+    for selector in config.get('product_card_selectors') or []:
+        cards = soup.select(selector)
+        if cards:
+            break
+
+    fields = 0
+    for card in cards[:max_products]:
+        for key in ('title_selectors', 'brand_selectors', 'price_selectors'):
+            for selector in config.get(key) or []:
+                css = selector.get('selector') if isinstance(selector, dict) else selector
+                if card.select_one(css):
+                    fields += 1
+                    break
+    return fields
+
+
+def compiled_extract(soup, plan: SitePlan, max_products: int) -> int:
+    """Новый путь: скомпилированный план сайта"""
+    fields = 0
+    for card in plan.find_cards(soup)[:max_products]:
+        for field_plan in (plan.title, plan.brand, plan.price):
+            if field_plan.extract(card):
+                fields += 1
+    return fields
+
+
+def run_benchmark(pages_dir: str, repeat: int = 10, max_products: int = 20) -> List[Dict]:
+    """
+    Прогоняет оба пути по всем сохраненным страницам
+
+    Returns:
+        список строк отчета по сайтам (время в миллисекундах на страницу)
+    """
+    scraper = UniversalScraper(headless=True)
+    report = []
+
+    for site_dir in sorted(Path(pages_dir).iterdir()):
+        pages = sorted(site_dir.glob('*.html')) if site_dir.is_dir() else []
+        if not pages:
+            continue
+
+        site = site_dir.name
+        config = scraper.get_site_config(site)
+        plan = SitePlan(config)
+        htmls = [page.read_text(encoding='utf-8', errors='ignore') for page in pages]
+
+        timings = {'legacy': 0.0, 'compiled': 0.0}
+        fields = {'legacy': 0, 'compiled': 0}
+        for _ in range(repeat):
+            for html in htmls:
+                start = time.perf_counter()
+                fields['legacy'] = legacy_extract(make_soup(html, 'html.parser'), config, max_products)
+                timings['legacy'] += time.perf_counter() - start
+
+                start = time.perf_counter()
+                fields['compiled'] = compiled_extract(make_soup(html), plan, max_products)
+                timings['compiled'] += time.perf_counter() - start
+
+        runs = repeat * len(htmls)
+        legacy_ms = timings['legacy'] / runs * 1000
+        compiled_ms = timings['compiled'] / runs * 1000
+        report.append({
+            'site': site,
+            'pages': len(htmls),
+            'legacy_ms': round(legacy_ms, 2),
+            'compiled_ms': round(compiled_ms, 2),
+            'speedup': round(legacy_ms / compiled_ms, 2) if compiled_ms else 0.0,
+            'fields_legacy': fields['legacy'],
+            'fields_compiled': fields['compiled'],
+        })
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк разбора сохраненных страниц поиска')
+    parser.add_argument('pages_dir', nargs='?', default='data/pages', help='папка с сохраненными страницами')
+    parser.add_argument('--repeat', type=int, default=10, help='количество повторов на страницу')
+    parser.add_argument('--max-products', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    report = run_benchmark(args.pages_dir, args.repeat, args.max_products)
+    if not report:
+        print(f"⚠️ В {args.pages_dir} нет сохраненных страниц (<домен>/*.html)")
+        return
+
+    print(f"Парсер нового пути: {HTML_PARSER}")
+    print(f"{'Сайт':<18}{'страниц':>8}{'старый, мс':>12}{'новый, мс':>12}{'ускорение':>11}{'поля':>12}")
+    for row in report:
+        print(
+            f"{row['site']:<18}{row['pages']:>8}{row['legacy_ms']:>12}{row['compiled_ms']:>12}"
+            f"{row['speedup']:>10}x{row['fields_legacy']:>6}/{row['fields_compiled']:<5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
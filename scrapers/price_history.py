@@ -0,0 +1,256 @@
+"""
+История цен спарсенных предложений
+Каждый запуск дописывает точки (предложение, время) с ценой, старой ценой,
+рейтингом и числом отзывов в SQLite. Разовые отчеты в data/reports/ остаются,
+а история позволяет строить траектории цен между запусками:
+
+    history = PriceHistoryStore()
+    history.record(products)                         # после парсинга
+    history.link_product('hjc-rpha-71', urls)        # после сопоставления с 1С
+    history.trajectory(product_id='hjc-rpha-71', days=30)
+
+Точки хранятся в таблице WITHOUT ROWID с ключом (offer_id, ts): выборка
+одного предложения за период - это последовательное чтение по индексу.
+compact() прореживает старые точки до одной в день.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .product import to_plain
+from .product_dedup import product_key
+from .query_normalizer import normalize_query
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+
+class PriceHistoryStore:
+    """Append-only хранилище точек цены по предложениям маркетплейсов"""
+
+    DEFAULT_PATH = 'data/price_history.sqlite3'
+
+    def __init__(self, db_path: str = DEFAULT_PATH):
+        """
+        Args:
+            db_path: путь к файлу SQLite
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(
+            '''
+            CREATE TABLE IF NOT EXISTS offers (
+                id INTEGER PRIMARY KEY,
+                offer_key TEXT NOT NULL UNIQUE,
+                site TEXT NOT NULL,
+                url TEXT NOT NULL,
+                title TEXT NOT NULL,
+                query TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS idx_offers_query ON offers (query);
+
+            CREATE TABLE IF NOT EXISTS price_points (
+                offer_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                price REAL NOT NULL,
+                old_price REAL,
+                rating REAL,
+                reviews_count INTEGER,
+                PRIMARY KEY (offer_id, ts)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_price_points_ts ON price_points (ts);
+
+            CREATE TABLE IF NOT EXISTS product_offers (
+                product_id TEXT NOT NULL,
+                offer_id INTEGER NOT NULL,
+                PRIMARY KEY (product_id, offer_id)
+            ) WITHOUT ROWID;
+            '''
+        )
+        self._conn.commit()
+
+    def record(self, products: Iterable, ts: Optional[float] = None) -> int:
+        """
+        Дописывает точки цены одного запуска
+
+        Args:
+            products: Product, ProductView или словари (нужны url и price)
+            ts: время замера (по умолчанию - сейчас); товары из кеша
+                записываются со временем своего парсинга (scraped_at)
+
+        Returns:
+            число записанных точек
+        """
+        ts = int(ts if ts is not None else time.time())
+        points = []
+        with self._lock:
+            for item in products:
+                data = to_plain(item)
+                key = product_key(data.get('url', ''))
+                if not key or not data.get('price'):
+                    continue
+                offer_id = self._offer_id(key, data)
+                points.append((
+                    offer_id, int(data.get('scraped_at') or ts), float(data['price']), data.get('old_price'),
+                    data.get('rating') or None, data.get('reviews_count') or None,
+                ))
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO price_points '
+                '(offer_id, ts, price, old_price, rating, reviews_count) VALUES (?, ?, ?, ?, ?, ?)',
+                points,
+            )
+            self._conn.commit()
+        return len(points)
+
+    def link_product(self, product_id: str, urls: Iterable[str]) -> int:
+        """Привязывает предложения (по URL) к товару 1С; возвращает число привязок"""
+        keys = {key for key in (product_key(url) for url in urls) if key}
+        if not product_id or not keys:
+            return 0
+        with self._lock:
+            placeholders = ','.join('?' * len(keys))
+            rows = self._conn.execute(
+                f'SELECT id FROM offers WHERE offer_key IN ({placeholders})', tuple(keys)
+            ).fetchall()
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO product_offers (product_id, offer_id) VALUES (?, ?)',
+                [(product_id, offer_id) for (offer_id,) in rows],
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def trajectory(
+        self,
+        product_id: Optional[str] = None,
+        query: Optional[str] = None,
+        url: Optional[str] = None,
+        days: float = 30,
+        until: Optional[float] = None,
+    ) -> Dict[str, List[Dict]]:
+        """
+        Траектории цен предложений за период
+
+        Предложения выбираются по товару 1С, поисковому запросу или URL.
+
+        Returns:
+            {ключ предложения: [{'ts', 'price', 'old_price', 'rating', 'reviews_count', 'site'}, ...]}
+        """
+        until = int(until if until is not None else time.time())
+        since = until - int(days * DAY)
+
+        if product_id:
+            offers_sql = 'SELECT offer_id FROM product_offers WHERE product_id = ?'
+            param = product_id
+        elif query:
+            offers_sql = 'SELECT id FROM offers WHERE query = ?'
+            param = normalize_query(query)
+        elif url:
+            offers_sql = 'SELECT id FROM offers WHERE offer_key = ?'
+            param = product_key(url)
+        else:
+            raise ValueError("Нужен product_id, query или url")
+
+        with self._lock:
+            rows = self._conn.execute(
+                f'''
+                SELECT o.offer_key, o.site, p.ts, p.price, p.old_price, p.rating, p.reviews_count
+                FROM price_points p JOIN offers o ON o.id = p.offer_id
+                WHERE p.offer_id IN ({offers_sql}) AND p.ts BETWEEN ? AND ?
+                ORDER BY p.offer_id, p.ts
+                ''',
+                (param, since, until),
+            ).fetchall()
+
+        result: Dict[str, List[Dict]] = {}
+        for offer_key, site, ts, price, old_price, rating, reviews_count in rows:
+            result.setdefault(offer_key, []).append({
+                'ts': ts, 'site': site, 'price': price, 'old_price': old_price,
+                'rating': rating, 'reviews_count': reviews_count,
+            })
+        return result
+
+    def compact(self, keep_days: float = 30, vacuum: bool = False) -> int:
+        """
+        Прореживает историю: точки старше keep_days - по одной (последней) в сутки
+
+        Returns:
+            число удаленных точек
+        """
+        cutoff = int(time.time() - keep_days * DAY)
+        with self._lock:
+            cursor = self._conn.execute(
+                '''
+                DELETE FROM price_points
+                WHERE ts < ? AND EXISTS (
+                    SELECT 1 FROM price_points later
+                    WHERE later.offer_id = price_points.offer_id
+                      AND later.ts > price_points.ts
+                      AND later.ts / ? = price_points.ts / ?
+                )
+                ''',
+                (cutoff, DAY, DAY),
+            )
+            removed = cursor.rowcount
+            self._conn.commit()
+            if vacuum:
+                self._conn.execute('VACUUM')
+        if removed:
+            logger.info(f"🗜️ История цен: удалено {removed} точек старше {keep_days:g} дн.")
+        return removed
+
+    def get_stats(self) -> Dict:
+        """Размер истории"""
+        with self._lock:
+            offers = self._conn.execute('SELECT COUNT(*) FROM offers').fetchone()[0]
+            points, first_ts, last_ts = self._conn.execute(
+                'SELECT COUNT(*), MIN(ts), MAX(ts) FROM price_points'
+            ).fetchone()
+        return {'offers': offers, 'points': points, 'first_ts': first_ts, 'last_ts': last_ts}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _offer_id(self, key: str, data: Dict) -> int:
+        """id предложения (создается при первой встрече); вызывается под блокировкой"""
+        row = self._conn.execute('SELECT id FROM offers WHERE offer_key = ?', (key,)).fetchone()
+        if row:
+            return row[0]
+        cursor = self._conn.execute(
+            'INSERT INTO offers (offer_key, site, url, title, query) VALUES (?, ?, ?, ?, ?)',
+            (
+                key, data.get('source', ''), data.get('url', ''), data.get('title', ''),
+                normalize_query(data.get('query', '')),
+            ),
+        )
+        return cursor.lastrowid
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='История цен: статистика и прореживание')
+    parser.add_argument('--db', default=PriceHistoryStore.DEFAULT_PATH)
+    parser.add_argument('--compact', action='store_true', help='проредить старые точки')
+    parser.add_argument('--keep-days', type=float, default=30, help='сколько дней хранить все точки')
+    parser.add_argument('--vacuum', action='store_true', help='сжать файл после прореживания')
+    args = parser.parse_args()
+
+    store = PriceHistoryStore(args.db)
+    if args.compact:
+        removed = store.compact(args.keep_days, vacuum=args.vacuum)
+        print(f"Удалено точек: {removed}")
+    print(store.get_stats())
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Общая запись товара для всех скраперов
+Скраперы создают Product напрямую, менеджер и система работают с теми же
+объектами: без промежуточных dataclass, getattr-конвертации и asdict.
+
+- __slots__ вместо __dict__ - меньше памяти на карточку
+- view() - словарь-представление без копирования (matcher, отчеты)
+- to_json()/write_ndjson() - построчная сериализация (NDJSON)
+"""
+
+import json
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+
+PRODUCT_FIELDS = (
+    'title', 'price', 'old_price', 'url', 'source', 'availability',
+    'brand', 'rating', 'reviews_count', 'image_url', 'location', 'seller',
+)
+_FIELD_SET = frozenset(PRODUCT_FIELDS)
+
+
+class Product:
+    """Товар с маркетплейса или сайта конкурента"""
+
+    __slots__ = PRODUCT_FIELDS + ('extra',)
+
+    def __init__(
+        self,
+        title: str,
+        price: float,
+        old_price: Optional[float] = None,
+        url: str = "",
+        source: str = "",
+        availability: str = "unknown",
+        brand: str = "",
+        rating: float = 0.0,
+        reviews_count: int = 0,
+        image_url: str = "",
+        location: str = "",
+        seller: str = "",
+    ):
+        self.title = title
+        self.price = price
+        self.old_price = old_price
+        self.url = url
+        self.source = source
+        self.availability = availability
+        self.brand = brand
+        self.rating = rating
+        self.reviews_count = reviews_count
+        self.image_url = image_url
+        self.location = location
+        self.seller = seller
+        self.extra: Optional[Dict] = None  # поля вне схемы (query, queries) - по требованию
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Product':
+        """Из словаря (кеш, NDJSON); неизвестные ключи уходят в extra"""
+        product = cls(**{name: data[name] for name in PRODUCT_FIELDS if name in data})
+        extra = {key: value for key, value in data.items() if key not in _FIELD_SET}
+        if extra:
+            product.extra = extra
+        return product
+
+    def view(self) -> 'ProductView':
+        """Словарь-представление без копирования полей"""
+        return ProductView(self)
+
+    def to_dict(self) -> Dict:
+        """Плоская копия полей (без глубокого копирования)"""
+        data = {name: getattr(self, name) for name in PRODUCT_FIELDS}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_json(self) -> str:
+        """Одна строка NDJSON"""
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Product):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"Product(title={self.title!r}, price={self.price!r}, source={self.source!r}, url={self.url!r})"
+
+
+class ProductView(MutableMapping):
+    """
+    Товар в виде словаря: чтение и запись идут прямо в Product
+
+    Ключи схемы - поля записи, остальные (query, queries) хранятся в extra.
+    """
+
+    __slots__ = ('product',)
+
+    def __init__(self, product: Product):
+        self.product = product
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self.product, key)
+        extra = self.product.extra
+        if extra is None:
+            raise KeyError(key)
+        return extra[key]
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            setattr(self.product, key, value)
+            return
+        if self.product.extra is None:
+            self.product.extra = {}
+        self.product.extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _FIELD_SET or not self.product.extra:
+            raise KeyError(key)
+        del self.product.extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from PRODUCT_FIELDS
+        if self.product.extra:
+            yield from self.product.extra
+
+    def __len__(self) -> int:
+        return len(PRODUCT_FIELDS) + len(self.product.extra or ())
+
+    def __repr__(self) -> str:
+        return f"ProductView({self.product!r})"
+
+
+def to_plain(item) -> Dict:
+    """Обычный dict из Product, ProductView или словаря (для json.dump(default=...))"""
+    if isinstance(item, Product):
+        return item.to_dict()
+    if isinstance(item, ProductView):
+        return item.product.to_dict()
+    return dict(item)
+
+
+def write_ndjson(items: Iterable, fp: TextIO) -> int:
+    """Пишет товары построчно (NDJSON); возвращает количество строк"""
+    count = 0
+    for item in items:
+        fp.write(json.dumps(to_plain(item), ensure_ascii=False))
+        fp.write('\n')
+        count += 1
+    return count
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[Product]:
+    """Читает товары из строк NDJSON (пустые строки пропускаются)"""
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield Product.from_dict(json.loads(line))
@@ -0,0 +1,94 @@
+"""
+Дедупликация спарсенных товаров между запросами
+Одна и та же карточка (nm-id Wildberries, /product/<id> OZON) находится
+по нескольким запросам 1С. Ключ карточки - нативный ID маркетплейса,
+а если его нет - ссылка без параметров; дубликаты сливаются в одну запись
+со списком запросов, которые ее нашли.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Хост -> (префикс ключа, регулярка ID товара в пути)
+MARKETPLACE_ID_PATTERNS: Tuple[Tuple[str, str, re.Pattern], ...] = (
+    ('wildberries.ru', 'wb', re.compile(r'/catalog/(\d+)')),
+    ('ozon.ru', 'ozon', re.compile(r'/product/(?:[^/]*-)?(\d+)')),
+    ('market.yandex.ru', 'ym', re.compile(r'/(?:product--[^/]+|product|card/[^/]+)/(\d+)')),
+    ('avito.ru', 'avito', re.compile(r'_(\d+)/?$')),
+)
+
+# Поля, которые дубликат может дополнить, если в первой записи они пустые
+FILLABLE_FIELDS = ('brand', 'old_price', 'rating', 'reviews_count', 'image_url', 'location', 'seller')
+
+
+def canonical_url(url: str) -> str:
+    """'https://www.ozon.ru/product/x-1/?from=s' -> 'ozon.ru/product/x-1'"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return f"{host}{parts.path.rstrip('/')}"
+
+
+def product_key(url: str) -> Optional[str]:
+    """
+    Ключ карточки для дедупликации
+
+    'https://www.wildberries.ru/catalog/123/detail.aspx' -> 'wb:123'
+    неизвестный магазин -> канонический URL
+    """
+    if not url:
+        return None
+    key = canonical_url(url)
+    host, _, path = key.partition('/')
+    for domain, prefix, pattern in MARKETPLACE_ID_PATTERNS:
+        if host == domain or host.endswith('.' + domain):
+            match = pattern.search('/' + path)
+            if match:
+                return f"{prefix}:{match.group(1)}"
+    return key
+
+
+class ProductDeduplicator:
+    """
+    Сливает товары, найденные по разным запросам
+
+        dedup = ProductDeduplicator()
+        record = dedup.add(product_dict, query)   # общая запись для всех дубликатов
+        dedup.products                            # уникальные товары
+    """
+
+    def __init__(self):
+        self._by_key: Dict[str, Dict] = {}
+        self.products: List[Dict] = []
+        self.duplicates = 0
+
+    def add(self, product: Dict, query: str = '') -> Dict:
+        """
+        Добавляет товар; возвращает запись, в которую он попал
+
+        У записи есть поле queries - запросы, по которым карточка найдена
+        (поле query остается первым из них).
+        """
+        key = product_key(product.get('url', ''))
+        record = self._by_key.get(key) if key else None
+
+        if record is None:
+            record = product
+            record['queries'] = [query] if query else []
+            if key:
+                self._by_key[key] = record
+            self.products.append(record)
+            return record
+
+        self.duplicates += 1
+        if query and query not in record['queries']:
+            record['queries'].append(query)
+        for field in FILLABLE_FIELDS:
+            if not record.get(field) and product.get(field):
+                record[field] = product[field]
+        return record
+
+    def __len__(self) -> int:
+        return len(self.products)
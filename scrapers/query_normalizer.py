@@ -0,0 +1,89 @@
+"""
+Нормализация поисковых запросов
+Общие правила приведения запросов к каноническому виду для кеша и планировщика
+"""
+
+import re
+
+# Всё, кроме букв, цифр и пробелов, заменяем пробелом (дефис внутри моделей сохраняем)
+NON_WORD_RE = re.compile(r'[^\w\s\-]+', re.UNICODE)
+SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """
+    Приводит запрос к каноническому виду
+
+    'Мотошлем  HJC RPHA-71, (Чёрный)' -> 'мотошлем hjc rpha-71 черный'
+    """
+    if not query:
+        return ""
+    text = query.lower().replace('ё', 'е')
+    text = NON_WORD_RE.sub(' ', text)
+    text = SPACES_RE.sub(' ', text)
+    return text.strip(' -')
+
+
+# Значения из variation парсера 1С: 'Цвет:Black;Размер:42#Цвет:Black;Размер:45#'
+VARIATION_VALUE_RE = re.compile(r'(?:цвет|color|размер|size)\s*:\s*([^;#\n]+)', re.IGNORECASE)
+
+# 'размер: XL', 'р-р 58', 'цвет: черный'
+LABELED_ATTR_RE = re.compile(
+    r'\b(?:размер|size|р-р|цвет|color)\b\s*[:.]?\s*[\w/\-]+',
+    re.IGNORECASE,
+)
+
+# Буквенные размеры пишутся заглавными: S, XL, 3XL; числовые - с единицами
+LETTER_SIZE_RE = re.compile(r'(?<![\w\-])(?:X{0,3}S|M|X{0,4}L|[2-6]XL)(?![\w\-])')
+NUMERIC_SIZE_RE = re.compile(r'\b\d{2,3}(?:-\d{2,3})?\s*см\b', re.IGNORECASE)
+
+RU_COLOR_STEMS = (
+    'черн', 'бел', 'красн', 'син', 'сер', 'зелен', 'желт', 'оранжев', 'фиолетов',
+    'розов', 'голуб', 'коричнев', 'бордов', 'серебрист', 'золотист', 'матов', 'глянцев',
+)
+RU_COLOR_RE = re.compile(
+    r'(?<![\w\-])(?:(?:{stems})[ое]-)*(?:{stems})(?:ый|ий|ой|ая|яя|ое|ее|ые|ие)(?![\w\-])'.format(
+        stems='|'.join(RU_COLOR_STEMS)
+    ),
+    re.IGNORECASE,
+)
+EN_COLOR_RE = re.compile(
+    r'(?<![\w\-])(?:black|white|red|blue|green|yellow|orange|grey|gray|pink|purple|'
+    r'matt|matte|glossy|camo|fluo)(?:[-/](?:black|white|red|blue|green|yellow|orange|'
+    r'grey|gray|pink|purple|camo|fluo))*(?![\w\-])',
+    re.IGNORECASE,
+)
+EMPTY_BRACKETS_RE = re.compile(r'\(\s*[,;/\-]*\s*\)')
+SPACE_BEFORE_PUNCT_RE = re.compile(r'\s+([,;])')
+
+
+def canonicalize_product_name(name: str, variation: str = "") -> str:
+    """
+    Убирает из названия товара размеры и цвета, чтобы варианты одной модели
+    давали одинаковый поисковый запрос
+
+    'Куртка DragonFly Sport красный L' -> 'Куртка DragonFly Sport'
+    """
+    if not name:
+        return ""
+
+    text = name
+    # Значения из variation (в том числе многословные: 'Black Ops', '152-158 см')
+    values = {value.strip() for value in VARIATION_VALUE_RE.findall(variation or '')}
+    for value in sorted(values, key=len, reverse=True):
+        if len(value) >= 2:
+            text = re.sub(
+                r'(?<![\w\-]){}(?![\w\-])'.format(re.escape(value)), ' ', text, flags=re.IGNORECASE
+            )
+
+    for regex in (LABELED_ATTR_RE, NUMERIC_SIZE_RE, LETTER_SIZE_RE, RU_COLOR_RE, EN_COLOR_RE):
+        text = regex.sub(' ', text)
+
+    text = EMPTY_BRACKETS_RE.sub(' ', text)
+    text = SPACES_RE.sub(' ', text).strip()
+    text = SPACE_BEFORE_PUNCT_RE.sub(r'\1', text).strip(' ,;/-')
+
+    # Если от названия почти ничего не осталось, ищем по исходному
+    if len(text) < 3:
+        return name.strip()
+    return text
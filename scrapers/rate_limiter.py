@@ -0,0 +1,321 @@
+"""
+Общий ограничитель частоты запросов к сайтам
+Token bucket на каждый хост: все скраперы, потоки и (через Redis) воркеры
+Celery берут токен перед загрузкой страницы. При капче, HTTP 429 или пустой
+выдаче скорость для хоста снижается и постепенно восстанавливается.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+# Попытка импорта redis (без него состояние хранится в памяти процесса)
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def host_of(target: str) -> str:
+    """Хост из URL или домена: 'https://www.ozon.ru/search' -> 'ozon.ru'"""
+    host = urlparse(target).netloc if '://' in target else target
+    host = host.lower().split(':')[0]
+    return host[4:] if host.startswith('www.') else host
+
+
+class LocalBucketStore:
+    """Состояние корзин в памяти процесса"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, list] = {}   # host -> [токены, время обновления]
+        self._factors: Dict[str, float] = {}
+
+    def take(self, host: str, rate: float, burst: int, now: float) -> Tuple[float, float]:
+        """
+        Пытается взять токен
+
+        Returns:
+            (сколько секунд подождать до следующей попытки (0 - токен взят), коэффициент скорости)
+        """
+        with self._lock:
+            factor = self._factors.get(host, 1.0)
+            effective_rate = rate * factor
+            tokens, updated = self._buckets.get(host, (float(burst), now))
+            tokens = min(float(burst), tokens + (now - updated) * effective_rate)
+
+            if tokens >= 1:
+                self._buckets[host] = [tokens - 1, now]
+                return 0.0, factor
+
+            self._buckets[host] = [tokens, now]
+            return (1 - tokens) / effective_rate, factor
+
+    def adjust(self, host: str, multiplier: float, min_factor: float) -> float:
+        """Умножает коэффициент скорости хоста (в пределах [min_factor, 1])"""
+        with self._lock:
+            factor = self._factors.get(host, 1.0) * multiplier
+            factor = max(min_factor, min(1.0, factor))
+            self._factors[host] = factor
+            return factor
+
+
+class RedisBucketStore:
+    """Состояние корзин в Redis - общее для всех воркеров"""
+
+    KEY_PREFIX = 'scraper:ratelimit:'
+
+    TAKE_SCRIPT = """
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'factor')
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local factor = tonumber(state[3]) or 1
+    local effective_rate = rate * factor
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * effective_rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / effective_rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], 86400)
+    return {tostring(wait), tostring(factor)}
+    """
+
+    ADJUST_SCRIPT = """
+    local factor = tonumber(redis.call('HGET', KEYS[1], 'factor')) or 1
+    factor = factor * tonumber(ARGV[1])
+    factor = math.max(tonumber(ARGV[2]), math.min(1, factor))
+    redis.call('HSET', KEYS[1], 'factor', tostring(factor))
+    redis.call('EXPIRE', KEYS[1], 86400)
+    return tostring(factor)
+    """
+
+    def __init__(self, redis_url: str):
+        self._redis = redis.Redis.from_url(redis_url)
+        self._take = self._redis.register_script(self.TAKE_SCRIPT)
+        self._adjust = self._redis.register_script(self.ADJUST_SCRIPT)
+
+    def ping(self):
+        """Проверяет соединение с Redis"""
+        self._redis.ping()
+
+    def take(self, host: str, rate: float, burst: int, now: float) -> Tuple[float, float]:
+        wait, factor = self._take(keys=[self.KEY_PREFIX + host], args=[rate, burst, now])
+        return float(wait), float(factor)
+
+    def adjust(self, host: str, multiplier: float, min_factor: float) -> float:
+        return float(self._adjust(keys=[self.KEY_PREFIX + host], args=[multiplier, min_factor]))
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты запросов по хостам
+
+    - rate: токенов в секунду, burst: размер корзины
+    - report() снижает скорость при капче/429/пустой выдаче и восстанавливает при успехе
+    - get_metrics() - текущие скорости и время ожидания по хостам
+    """
+
+    DEFAULT_RATE = 0.5
+    DEFAULT_BURST = 2
+
+    # Маркетплейсы банят быстрее небольших магазинов
+    DEFAULT_RATES = {
+        'ozon.ru': (0.2, 1),
+        'wildberries.ru': (0.25, 1),
+        'avito.ru': (0.2, 1),
+        'market.yandex.ru': (0.15, 1),
+    }
+
+    # Во сколько раз меняется скорость после результата запроса
+    OUTCOME_MULTIPLIERS = {
+        'ok': 1.25,
+        'empty': 0.75,
+        'throttled': 0.5,
+        'captcha': 0.25,
+    }
+    MIN_FACTOR = 0.05
+
+    def __init__(
+        self,
+        rates: Optional[Dict[str, Tuple[float, int]]] = None,
+        default_rate: float = DEFAULT_RATE,
+        default_burst: int = DEFAULT_BURST,
+        redis_url: Optional[str] = None,
+    ):
+        """
+        Args:
+            rates: {хост: (запросов в секунду, burst)} поверх DEFAULT_RATES
+            default_rate: скорость для остальных хостов
+            default_burst: burst для остальных хостов
+            redis_url: Redis для общего состояния между процессами
+        """
+        self.rates = dict(self.DEFAULT_RATES)
+        if rates:
+            self.rates.update({host_of(host): value for host, value in rates.items()})
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.logger = logging.getLogger(__name__)
+
+        self.store = LocalBucketStore()
+        self.backend = 'memory'
+        if redis_url and REDIS_AVAILABLE:
+            try:
+                store = RedisBucketStore(redis_url)
+                store.ping()
+                self.store = store
+                self.backend = 'redis'
+            except Exception as e:
+                self.logger.warning(f"⚠️ Redis для ограничителя недоступен, используем память процесса: {e}")
+
+        self._metrics_lock = threading.Lock()
+        self._metrics: Dict[str, Dict] = {}
+
+    def get_rate(self, host: str) -> Tuple[float, int]:
+        """Базовые (rate, burst) хоста"""
+        return self.rates.get(host, (self.default_rate, self.default_burst))
+
+    def acquire(self, target: str) -> float:
+        """
+        Блокирует, пока для хоста не появится токен
+
+        Args:
+            target: URL или домен
+
+        Returns:
+            время ожидания в секундах
+        """
+        host = host_of(target)
+        waited = 0.0
+        while True:
+            wait = self._try_take(host)
+            if wait <= 0:
+                break
+            time.sleep(wait)
+            waited += wait
+        self._record_wait(host, waited)
+        return waited
+
+    async def acquire_async(self, target: str) -> float:
+        """Асинхронный вариант acquire() для HTTP-движка"""
+        host = host_of(target)
+        waited = 0.0
+        while True:
+            wait = self._try_take(host)
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+        self._record_wait(host, waited)
+        return waited
+
+    def report(self, target: str, outcome: str):
+        """
+        Сообщает результат запроса: 'ok', 'empty', 'throttled' (HTTP 429) или 'captcha'
+        """
+        multiplier = self.OUTCOME_MULTIPLIERS.get(outcome)
+        if multiplier is None:
+            return
+
+        host = host_of(target)
+        try:
+            factor = self.store.adjust(host, multiplier, self.MIN_FACTOR)
+        except Exception as e:
+            self.logger.debug(f"Ошибка обновления скорости {host}: {e}")
+            return
+
+        with self._metrics_lock:
+            metrics = self._host_metrics(host)
+            metrics['factor'] = factor
+            metrics['last_outcome'] = outcome
+            if multiplier < 1:
+                metrics['backoffs'] += 1
+
+        if multiplier < 1:
+            rate, _ = self.get_rate(host)
+            self.logger.info(f"🐢 {host}: {outcome}, скорость снижена до {rate * factor:.3f} запр/с")
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        """Текущие скорости и ожидания по хостам (в этом процессе)"""
+        with self._metrics_lock:
+            result = {}
+            for host, metrics in self._metrics.items():
+                rate, burst = self.get_rate(host)
+                requests = metrics['requests']
+                result[host] = {
+                    'rate': round(rate * metrics['factor'], 4),
+                    'base_rate': rate,
+                    'burst': burst,
+                    'requests': requests,
+                    'waits': metrics['waits'],
+                    'total_wait_sec': round(metrics['total_wait'], 2),
+                    'avg_wait_sec': round(metrics['total_wait'] / requests, 2) if requests else 0.0,
+                    'max_wait_sec': round(metrics['max_wait'], 2),
+                    'backoffs': metrics['backoffs'],
+                    'last_outcome': metrics['last_outcome'],
+                }
+            return result
+
+    def _try_take(self, host: str) -> float:
+        rate, burst = self.get_rate(host)
+        try:
+            wait, factor = self.store.take(host, rate, burst, time.time())
+        except Exception as e:
+            # Ограничитель не должен останавливать парсинг
+            self.logger.debug(f"Ошибка ограничителя для {host}: {e}")
+            return 0.0
+        with self._metrics_lock:
+            self._host_metrics(host)['factor'] = factor
+        return wait
+
+    def _record_wait(self, host: str, waited: float):
+        with self._metrics_lock:
+            metrics = self._host_metrics(host)
+            metrics['requests'] += 1
+            if waited > 0:
+                metrics['waits'] += 1
+                metrics['total_wait'] += waited
+                metrics['max_wait'] = max(metrics['max_wait'], waited)
+
+    def _host_metrics(self, host: str) -> Dict:
+        if host not in self._metrics:
+            self._metrics[host] = {
+                'requests': 0,
+                'waits': 0,
+                'total_wait': 0.0,
+                'max_wait': 0.0,
+                'backoffs': 0,
+                'factor': 1.0,
+                'last_outcome': None,
+            }
+        return self._metrics[host]
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Общий ограничитель процесса
+
+    Redis берется из SCRAPER_RATE_LIMIT_REDIS_URL (или REDIS_URL у воркеров backend).
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            redis_url = os.getenv('SCRAPER_RATE_LIMIT_REDIS_URL') or os.getenv('REDIS_URL')
+            _limiter = RateLimiter(redis_url=redis_url)
+        return _limiter
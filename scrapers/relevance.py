@@ -0,0 +1,152 @@
+"""
+Ранний фильтр релевантности карточек
+Выдача маркетплейсов по запросу 'шлем HJC RPHA 71' содержит аксессуары,
+другие модели и чужие бренды. Дешевые проверки отбрасывают такие карточки
+сразу после парсинга, до кеша сопоставления и отчетов:
+
+- токены: доля слов запроса в названии, номера моделей обязательны
+- бренд: бренд карточки не противоречит бренду из 1С
+- цена: цена в разумных пределах относительно цены 1С
+"""
+
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .query_normalizer import normalize_query
+
+# Слова запроса короче этого не учитываются (предлоги, 'с', 'и')
+MIN_TOKEN_LENGTH = 2
+# Длина основы для слов без цифр: 'мотошлема' и 'мотошлем' совпадают
+STEM_LENGTH = 6
+COMPACT_RE = re.compile(r'[\s\-]+')
+
+
+def _stem(token: str) -> str:
+    return token[:STEM_LENGTH]
+
+
+def _compact(text: str) -> str:
+    """'rpha-71' -> 'rpha71' (номера моделей пишут слитно, через дефис и пробел)"""
+    return COMPACT_RE.sub('', text)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def build_reference(products_1c: Iterable[Dict]) -> Dict:
+    """
+    Эталон для фильтра по товарам 1С группы (варианты одной модели)
+
+    Returns:
+        {'brand': ..., 'min_price': ..., 'max_price': ...}; пустые значения пропускаются
+    """
+    prices = []
+    brand = ''
+    for product in products_1c:
+        try:
+            price = float(product.get('price') or 0)
+        except (TypeError, ValueError):
+            price = 0.0
+        if price > 0:
+            prices.append(price)
+        brand = brand or (product.get('brand') or '')
+
+    reference = {}
+    if brand:
+        reference['brand'] = brand
+    if prices:
+        reference['min_price'] = min(prices)
+        reference['max_price'] = max(prices)
+    return reference
+
+
+class RelevanceGate:
+    """
+    Проверка карточек одного запроса
+
+        gate = RelevanceGate(query, {'brand': 'HJC', 'min_price': 25000, 'max_price': 27000})
+        kept, rejected = gate.filter(products)   # rejected: {'tokens': 3, 'price': 1}
+    """
+
+    def __init__(
+        self,
+        query: str,
+        reference: Optional[Dict] = None,
+        min_token_share: Optional[float] = None,
+        price_band: Optional[Tuple[float, float]] = None,
+    ):
+        """
+        Args:
+            query: поисковый запрос
+            reference: эталон из 1С (brand, min_price, max_price или price)
+            min_token_share: минимальная доля слов запроса в названии
+                (по умолчанию SCRAPER_RELEVANCE_MIN_SHARE или 0.5)
+            price_band: допустимая цена как доли от цены 1С
+                (по умолчанию SCRAPER_PRICE_BAND_LOW/HIGH или 0.3-3.0)
+        """
+        reference = reference or {}
+        if min_token_share is None:
+            min_token_share = _env_float('SCRAPER_RELEVANCE_MIN_SHARE', 0.5)
+        if price_band is None:
+            price_band = (
+                _env_float('SCRAPER_PRICE_BAND_LOW', 0.3),
+                _env_float('SCRAPER_PRICE_BAND_HIGH', 3.0),
+            )
+        self.min_token_share = min_token_share
+
+        tokens = [token for token in normalize_query(query).split() if len(token) >= MIN_TOKEN_LENGTH]
+        # Номера моделей (с цифрами) обязательны, остальные слова - по доле
+        self.model_tokens = [_compact(token) for token in tokens if any(ch.isdigit() for ch in token)]
+        self.word_stems = {_stem(token) for token in tokens if not any(ch.isdigit() for ch in token)}
+        self.token_count = len(self.model_tokens) + len(self.word_stems)
+
+        self.brand = _compact(normalize_query(reference.get('brand', '')))
+
+        low_price = reference.get('min_price') or reference.get('price') or 0
+        high_price = reference.get('max_price') or reference.get('price') or 0
+        self.price_range = None
+        if low_price > 0 and high_price > 0:
+            self.price_range = (low_price * price_band[0], high_price * price_band[1])
+
+    def check(self, product) -> Optional[str]:
+        """Причина отказа ('tokens', 'brand', 'price') или None для подходящей карточки"""
+        title = normalize_query(product.title)
+        compact_title = _compact(title)
+
+        if self.token_count:
+            if any(token not in compact_title for token in self.model_tokens):
+                return 'tokens'
+            title_stems = {_stem(token) for token in title.split()}
+            matched = len(self.model_tokens) + len(self.word_stems & title_stems)
+            if matched / self.token_count < self.min_token_share:
+                return 'tokens'
+
+        # Бренд карточки известен и отличается, а в названии бренда из 1С нет
+        if self.brand and product.brand:
+            card_brand = _compact(normalize_query(product.brand))
+            if card_brand and card_brand != self.brand and self.brand not in compact_title:
+                return 'brand'
+
+        if self.price_range and product.price:
+            low, high = self.price_range
+            if not low <= product.price <= high:
+                return 'price'
+
+        return None
+
+    def filter(self, products: Iterable) -> Tuple[List, Dict[str, int]]:
+        """Подходящие карточки и число отброшенных по причинам"""
+        kept = []
+        rejected: Dict[str, int] = {}
+        for product in products:
+            reason = self.check(product)
+            if reason is None:
+                kept.append(product)
+            else:
+                rejected[reason] = rejected.get(reason, 0) + 1
+        return kept, rejected
@@ -0,0 +1,225 @@
+"""
+Запись и воспроизведение страниц поиска
+Режим записи сохраняет HTML/JSON страниц в корпус фикстур, режим
+воспроизведения отдает их с локального HTTP-сервера вместо живых сайтов:
+
+    SCRAPER_RECORD_DIR=data/fixtures    - сохранять загруженные страницы
+    SCRAPER_REPLAY_URL=http://127.0.0.1:8765 - открывать страницы с локального сервера
+
+Страница на локальном сервере лежит по пути /<хост>/<путь>?<параметры>.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Параметры URL, в которых сайты передают поисковый запрос
+QUERY_PARAMS = ('text', 'search', 'q', 'query')
+
+# Воспроизводится уже отрисованный DOM: скрипты и внешние ресурсы не нужны
+REPLAY_CSP = "default-src 'none'; style-src 'unsafe-inline'; img-src data:"
+
+
+def split_url(url: str) -> Tuple[str, str]:
+    """'https://www.ozon.ru/search/?text=x' -> ('www.ozon.ru', '/search/?text=x')"""
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    return parts.netloc.lower(), path
+
+
+def query_from_url(url: str) -> str:
+    """Поисковый запрос из URL страницы поиска"""
+    params = parse_qs(urlsplit(url).query)
+    for name in QUERY_PARAMS:
+        if params.get(name):
+            return params[name][0]
+    return ""
+
+
+class FixtureCorpus:
+    """
+    Корпус сохраненных страниц
+
+    <root>/<хост>/<хеш>.html и <root>/index.json с описанием каждой страницы
+    """
+
+    def __init__(self, root: str = 'data/fixtures'):
+        self.root = Path(root)
+        self.index_path = self.root / 'index.json'
+        self._lock = threading.Lock()
+        self.index: Dict[str, Dict] = {}
+        if self.index_path.exists():
+            self.index = json.loads(self.index_path.read_text(encoding='utf-8'))
+
+    def save(self, url: str, content: str, content_type: str = 'text/html'):
+        """Сохраняет (перезаписывает) содержимое страницы"""
+        host, path = split_url(url)
+        digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+        extension = 'json' if 'json' in content_type else 'html'
+        relative = f"{host}/{digest}.{extension}"
+
+        with self._lock:
+            file_path = self.root / relative
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_text(content, encoding='utf-8')
+            self.index[f"{host}{path}"] = {
+                'url': url,
+                'host': host,
+                'query': query_from_url(url),
+                'file': relative,
+                'content_type': content_type,
+                'saved_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+            self.index_path.write_text(
+                json.dumps(self.index, ensure_ascii=False, indent=2), encoding='utf-8'
+            )
+
+    def load(self, host: str, path: str) -> Optional[Tuple[str, str]]:
+        """(содержимое, content-type) сохраненной страницы или None"""
+        entry = self.index.get(f"{host.lower()}{path}")
+        if not entry:
+            return None
+        content = (self.root / entry['file']).read_text(encoding='utf-8')
+        return content, entry['content_type']
+
+    def entries(self):
+        """Описания всех сохраненных страниц"""
+        return list(self.index.values())
+
+
+class RecordingDriver:
+    """Обертка драйвера: каждое чтение page_source сохраняется в корпус"""
+
+    def __init__(self, driver, corpus: FixtureCorpus):
+        self._driver = driver
+        self._corpus = corpus
+        self._url = None
+
+    def get(self, url: str):
+        self._url = url
+        return self._driver.get(url)
+
+    @property
+    def page_source(self) -> str:
+        html = self._driver.page_source
+        if self._url:
+            # Последнее чтение (после прокрутки) перезаписывает предыдущие
+            self._corpus.save(self._url, html)
+        return html
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+
+class ReplayDriver:
+    """Обертка драйвера: адреса сайтов подменяются адресами локального сервера"""
+
+    def __init__(self, driver, base_url: str):
+        self._driver = driver
+        self._base_url = base_url.rstrip('/')
+
+    def get(self, url: str):
+        return self._driver.get(replay_url(url, self._base_url))
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+
+def replay_url(url: str, base_url: str) -> str:
+    """Адрес страницы сайта на локальном сервере"""
+    host, path = split_url(url)
+    return f"{base_url.rstrip('/')}/{host}{path}"
+
+
+class ReplayServer:
+    """Локальный HTTP-сервер, отдающий страницы из корпуса"""
+
+    def __init__(self, corpus: FixtureCorpus, host: str = '127.0.0.1', port: int = 0):
+        self.corpus = corpus
+        handler = self._make_handler(corpus)
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'ReplayServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"📼 Воспроизведение фикстур: {self.base_url} ({len(self.corpus.index)} страниц)")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @staticmethod
+    def _make_handler(corpus: FixtureCorpus):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                host, _, path = self.path.lstrip('/').partition('/')
+                found = corpus.load(host, '/' + path)
+                if found is None:
+                    body, content_type, status = b'', 'text/html', 404
+                else:
+                    body, content_type, status = found[0].encode('utf-8'), found[1], 200
+
+                self.send_response(status)
+                self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Content-Security-Policy', REPLAY_CSP)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"replay: {format % args}")
+
+        return Handler
+
+
+_corpora: Dict[str, FixtureCorpus] = {}
+
+
+def get_record_corpus() -> Optional[FixtureCorpus]:
+    """Корпус для записи, если включен SCRAPER_RECORD_DIR (один на процесс)"""
+    root = os.getenv('SCRAPER_RECORD_DIR')
+    if not root:
+        return None
+    if root not in _corpora:
+        _corpora[root] = FixtureCorpus(root)
+    return _corpora[root]
+
+
+def get_replay_base() -> Optional[str]:
+    """Адрес локального сервера, если включен SCRAPER_REPLAY_URL"""
+    return os.getenv('SCRAPER_REPLAY_URL') or None
+
+
+def wrap_driver(driver):
+    """Оборачивает драйвер для записи или воспроизведения (если режим включен)"""
+    replay_base = get_replay_base()
+    if replay_base:
+        return ReplayDriver(driver, replay_base)
+    corpus = get_record_corpus()
+    if corpus:
+        return RecordingDriver(driver, corpus)
+    return driver
@@ -0,0 +1,116 @@
+"""
+Бенчмарк скраперов на записанных страницах
+
+Сначала страницы записываются обычным прогоном:
+    SCRAPER_RECORD_DIR=data/fixtures python main_system.py
+
+Затем каждый записанный запрос повторяется против локального сервера
+фикстур - без сети и анти-бот защиты, поэтому замеры воспроизводимы:
+    python -m scrapers.replay_benchmark data/fixtures --repeat 3
+"""
+
+import argparse
+import logging
+import os
+import statistics
+from typing import Dict, List, Tuple
+
+from .rate_limiter import host_of
+from .replay import FixtureCorpus, ReplayServer
+from .wildberries_scraper import WildberriesScraper
+from .ozon_scraper import OzonScraper
+from .avito_scraper import AvitoScraper
+from .yandex_market_scraper import YandexMarketScraper
+from .universal_scraper import UniversalScraper
+
+# Хост -> класс скрапера маркетплейса
+MARKETPLACE_SCRAPERS = {
+    'wildberries.ru': WildberriesScraper,
+    'ozon.ru': OzonScraper,
+    'avito.ru': AvitoScraper,
+    'market.yandex.ru': YandexMarketScraper,
+}
+
+# Фазы, которые выводятся в таблице (остальные входят в total)
+PHASES = ('driver_init', 'navigate', 'wait', 'scroll', 'parse')
+
+
+def recorded_queries(corpus: FixtureCorpus) -> List[Tuple[str, str]]:
+    """Уникальные пары (хост, запрос) из корпуса"""
+    pairs = []
+    for entry in corpus.entries():
+        pair = (host_of(entry['host']), entry['query'])
+        if entry['query'] and pair not in pairs:
+            pairs.append(pair)
+    return pairs
+
+
+def run_query(scrapers: Dict[str, object], host: str, query: str, max_products: int) -> Dict:
+    """Один поиск против локального сервера; возвращает фазы и число карточек"""
+    if host in MARKETPLACE_SCRAPERS:
+        if host not in scrapers:
+            scrapers[host] = MARKETPLACE_SCRAPERS[host](headless=True)
+        scraper = scrapers[host]
+        products = scraper.search(query, max_products=max_products)
+    elif host in UniversalScraper.SITES_CONFIG:
+        if host not in scrapers:
+            scrapers[host] = UniversalScraper(headless=True)
+        scraper = scrapers[host]
+        products = scraper.search(host, query, max_products=max_products)
+    else:
+        return {}
+
+    timings = scraper.timer.as_dict()
+    timings['cards'] = len(products)
+    return timings
+
+
+def summarize(runs: List[Dict]) -> Dict:
+    """Медианы фаз по повторам"""
+    keys = set().union(*runs)
+    return {key: statistics.median(run.get(key, 0.0) for run in runs) for key in keys}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк скраперов на записанных страницах')
+    parser.add_argument('fixtures', nargs='?', default='data/fixtures', help='папка корпуса фикстур')
+    parser.add_argument('--max-products', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=1, help='повторов каждого запроса')
+    args = parser.parse_args()
+
+    corpus = FixtureCorpus(args.fixtures)
+    pairs = recorded_queries(corpus)
+    if not pairs:
+        print(f"⚠️ В {args.fixtures} нет записанных страниц поиска")
+        return
+
+    logging.disable(logging.INFO)
+
+    scrapers: Dict[str, object] = {}
+    rows = []
+    with ReplayServer(corpus) as server:
+        os.environ['SCRAPER_REPLAY_URL'] = server.base_url
+        try:
+            for host, query in pairs:
+                runs = [run_query(scrapers, host, query, args.max_products) for _ in range(args.repeat)]
+                runs = [run for run in runs if run]
+                if runs:
+                    rows.append((host, query, summarize(runs)))
+        finally:
+            os.environ.pop('SCRAPER_REPLAY_URL', None)
+            for scraper in scrapers.values():
+                scraper.close()
+
+    header = f"{'Сайт':<18}{'Запрос':<24}" + ''.join(f"{phase:>12}" for phase in PHASES)
+    print(header + f"{'total':>9}{'карточек':>10}{'карт/с':>8}")
+    for host, query, row in rows:
+        cards_per_sec = row['cards'] / row['total'] if row['total'] else 0.0
+        print(
+            f"{host:<18}{query[:22]:<24}"
+            + ''.join(f"{row.get(phase, 0.0):>12.2f}" for phase in PHASES)
+            + f"{row['total']:>9.2f}{int(row['cards']):>10}{cards_per_sec:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
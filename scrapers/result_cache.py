@@ -0,0 +1,218 @@
+"""
+Кеш результатов парсинга
+Хранит результаты поиска по ключу (сайт, нормализованный запрос) в SQLite,
+чтобы повторные анализы не парсили одни и те же запросы заново.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .query_normalizer import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeResultCache:
+    """
+    Персистентный кеш результатов поиска
+
+    - TTL задается отдельно для каждого сайта
+    - при превышении размера удаляются давно не использованные записи (LRU)
+    - счетчики попаданий/промахов доступны через get_stats()
+    """
+
+    DEFAULT_PATH = 'data/scrape_cache.sqlite3'
+
+    # Маркетплейсы меняют цены чаще, чем небольшие магазины
+    DEFAULT_TTL = {
+        'wildberries': 6 * 3600,
+        'ozon': 6 * 3600,
+        'avito': 3 * 3600,
+        'yandex_market': 6 * 3600,
+    }
+    DEFAULT_SITE_TTL = 24 * 3600
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_PATH,
+        ttl_by_site: Optional[Dict[str, int]] = None,
+        default_ttl: int = DEFAULT_SITE_TTL,
+        max_size_mb: float = 50.0,
+    ):
+        """
+        Args:
+            db_path: путь к файлу SQLite
+            ttl_by_site: TTL в секундах по каноническим ключам сайтов
+            default_ttl: TTL для сайтов, которых нет в ttl_by_site
+            max_size_mb: максимальный суммарный размер сохраненных результатов
+        """
+        self.db_path = db_path
+        self.ttl_by_site = dict(self.DEFAULT_TTL)
+        if ttl_by_site:
+            self.ttl_by_site.update(ttl_by_site)
+        self.default_ttl = default_ttl
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # Менеджер скраперов вызывается из потоков Flask/Socket.IO
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS scrape_results (
+                site TEXT NOT NULL,
+                query TEXT NOT NULL,
+                max_products INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (site, query)
+            )
+            '''
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_scrape_results_access ON scrape_results (last_access)'
+        )
+        self._conn.commit()
+
+    def get_ttl(self, site: str) -> int:
+        """TTL для сайта в секундах"""
+        return self.ttl_by_site.get(site, self.default_ttl)
+
+    def get(self, site: str, query: str, max_products: int) -> Optional[List[Dict]]:
+        """
+        Возвращает сохраненные товары или None, если записи нет или она устарела
+
+        Запись подходит, только если при ее создании запрашивали не меньше товаров.
+        Каждый товар получает scraped_at - время парсинга записи.
+        """
+        key = normalize_query(query)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT max_products, created_at, payload FROM scrape_results WHERE site = ? AND query = ?',
+                (site, key),
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            cached_max, created_at, payload = row
+            if now - created_at > self.get_ttl(site) or cached_max < max_products:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                'UPDATE scrape_results SET last_access = ? WHERE site = ? AND query = ?',
+                (now, site, key),
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        try:
+            products = json.loads(payload)
+        except ValueError:
+            return None
+        products = products[:max_products]
+        for product in products:
+            product['scraped_at'] = created_at
+        return products
+
+    def has(self, site: str, query: str, max_products: int) -> bool:
+        """Есть ли актуальная запись (без учета в счетчиках попаданий)"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT max_products, created_at FROM scrape_results WHERE site = ? AND query = ?',
+                (site, normalize_query(query)),
+            ).fetchone()
+        if row is None:
+            return False
+        cached_max, created_at = row
+        return time.time() - created_at <= self.get_ttl(site) and cached_max >= max_products
+
+    def set(self, site: str, query: str, max_products: int, products: List[Dict]):
+        """Сохраняет результаты поиска"""
+        key = normalize_query(query)
+        payload = json.dumps(products, ensure_ascii=False)
+        size = len(payload.encode('utf-8'))
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                '''
+                INSERT OR REPLACE INTO scrape_results
+                    (site, query, max_products, created_at, last_access, size, payload)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (site, key, max_products, now, now, size, payload),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def invalidate(self, site: Optional[str] = None, query: Optional[str] = None):
+        """Удаляет записи по сайту и/или запросу (без аргументов - весь кеш)"""
+        conditions, params = [], []
+        if site:
+            conditions.append('site = ?')
+            params.append(site)
+        if query:
+            conditions.append('query = ?')
+            params.append(normalize_query(query))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        with self._lock:
+            self._conn.execute(f'DELETE FROM scrape_results{where}', params)
+            self._conn.commit()
+
+    def _evict(self):
+        """Удаляет давно не использованные записи, пока кеш больше лимита"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM scrape_results').fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+
+        rows = self._conn.execute(
+            'SELECT site, query, size FROM scrape_results ORDER BY last_access ASC'
+        ).fetchall()
+        for site, query, size in rows:
+            if total <= self.max_size_bytes:
+                break
+            self._conn.execute(
+                'DELETE FROM scrape_results WHERE site = ? AND query = ?', (site, query)
+            )
+            total -= size
+            self.evictions += 1
+
+    def get_stats(self) -> Dict:
+        """Статистика кеша"""
+        with self._lock:
+            entries, total_size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM scrape_results'
+            ).fetchone()
+
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / requests, 3) if requests else 0.0,
+            'evictions': self.evictions,
+            'entries': entries,
+            'size_bytes': total_size,
+        }
+
+    def close(self):
+        """Закрывает соединение с базой"""
+        with self._lock:
+            self._conn.close()
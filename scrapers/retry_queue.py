@@ -0,0 +1,111 @@
+"""
+Очередь отложенных запросов
+Запрос, упершийся в капчу, не ждет решения: он откладывается сюда, а
+остальные сайты продолжают работу. После основного прохода менеджер
+повторяет отложенные запросы в новой сессии браузера.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class DeferredQuery:
+    """Отложенный поиск на одном сайте"""
+    site: str
+    query: str
+    max_products: int
+    reference: Optional[Dict] = None   # эталон 1С для фильтра релевантности
+    reason: str = ""                    # captcha / antibot
+    attempts: int = 0                   # сколько раз запрос уже упирался в блокировку
+    force_refresh: bool = False         # повтор тоже идет мимо кеша
+    deferred_at: float = field(default_factory=time.time)
+
+    def as_dict(self) -> Dict:
+        return {'site': self.site, 'query': self.query, 'reason': self.reason, 'attempts': self.attempts}
+
+
+class DeferredQueue:
+    """
+    Потокобезопасная очередь отложенных запросов (одна запись на пару сайт/запрос)
+
+    Число блокировок по паре сохраняется между повторами: после max_attempts
+    блокировок запрос больше не откладывается и попадает в dropped.
+    """
+
+    def __init__(self, max_attempts: int = 2):
+        """
+        Args:
+            max_attempts: сколько блокировок допускается для одного запроса
+        """
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._items: Dict[Tuple[str, str], DeferredQuery] = {}
+        self._attempts: Dict[Tuple[str, str], int] = {}
+        self.dropped: List[DeferredQuery] = []
+
+    def defer(
+        self,
+        site: str,
+        query: str,
+        max_products: int,
+        reference: Optional[Dict] = None,
+        reason: str = "",
+        blocked: bool = True,
+        force_refresh: bool = False,
+    ) -> bool:
+        """
+        Откладывает запрос; False, если попытки исчерпаны
+
+        Args:
+            blocked: запрос сам получил капчу (False - пропущен из-за
+                блокировки сайта и попытку не тратит)
+            force_refresh: исходный поиск шел мимо кеша - повтор тоже
+        """
+        key = (site, query)
+        with self._lock:
+            attempts = self._attempts.get(key, 0) + (1 if blocked else 0)
+            self._attempts[key] = attempts
+            item = DeferredQuery(site, query, max_products, reference, reason, attempts, force_refresh)
+            if attempts >= self.max_attempts:
+                self._items.pop(key, None)
+                self.dropped.append(item)
+                return False
+            self._items.setdefault(key, item)
+            return True
+
+    def drain(self, key: Optional[Tuple[str, str]] = None) -> List[DeferredQuery]:
+        """
+        Забирает отложенные запросы (в порядке откладывания)
+
+        Args:
+            key: (сайт, запрос) - забрать только этот запрос, остальные остаются в очереди
+        """
+        with self._lock:
+            if key is not None:
+                item = self._items.pop(key, None)
+                return [item] if item else []
+            items = sorted(self._items.values(), key=lambda item: item.deferred_at)
+            self._items.clear()
+            return items
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        """Отложенные и брошенные запросы для статуса"""
+        with self._lock:
+            return {
+                'pending': [item.as_dict() for item in self._items.values()],
+                'dropped': [item.as_dict() for item in self.dropped],
+            }
+
+    def reset(self):
+        """Начинает новый запуск: очередь и счетчики попыток пусты"""
+        with self._lock:
+            self._items.clear()
+            self._attempts.clear()
+            self.dropped.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
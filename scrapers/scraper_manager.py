@@ -3,40 +3,35 @@
 Управляет всеми Selenium скраперами и предоставляет единый интерфейс
 """
 
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 import logging
+import os
 import re
-from dataclasses import dataclass, asdict
 
 from .wildberries_scraper import WildberriesScraper
 from .ozon_scraper import OzonScraper
 from .avito_scraper import AvitoScraper
 from .yandex_market_scraper import YandexMarketScraper
 from .universal_scraper import UniversalScraper
+from .result_cache import ScrapeResultCache
+from .static_engine import StaticHTMLEngine
+from .rate_limiter import get_rate_limiter
+from .circuit_breaker import CircuitBreaker
+from .browser_pool import BrowserPool
+from .driver_factory import get_driver_factory
+from .instrumentation import PhaseTimer, ScrapeMetrics
+from .product import Product
+from .relevance import RelevanceGate
+from .antibot import BlockedError
+from .retry_queue import DeferredQueue
+from .selector_stats import get_selector_stats
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-@dataclass
-class ScrapedProduct:
-    """Унифицированная структура товара"""
-    title: str
-    price: float
-    old_price: Optional[float] = None
-    url: str = ""
-    source: str = ""
-    availability: str = "unknown"
-    brand: str = ""
-    rating: float = 0.0
-    reviews_count: int = 0
-    image_url: str = ""
-    location: str = ""
-    seller: str = ""
-    
-    def to_dict(self):
-        """Конвертирует в словарь"""
-        return asdict(self)
+# Скраперы сами создают общую запись Product - отдельная конвертация не нужна
+ScrapedProduct = Product
 
 
 class ScraperManager:
@@ -65,16 +60,78 @@ class ScraperManager:
         'motocomfortru': 'motocomfort',
     }
     
-    def __init__(self, headless: bool = True):
+    # Хосты сайтов для ограничителя частоты запросов
+    SITE_HOSTS = {
+        'wildberries': 'wildberries.ru',
+        'ozon': 'ozon.ru',
+        'avito': 'avito.ru',
+        'yandex_market': 'market.yandex.ru',
+        'mr-moto': 'mr-moto.ru',
+        'flipup': 'flipup.ru',
+        'pro-ekip': 'pro-ekip.ru',
+        'motoekip': 'motoekip.su',
+        'motocomfort': 'motocomfort.ru',
+    }
+    
+    # Магазины с серверным HTML - сначала пробуем без браузера
+    UNIVERSAL_SITES = ['mr-moto', 'flipup', 'pro-ekip', 'motoekip', 'motocomfort']
+    
+    def __init__(
+        self,
+        headless: bool = True,
+        use_cache: bool = True,
+        cache: Optional[ScrapeResultCache] = None,
+        share_browser: Optional[bool] = None,
+        max_browsers: int = 2,
+    ):
         """
         Args:
             headless: запускать браузер в headless режиме
+            use_cache: использовать кеш результатов поиска
+            cache: готовый экземпляр кеша (по умолчанию - SQLite в data/)
+            share_browser: открывать сайты вкладками в общих браузерах
+                (по умолчанию - переменная окружения SCRAPER_SHARED_BROWSER)
+            max_browsers: сколько общих браузеров держать в режиме share_browser
         """
         self.headless = headless
         self._scrapers = {}
         self.logger = logging.getLogger(__name__)
+        
+        if share_browser is None:
+            share_browser = os.getenv('SCRAPER_SHARED_BROWSER', '').lower() in ('1', 'true', 'yes')
+        self.browser_pool = BrowserPool(headless=headless, max_browsers=max_browsers) if share_browser else None
+        
+        self.cache = None
+        if cache is not None:
+            self.cache = cache
+        elif use_cache:
+            try:
+                self.cache = ScrapeResultCache()
+            except Exception as e:
+                self.logger.warning(f"⚠️ Кеш результатов недоступен: {e}")
+        
+        self.rate_limiter = get_rate_limiter()
+        self.circuit_breaker = CircuitBreaker()
+        self.static_engine = StaticHTMLEngine() if StaticHTMLEngine.is_available() else None
+        # Результаты параллельной HTTP-загрузки, ожидающие обработки в search()
+        self._static_prefetched = {}
+        # Замеры фаз и счетчики карточек по сайтам за текущий запуск
+        self.metrics = ScrapeMetrics()
+        self._last_report = None  # (источник, замеры) последнего поиска скрапером
+        # Запросы, упершиеся в капчу: повторяются в новой сессии через retry_deferred()
+        self.deferred = DeferredQueue(max_attempts=int(os.getenv('SCRAPER_DEFERRED_ATTEMPTS', '2')))
+        # Причины, по которым последний поиск (сайт, запрос) не дошел до выдачи
+        self._failures = {}
     
-    def search_all(self, query: str, sites: Optional[List[str]] = None, max_products: int = 20) -> Dict[str, List[ScrapedProduct]]:
+    def search_all(
+        self,
+        query: str,
+        sites: Optional[List[str]] = None,
+        max_products: int = 20,
+        force_refresh: bool = False,
+        reference: Optional[Dict] = None,
+        on_result: Optional[Callable[[str, List[Product]], None]] = None
+    ) -> Dict[str, List[Product]]:
         """
         Поиск на всех или указанных сайтах
         
@@ -82,6 +139,9 @@ class ScraperManager:
             query: поисковый запрос
             sites: список сайтов (если None - поиск на всех)
             max_products: максимум товаров с каждого сайта
+            force_refresh: игнорировать кеш и парсить заново
+            reference: эталон из 1С для фильтра релевантности (см. search)
+            on_result: вызывается с (сайт, товары) сразу после поиска на каждом сайте
         
         Returns:
             словарь {сайт: [товары]}
@@ -91,6 +151,8 @@ class ScraperManager:
         
         results = {}
         
+        self._prefetch_static(query, sites, max_products, force_refresh)
+        
         for site in sites:
             canonical_site = self._normalize_site_key(site)
             if not canonical_site:
@@ -98,23 +160,70 @@ class ScraperManager:
                 continue
             
             try:
-                products = self.search(canonical_site, query, max_products)
+                products = self.search(
+                    canonical_site, query, max_products, force_refresh=force_refresh, reference=reference
+                )
                 results[canonical_site] = products
                 self.logger.info(f"✅ {canonical_site}: найдено {len(products)} товаров")
             except Exception as e:
                 self.logger.error(f"❌ Ошибка на {canonical_site}: {e}")
                 results[canonical_site] = []
+            
+            if on_result:
+                on_result(canonical_site, results[canonical_site])
         
+        self._static_prefetched.clear()
+        if self.static_engine:
+            self.static_engine.timers.clear()
+        self.flush_stats()
         return results
     
-    def search(self, site: str, query: str, max_products: int = 20) -> List[ScrapedProduct]:
+    def _prefetch_static(self, query: str, sites: List[str], max_products: int, force_refresh: bool):
+        """Параллельно загружает страницы поиска всех статических магазинов из списка"""
+        if not self.static_engine:
+            return
+        
+        domains = []
+        for site in sites:
+            canonical_site = self._normalize_site_key(site)
+            if canonical_site not in self.UNIVERSAL_SITES or self.circuit_breaker.is_open(canonical_site):
+                continue
+            if not force_refresh and self.cache and self.cache.has(canonical_site, query, max_products):
+                continue
+            domains.append(self.SUPPORTED_SITES[canonical_site])
+        
+        if len(domains) < 2:
+            return
+        
+        try:
+            prefetched = self.static_engine.search_sites(domains, query, max_products)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Ошибка параллельной загрузки: {e}")
+            return
+        
+        for domain, products in prefetched.items():
+            self._static_prefetched[(domain, query)] = products
+    
+    def search(
+        self,
+        site: str,
+        query: str,
+        max_products: int = 20,
+        force_refresh: bool = False,
+        reference: Optional[Dict] = None
+    ) -> List[Product]:
         """
         Поиск на конкретном сайте
         
+        Нерелевантные карточки (мало слов запроса, чужой бренд, цена далеко
+        от цены 1С) отбрасываются сразу; в кеш попадает полная выдача.
+        
         Args:
             site: название сайта
             query: поисковый запрос
             max_products: максимум товаров
+            force_refresh: игнорировать кеш и парсить заново
+            reference: эталон из 1С - {'brand', 'min_price', 'max_price'} или {'price'}
         
         Returns:
             список товаров
@@ -124,9 +233,38 @@ class ScraperManager:
             self.logger.warning(f"⚠️ Неизвестный сайт: {site}")
             return []
         
+        timer = PhaseTimer()
+        gate = RelevanceGate(query, reference)
+        self._failures.pop((canonical_site, query), None)
+        
+        if self.cache and not force_refresh:
+            cached = self.cache.get(canonical_site, query, max_products)
+            if cached is not None:
+                self.logger.info(f"💾 {canonical_site}: '{query}' из кеша ({len(cached)} товаров)")
+                products, rejected = self._filter_relevant(
+                    canonical_site, gate, [Product.from_dict(item) for item in cached]
+                )
+                cards = {'parsed': len(cached)}
+                cards.update(rejected)
+                self.metrics.record(canonical_site, query, 'cache', timer.as_dict(), cards)
+                return products
+        
+        if not self.circuit_breaker.allow(canonical_site):
+            if self.circuit_breaker.last_reason(canonical_site) == 'captcha':
+                # Сайт закрыт капчей - запрос повторится вместе с отложенными
+                self.deferred.defer(
+                    canonical_site, query, max_products, reference, 'captcha',
+                    blocked=False, force_refresh=force_refresh,
+                )
+            self.logger.info(f"⏭️ {canonical_site}: пропущен (сайт временно недоступен)")
+            self.metrics.record(canonical_site, query, 'skipped', timer.as_dict())
+            self._failures[(canonical_site, query)] = 'skipped'
+            return []
+        
         self.logger.info(f"🔍 Поиск на {canonical_site}: '{query}'")
         
         products = []
+        self._last_report = None
         
         try:
             if canonical_site == 'wildberries':
@@ -141,74 +279,202 @@ class ScraperManager:
             elif canonical_site == 'yandex_market':
                 products = self._search_yandex_market(query, max_products)
             
-            elif canonical_site in ['mr-moto', 'flipup', 'pro-ekip', 'motoekip', 'motocomfort']:
+            elif canonical_site in self.UNIVERSAL_SITES:
                 domain = self.SUPPORTED_SITES[canonical_site]
                 products = self._search_universal(domain, query, max_products)
             
             else:
                 self.logger.warning(f"⚠️ Неизвестный сайт: {canonical_site}")
             
-            # Конвертируем в унифицированный формат
-            unified_products = []
-            for p in products:
-                unified = ScrapedProduct(
-                    title=p.title,
-                    price=p.price,
-                    old_price=getattr(p, 'old_price', None),
-                    url=p.url,
-                    source=p.source,
-                    availability=getattr(p, 'availability', 'unknown'),
-                    brand=getattr(p, 'brand', ''),
-                    rating=getattr(p, 'rating', 0.0),
-                    reviews_count=getattr(p, 'reviews_count', 0),
-                    image_url=getattr(p, 'image_url', ''),
-                    location=getattr(p, 'location', ''),
-                    seller=getattr(p, 'seller', ''),
+            timer.lap('scrape')
+            relevant, rejected = self._filter_relevant(canonical_site, gate, products)
+            timer.lap('relevance')
+            self._record_metrics(canonical_site, query, timer, rejected)
+            
+            # Пустая выдача часто означает мягкую блокировку - замедляемся
+            self.rate_limiter.report(self.SITE_HOSTS.get(canonical_site, canonical_site), 'ok' if products else 'empty')
+            if products:
+                self.circuit_breaker.record_success(canonical_site)
+            else:
+                self.circuit_breaker.record_failure(canonical_site, 'empty')
+            
+            # Пустые результаты не кешируем - чаще всего это капча или сбой
+            if self.cache and products:
+                self.cache.set(
+                    canonical_site,
+                    query,
+                    max_products,
+                    [p.to_dict() for p in products]
                 )
-                unified_products.append(unified)
             
-            return unified_products
+            return relevant
+        
+        except BlockedError as e:
+            # Не ждем решения капчи: запрос откладывается, остальные сайты продолжают
+            self.rate_limiter.report(self.SITE_HOSTS.get(canonical_site, canonical_site), 'captcha')
+            self.circuit_breaker.record_failure(canonical_site, 'captcha')
+            self.metrics.record(canonical_site, query, 'deferred', timer.as_dict())
+            if self.deferred.defer(canonical_site, query, max_products, reference, e.reason, force_refresh=force_refresh):
+                self.logger.warning(f"🧩 {canonical_site}: {e.reason}, запрос '{query}' отложен")
+            else:
+                self.logger.warning(f"🧩 {canonical_site}: {e.reason}, попытки для '{query}' исчерпаны")
+            self._failures[(canonical_site, query)] = e.reason
+            return []
             
         except Exception as e:
             self.logger.error(f"❌ Ошибка поиска на {canonical_site}: {e}")
+            self.circuit_breaker.record_failure(canonical_site, 'error')
+            self.metrics.record(canonical_site, query, 'error', timer.as_dict())
+            self._failures[(canonical_site, query)] = str(e) or type(e).__name__
             return []
     
+    def retry_deferred(self, site: Optional[str] = None, query: Optional[str] = None) -> Dict[Tuple[str, str], List[Product]]:
+        """
+        Повторяет отложенные запросы в новой сессии браузера
+        
+        Перед повтором скрапер сайта закрывается, профиль Chrome сбрасывается,
+        а предохранитель сайта закрывается. Запрос, снова получивший капчу,
+        возвращается в очередь, пока не исчерпает попытки.
+        
+        Args:
+            site, query: повторить только этот запрос (остальные остаются в очереди)
+        
+        Returns:
+            {(сайт, запрос): [товары]} для запросов, которые удалось выполнить
+        """
+        key = (self._normalize_site_key(site), query) if site and query else None
+        results = {}
+        for _ in range(self.deferred.max_attempts):
+            items = self.deferred.drain(key)
+            if not items:
+                break
+            
+            self.logger.info(f"🔁 Повтор отложенных запросов: {len(items)}")
+            for site in dict.fromkeys(item.site for item in items):
+                self._rotate_session(site)
+            
+            for item in items:
+                products = self.search(
+                    item.site, item.query, item.max_products,
+                    force_refresh=item.force_refresh, reference=item.reference,
+                )
+                if products:
+                    results[(item.site, item.query)] = products
+        return results
+    
+    def failure_reason(self, site: str, query: str) -> Optional[str]:
+        """
+        Почему последний поиск не дошел до выдачи
+        
+        Returns:
+            'skipped' (предохранитель открыт), причина блокировки (капча),
+            текст ошибки - или None, если сайт ответил (в т.ч. пустой выдачей)
+        """
+        return self._failures.get((self._normalize_site_key(site), query))
+    
+    def get_deferred(self) -> Dict[str, List[Dict]]:
+        """Отложенные запросы и запросы, исчерпавшие попытки"""
+        return self.deferred.snapshot()
+    
+    def reset_deferred(self):
+        """Очищает очередь отложенных запросов (вызывается перед каждым запуском)"""
+        self.deferred.reset()
+    
+    def _rotate_session(self, site: str):
+        """Закрывает скрапер сайта и сбрасывает его профиль: следующий поиск - в новой сессии"""
+        domain = self.SUPPORTED_SITES[site]
+        name = f'universal_{domain}' if site in self.UNIVERSAL_SITES else site
+        scraper = self._scrapers.pop(name, None)
+        if scraper:
+            try:
+                scraper.close()
+            except Exception as e:
+                self.logger.debug(f"Ошибка закрытия {name}: {e}")
+        # Общие браузеры делят профиль между сайтами - его не трогаем
+        if not self.browser_pool:
+            get_driver_factory().reset_profile(domain if site in self.UNIVERSAL_SITES else site)
+        self.circuit_breaker.reset(site)
+    
+    def _filter_relevant(self, site: str, gate: RelevanceGate, products: List[Product]):
+        """Отбрасывает нерелевантные карточки; счетчики отказов - rejected_<причина>"""
+        relevant, rejected = gate.filter(products)
+        if rejected:
+            self.logger.info(
+                f"🧹 {site}: отброшено {len(products) - len(relevant)} из {len(products)} карточек "
+                f"({', '.join(f'{reason}: {count}' for reason, count in rejected.items())})"
+            )
+        return relevant, {f'rejected_{reason}': count for reason, count in rejected.items()}
+    
+    def _record_metrics(self, site: str, query: str, timer: PhaseTimer, rejected: Optional[Dict[str, int]] = None):
+        """Сводит замеры скрапера (фазы, карточки) с замерами менеджера"""
+        source, report = self._last_report or ('none', {'phases': {}, 'cards': {}})
+        phases = dict(report['phases'])
+        phases['relevance'] = timer.as_dict().get('relevance', 0.0)
+        phases['total'] = round(timer.total, 3)
+        cards = dict(report['cards'])
+        cards.update(rejected or {})
+        self.metrics.record(site, query, source, phases, cards)
+    
     def _get_scraper(self, scraper_name: str, scraper_class):
         """Получить или создать скрапер (с кешированием)"""
         if scraper_name not in self._scrapers:
-            self._scrapers[scraper_name] = scraper_class(headless=self.headless)
+            scraper = scraper_class(headless=self.headless)
+            if self.browser_pool:
+                try:
+                    scraper.driver = self.browser_pool.open_tab(scraper_name)
+                except Exception as e:
+                    # Скрапер запустит собственный браузер в _init_driver
+                    self.logger.warning(f"⚠️ Не удалось открыть вкладку для {scraper_name}: {e}")
+            self._scrapers[scraper_name] = scraper
         return self._scrapers[scraper_name]
     
+    def _run_scraper(self, scraper_name: str, scraper_class, *args) -> List:
+        """Поиск скрапером с сохранением его замеров"""
+        scraper = self._get_scraper(scraper_name, scraper_class)
+        try:
+            return scraper.search(*args)
+        finally:
+            self._last_report = ('selenium', scraper.timer.report())
+    
     def _search_wildberries(self, query: str, max_products: int) -> List:
         """Поиск на Wildberries"""
-        scraper = self._get_scraper('wildberries', WildberriesScraper)
-        return scraper.search(query, max_products)
+        return self._run_scraper('wildberries', WildberriesScraper, query, max_products)
     
     def _search_ozon(self, query: str, max_products: int) -> List:
         """Поиск на OZON"""
-        scraper = self._get_scraper('ozon', OzonScraper)
-        return scraper.search(query, max_products)
+        return self._run_scraper('ozon', OzonScraper, query, max_products)
     
     def _search_avito(self, query: str, max_products: int) -> List:
         """Поиск на Avito"""
-        scraper = self._get_scraper('avito', AvitoScraper)
-        return scraper.search(query, max_products)
+        return self._run_scraper('avito', AvitoScraper, query, max_products)
     
     def _search_yandex_market(self, query: str, max_products: int) -> List:
         """Поиск на Яндекс Маркет"""
-        scraper = self._get_scraper('yandex_market', YandexMarketScraper)
-        return scraper.search(query, max_products)
+        return self._run_scraper('yandex_market', YandexMarketScraper, query, max_products)
     
     def _search_universal(self, site: str, query: str, max_products: int) -> List:
-        """Поиск на универсальных сайтах"""
-        scraper_key = f'universal_{site}'
-        if scraper_key not in self._scrapers:
-            self._scrapers[scraper_key] = UniversalScraper(headless=self.headless)
-        scraper = self._scrapers[scraper_key]
-        return scraper.search(site, query, max_products)
+        """Поиск на универсальных сайтах: сначала HTTP без браузера, затем Selenium"""
+        products = self._static_prefetched.pop((site, query), None)
+        if products is None and self.static_engine and self.static_engine.supports(site):
+            products = self.static_engine.search_sites([site], query, max_products).get(site, [])
+        if self.static_engine:
+            static_timer = self.static_engine.timers.pop((site, query), None)
+            if static_timer:
+                self._last_report = ('static', static_timer.report())
+        if products:
+            return products
+        if products is not None:
+            self.logger.info(f"🌐 {site}: статическая загрузка без карточек, используем Selenium")
+        
+        return self._run_scraper(f'universal_{site}', UniversalScraper, site, query, max_products)
+    
+    def flush_stats(self):
+        """Сохраняет статистику селекторов (раз на серию поисков, а не на страницу)"""
+        get_selector_stats().save()
     
     def close_all(self):
         """Закрыть все браузеры"""
+        self.flush_stats()
         for name, scraper in self._scrapers.items():
             try:
                 scraper.close()
@@ -216,6 +482,8 @@ class ScraperManager:
             except Exception as e:
                 self.logger.warning(f"⚠️ Ошибка закрытия {name}: {e}")
         self._scrapers.clear()
+        if self.browser_pool:
+            self.browser_pool.close()
     
     def __del__(self):
         """Деструктор - закрываем все браузеры"""
@@ -224,10 +492,53 @@ class ScraperManager:
         except:
             pass
     
+    def get_status(self) -> Dict:
+        """Возвращает состояние менеджера (активные скраперы, кеш, ограничитель запросов)"""
+        return {
+            'active_scrapers': list(self._scrapers.keys()),
+            'browser_mode': 'shared' if self.browser_pool else 'separate',
+            'cache': self.cache.get_stats() if self.cache else None,
+            'rate_limits': {
+                'backend': self.rate_limiter.backend,
+                'hosts': self.rate_limiter.get_metrics(),
+            },
+            'circuit_breakers': self.circuit_breaker.get_stats(),
+            'drivers': get_driver_factory().get_stats(),
+            'metrics': self.metrics.summary(),
+            'deferred': self.deferred.snapshot(),
+        }
+    
+    def get_metrics(self) -> Dict[str, Dict]:
+        """Замеры фаз и счетчики карточек по сайтам за текущий запуск"""
+        return self.metrics.summary()
+    
+    def reset_metrics(self):
+        """Начинает сбор замеров заново (вызывается перед каждым запуском)"""
+        self.metrics.reset()
+    
+    def get_skipped_sites(self) -> Dict[str, int]:
+        """Сколько запросов к каждому сайту пропущено предохранителем за текущий запуск"""
+        return self.circuit_breaker.get_skipped()
+    
+    def reset_skipped_sites(self):
+        """Начинает новый запуск: обнуляет счетчики пропусков"""
+        self.circuit_breaker.reset_skipped()
+    
     def get_supported_sites(self) -> Dict[str, str]:
         """Возвращает список поддерживаемых сайтов"""
         return self.SUPPORTED_SITES.copy()
     
+    def resolve_sites(self, sites: Optional[List[str]] = None) -> List[str]:
+        """Канонические ключи сайтов без повторов (все поддерживаемые, если None)"""
+        if not sites:
+            return list(self.SUPPORTED_SITES.keys())
+        resolved = []
+        for site in sites:
+            canonical_site = self._normalize_site_key(site)
+            if canonical_site and canonical_site not in resolved:
+                resolved.append(canonical_site)
+        return resolved
+    
     def _normalize_site_key(self, site: Optional[str]) -> Optional[str]:
         """Приводит входящее имя сайта к каноническому ключу"""
         if not site:
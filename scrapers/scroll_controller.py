@@ -0,0 +1,114 @@
+"""
+Управляемая прокрутка страниц с подгрузкой товаров
+После каждого шага карточки считаются одним execute_script: прокрутка
+останавливается, как только карточек хватает или их число перестало расти.
+"""
+
+import logging
+import time
+from typing import Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+# Возвращает [число карточек, достигнут ли конец страницы].
+# Карточки считаются по первому селектору, который что-то нашел: объединение
+# селекторов карточки и ее внутреннего блока посчитало бы каждую дважды.
+COUNT_CARDS_JS = """
+var nodes = [];
+for (var s = 0; s < arguments[0].length && !nodes.length; s++) {
+    try { nodes = document.querySelectorAll(arguments[0][s]); } catch (e) { nodes = []; }
+}
+var count = nodes.length;
+if (arguments[1]) {
+    var seen = {};
+    count = 0;
+    for (var i = 0; i < nodes.length; i++) {
+        var href = (nodes[i].getAttribute('href') || '').split('?')[0];
+        if (href && !seen[href]) { seen[href] = true; count++; }
+    }
+}
+var bottom = window.scrollY + window.innerHeight >= document.documentElement.scrollHeight - 50;
+return [count, bottom];
+"""
+
+
+class ScrollController:
+    """
+    Прокрутка до нужного количества карточек
+
+    - при малом max_products хватает первого экрана, прокрутки нет
+    - при большом прокрутка продолжается, пока сайт подгружает карточки
+    """
+
+    def __init__(
+        self,
+        driver,
+        card_selector: Union[str, Sequence[str]],
+        unique_href: bool = False,
+        step_px: int = 1200,
+        pause: float = 0.8,
+        max_steps: int = 20,
+        patience: int = 2,
+    ):
+        """
+        Args:
+            driver: Selenium WebDriver
+            card_selector: CSS-селектор карточки (или ссылки на товар) либо список
+                альтернативных селекторов - считается первый сработавший
+            unique_href: считать уникальные href вместо элементов (для селекторов ссылок)
+            step_px: шаг прокрутки в пикселях
+            pause: пауза после шага для подгрузки
+            max_steps: максимум шагов прокрутки
+            patience: сколько шагов без роста числа карточек допускается
+        """
+        self.driver = driver
+        self.card_selectors = [card_selector] if isinstance(card_selector, str) else list(card_selector)
+        self.unique_href = unique_href
+        self.step_px = step_px
+        self.pause = pause
+        self.max_steps = max_steps
+        self.patience = patience
+        self.logger = logging.getLogger(__name__)
+
+    def count_cards(self) -> int:
+        """Текущее количество карточек на странице"""
+        return self._measure()[0]
+
+    def scroll_until(self, max_products: int) -> int:
+        """
+        Прокручивает страницу, пока карточек меньше max_products и они подгружаются
+
+        Returns:
+            количество карточек после прокрутки
+        """
+        try:
+            count, at_bottom = self._measure()
+            steps = 0
+            stale_steps = 0
+
+            while count < max_products and steps < self.max_steps:
+                self.driver.execute_script("window.scrollBy(0, arguments[0]);", self.step_px)
+                time.sleep(self.pause)
+                steps += 1
+
+                new_count, at_bottom = self._measure()
+                if new_count > count:
+                    stale_steps = 0
+                else:
+                    stale_steps += 1
+                count = new_count
+
+                # Конец страницы и новых карточек нет - подгружать больше нечего
+                if stale_steps >= self.patience or (at_bottom and stale_steps):
+                    break
+
+            self.logger.debug(f"Прокрутка: {steps} шагов, карточек {count}")
+            return count
+
+        except Exception as e:
+            self.logger.debug(f"Ошибка прокрутки: {e}")
+            return 0
+
+    def _measure(self):
+        count, at_bottom = self.driver.execute_script(COUNT_CARDS_JS, self.card_selectors, self.unique_href)
+        return int(count or 0), bool(at_bottom)
@@ -0,0 +1,130 @@
+"""
+Статистика срабатывания селекторов
+Для каждого сайта и группы селекторов (карточки, название, цена, ссылки)
+считается, сколько раз селектор пробовали, сколько раз он сработал и
+сколько элементов дал. Порядок перебора строится по этой статистике:
+исторический победитель идет первым, а селекторы, не срабатывавшие
+demote_after запусков подряд, уходят в конец списка.
+Статистика сохраняется в data/selector_stats.json между запусками.
+"""
+
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class SelectorStats:
+    """Счетчики селекторов по сайтам с сохранением в JSON"""
+
+    DEFAULT_PATH = 'data/selector_stats.json'
+
+    def __init__(self, path: Optional[str] = DEFAULT_PATH, demote_after: int = 5):
+        """
+        Args:
+            path: файл статистики (None - только в памяти)
+            demote_after: через сколько запусков без срабатывания селектор понижается
+        """
+        self.path = Path(path) if path else None
+        self.demote_after = demote_after
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # один .tmp на файл - записи по очереди
+        self._dirty = False
+        self.runs: Dict[str, int] = {}
+        self.selectors: Dict[str, Dict[str, Dict[str, Dict]]] = {}
+        self._load()
+
+    def begin_run(self, site: str) -> int:
+        """Отмечает новый запуск (страницу) сайта; возвращает его номер"""
+        with self._lock:
+            self.runs[site] = self.runs.get(site, 0) + 1
+            self._dirty = True
+            return self.runs[site]
+
+    def rank(self, site: str, group: str, selectors: Sequence[str]) -> List[str]:
+        """Селекторы в порядке перебора: понижение, доля срабатываний, исходный порядок"""
+        with self._lock:
+            run = self.runs.get(site, 0)
+            stats = self.selectors.get(site, {}).get(group, {})
+
+            def key(item):
+                index, selector = item
+                entry = stats.get(selector)
+                if not entry:
+                    return (False, -0.5, index)
+                last_run = entry.get('last_hit_run') or entry.get('first_run', run)
+                demoted = run - last_run >= self.demote_after
+                # Сглаживание: новый селектор не проигрывает сразу после первого промаха
+                hit_rate = (entry['hits'] + 1) / (entry['tries'] + 2)
+                return (demoted, -hit_rate, index)
+
+            return [selector for _, selector in sorted(enumerate(selectors), key=key)]
+
+    def observe(self, site: str, group: str, selector: str, hit: bool, found: int = 1):
+        """Результат одной попытки селектора"""
+        with self._lock:
+            run = self.runs.get(site, 0)
+            entry = self.selectors.setdefault(site, {}).setdefault(group, {}).get(selector)
+            if entry is None:
+                entry = self.selectors[site][group][selector] = {
+                    'tries': 0, 'hits': 0, 'yield': 0, 'first_run': run,
+                    'last_hit_run': None, 'last_success': None,
+                }
+            entry['tries'] += 1
+            if hit:
+                entry['hits'] += 1
+                entry['yield'] += found
+                entry['last_hit_run'] = run
+                entry['last_success'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            self._dirty = True
+
+    def get_stats(self, site: Optional[str] = None) -> Dict:
+        """Копия статистики (по сайту или целиком)"""
+        with self._lock:
+            data = json.loads(json.dumps(self.selectors))
+        return data.get(site, {}) if site else data
+
+    def save(self):
+        """Сохраняет статистику, если она менялась"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({'runs': self.runs, 'selectors': self.selectors}, ensure_ascii=False)
+            self._dirty = False
+        with self._save_lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix('.tmp')
+                tmp_path.write_text(payload, encoding='utf-8')
+                tmp_path.replace(self.path)
+            except OSError as e:
+                logger.debug(f"Не удалось сохранить статистику селекторов: {e}")
+
+    def _load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            self.runs = data.get('runs', {})
+            self.selectors = data.get('selectors', {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Статистика селекторов повреждена, начинаем заново: {e}")
+
+
+_stats: Optional[SelectorStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_selector_stats() -> SelectorStats:
+    """Общая статистика процесса"""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = SelectorStats()
+        return _stats
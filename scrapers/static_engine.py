@@ -0,0 +1,181 @@
+"""
+Асинхронный HTTP-движок для небольших интернет-магазинов
+mr-moto.ru, flipup.ru, pro-ekip.ru, motoekip.su и motocomfort.ru отдают
+результаты поиска готовым HTML, поэтому браузер для них не нужен:
+страницы загружаются параллельно через httpx и разбираются теми же
+селекторами, что и в UniversalScraper.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .antibot import detect_block
+from .instrumentation import PhaseTimer
+from .rate_limiter import get_rate_limiter
+from .replay import get_record_corpus, get_replay_base, replay_url
+from .product import Product
+from .universal_scraper import UniversalScraper
+
+# Попытка импорта httpx (без него используется только Selenium)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# HTTP/2 в httpx требует пакет h2
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class StaticHTMLEngine:
+    """
+    Параллельная загрузка страниц поиска без браузера
+
+    - общий пул соединений (keep-alive, HTTP/2 если доступен)
+    - ограничение одновременных запросов на каждый хост
+    - разбор через UniversalScraper.parse_page
+    """
+
+    STATIC_SITES = ('mr-moto.ru', 'flipup.ru', 'pro-ekip.ru', 'motoekip.su', 'motocomfort.ru')
+
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                      '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
+    }
+
+    def __init__(
+        self,
+        parser: Optional[UniversalScraper] = None,
+        per_host_limit: int = 2,
+        max_connections: int = 20,
+        timeout: float = 20.0,
+    ):
+        """
+        Args:
+            parser: UniversalScraper, чьи селекторы используются для разбора
+            per_host_limit: максимум одновременных запросов к одному сайту
+            max_connections: размер пула соединений
+            timeout: таймаут запроса в секундах
+        """
+        self.parser = parser or UniversalScraper(headless=True)
+        self.per_host_limit = per_host_limit
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.rate_limiter = get_rate_limiter()
+        # Замеры последней загрузки по (домен, запрос) - забирает ScraperManager
+        self.timers: Dict[Tuple[str, str], PhaseTimer] = {}
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Можно ли использовать движок (установлен ли httpx)"""
+        return HTTPX_AVAILABLE
+
+    def supports(self, site: str) -> bool:
+        """Отдает ли сайт результаты поиска статическим HTML"""
+        return site in self.STATIC_SITES
+
+    def search_sites(self, sites: List[str], query: str, max_products: int = 20) -> Dict[str, List[Product]]:
+        """
+        Параллельный поиск одного запроса на нескольких сайтах
+
+        Returns:
+            словарь {домен: [товары]} (пустой список - нужен Selenium)
+        """
+        results = self.search_many([(site, query) for site in sites], max_products)
+        return {site: results.get((site, query), []) for site in sites}
+
+    def search_many(self, requests: List[Tuple[str, str]], max_products: int = 20) -> Dict[Tuple[str, str], List[Product]]:
+        """
+        Параллельный поиск пар (домен, запрос)
+
+        Returns:
+            словарь {(домен, запрос): [товары]}
+        """
+        if not HTTPX_AVAILABLE or not requests:
+            return {}
+        return self._run(self._search_all(requests, max_products))
+
+    async def _search_all(self, requests: List[Tuple[str, str]], max_products: int) -> Dict[Tuple[str, str], List[Product]]:
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+        semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        async with httpx.AsyncClient(
+            headers=self.HEADERS,
+            http2=HTTP2_AVAILABLE,
+            limits=limits,
+            timeout=self.timeout,
+            follow_redirects=True,
+        ) as client:
+            tasks = []
+            for site, query in requests:
+                if site not in semaphores:
+                    semaphores[site] = asyncio.Semaphore(self.per_host_limit)
+                tasks.append(self._search_one(client, semaphores[site], site, query, max_products))
+            products_lists = await asyncio.gather(*tasks)
+
+        return dict(zip(requests, products_lists))
+
+    async def _search_one(self, client, semaphore: asyncio.Semaphore, site: str, query: str, max_products: int) -> List[Product]:
+        url = self.parser.build_search_url(site, query)
+        replay_base = get_replay_base()
+        timer = self.timers[(site, query)] = PhaseTimer()
+        try:
+            async with semaphore:
+                await self.rate_limiter.acquire_async(url)
+                timer.lap('rate_limit')
+                response = await client.get(replay_url(url, replay_base) if replay_base else url)
+                timer.lap('navigate')
+            if response.status_code == 429:
+                self.rate_limiter.report(url, 'throttled')
+            response.raise_for_status()
+        except Exception as e:
+            self.logger.warning(f"⚠️ {site}: HTTP-загрузка не удалась ({e})")
+            return []
+
+        reason = detect_block(str(response.url), html=response.text)
+        if reason:
+            # Страница проверки вместо выдачи - пусть ее проходит браузер
+            self.rate_limiter.report(url, 'captcha')
+            self.logger.warning(f"🧩 {site}: {reason} при HTTP-загрузке, используем Selenium")
+            return []
+
+        self.logger.info(f"🌐 {site}: {url} ({response.http_version}, {len(response.content)} байт)")
+        
+        corpus = get_record_corpus()
+        if corpus:
+            corpus.save(url, response.text, response.headers.get('content-type', 'text/html').split(';')[0])
+
+        # Разбор - CPU-работа, выносим из event loop
+        return await asyncio.to_thread(self.parser.parse_page, response.text, site, max_products, timer)
+
+    def _run(self, coro):
+        """Запускает корутину из синхронного кода (в том числе внутри работающего loop)"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+
+        # Уже внутри event loop (например, Celery-задача с asyncio.run) - отдельный поток
+        result = {}
+
+        def runner():
+            result['value'] = asyncio.run(coro)
+
+        thread = threading.Thread(target=runner, daemon=True)
+        thread.start()
+        thread.join()
+        return result.get('value', {})
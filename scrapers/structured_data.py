@@ -0,0 +1,425 @@
+"""
+Извлечение товаров из встроенных в страницу JSON-данных
+Ozon, Яндекс Маркет и Wildberries кладут в HTML машиночитаемое состояние:
+JSON-LD (Product/Offer), __NEXT_DATA__, window.__*__ и data-state виджетов.
+Разбор этих данных быстрее и устойчивее к смене вёрстки, чем обход DOM.
+Если данных меньше, чем нужно товаров, скрапер добирает карточки из DOM
+(merge_products).
+"""
+
+import html
+import json
+import logging
+import re
+from typing import Any, Dict, Iterator, List, Optional
+
+from .product import Product
+from .product_dedup import product_key
+
+logger = logging.getLogger(__name__)
+
+
+# <script type="application/ld+json">...</script>
+JSON_LD_RE = re.compile(
+    r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL,
+)
+
+# <script id="__NEXT_DATA__" type="application/json">...</script> и прочие JSON-скрипты
+JSON_SCRIPT_RE = re.compile(
+    r'<script[^>]*type=["\']application/json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Яндекс Маркет: <noframes data-apiary="patch">{...}</noframes>
+APIARY_RE = re.compile(
+    r'<noframes[^>]*data-apiary[^>]*>(.*?)</noframes>',
+    re.IGNORECASE | re.DOTALL,
+)
+
+# window.__INITIAL_STATE__ = {...}; / __PRELOADED_STATE__ = {...}
+WINDOW_STATE_RE = re.compile(r'(?:window\.)?__[A-Z][A-Z0-9_]*__\s*=\s*(?=[\[{])')
+
+# Ozon: <div id="state-searchResultsV2-..." data-state='{...}'>
+DATA_STATE_RE = re.compile(
+    r'data-state=(?:\'([^\']*)\'|"([^"]*)")',
+    re.DOTALL,
+)
+
+PRICE_NUMBER_RE = re.compile(r'\d[\d\s\u00a0\u202f\u2009]*(?:[.,]\d{1,2})?')
+
+TITLE_KEYS = ('name', 'title', 'productName', 'fullName')
+PRICE_KEYS = ('price', 'salePriceU', 'priceU', 'finalPrice', 'currentPrice', 'lowPrice')
+OLD_PRICE_KEYS = ('oldPrice', 'basePrice', 'originalPrice', 'priceU', 'highPrice')
+URL_KEYS = ('url', 'link', 'href', 'productUrl', 'slug')
+IMAGE_KEYS = ('image', 'imageUrl', 'picture', 'photo', 'img')
+BRAND_KEYS = ('brand', 'brandName', 'vendor', 'manufacturer')
+RATING_KEYS = ('ratingValue', 'rating', 'reviewRating', 'supplierRating')
+REVIEWS_KEYS = ('reviewCount', 'ratingCount', 'reviewsCount', 'feedbacks', 'opinions')
+ID_KEYS = ('nmId', 'id', 'sku', 'productId')
+
+# Ключи цен в копейках (Wildberries: priceU, salePriceU)
+KOPECK_PRICE_KEYS = {'salePriceU', 'priceU'}
+
+# Защита от патологически глубоких структур
+MAX_DEPTH = 40
+
+
+class StructuredDataExtractor:
+    """
+    Извлекает товары из встроенных JSON-данных страницы поиска
+
+    Возвращает словари с полями title, price, old_price, url, brand,
+    rating, reviews_count, image_url — их скрапер превращает в свой Product.
+    """
+
+    def __init__(self, base_url: str, id_url_template: Optional[str] = None):
+        """
+        Args:
+            base_url: префикс для относительных ссылок (например, 'https://www.ozon.ru')
+            id_url_template: шаблон ссылки по ID товара, если URL в данных нет
+                (например, 'https://www.wildberries.ru/catalog/{id}/detail.aspx')
+        """
+        self.base_url = base_url.rstrip('/')
+        self.id_url_template = id_url_template
+        self.logger = logging.getLogger(__name__)
+
+    def extract(self, page_source: str, max_products: int = 20) -> List[Dict[str, Any]]:
+        """
+        Ищет встроенные JSON-данные и извлекает из них товары
+
+        Args:
+            page_source: HTML страницы
+            max_products: максимум товаров
+
+        Returns:
+            список словарей товаров (пустой, если данных нет — тогда нужен DOM)
+        """
+        if not page_source:
+            return []
+
+        products: List[Dict[str, Any]] = []
+        seen_urls = set()
+
+        for payload in self._iter_payloads(page_source):
+            for item in self._iter_product_nodes(payload):
+                product = self._build_product(item)
+                if not product or product['url'] in seen_urls:
+                    continue
+                seen_urls.add(product['url'])
+                products.append(product)
+                if len(products) >= max_products:
+                    return products
+
+        return products
+
+    def extract_products(self, driver, source: str, max_products: int = 20, timer=None) -> List[Product]:
+        """
+        Товары из JSON-данных страницы, открытой в браузере
+
+        Ошибка чтения страницы не прерывает поиск: скрапер перейдет к DOM.
+
+        Args:
+            driver: WebDriver с открытой страницей поиска
+            source: название источника для Product
+            max_products: максимум товаров
+            timer: PhaseTimer скрапера (фаза page_source, счетчики found/parsed)
+        """
+        try:
+            page_source = driver.page_source
+            if timer:
+                timer.lap('page_source')
+            items = self.extract(page_source, max_products)
+        except Exception as e:
+            self.logger.debug(f"Ошибка извлечения JSON-данных: {e}")
+            return []
+        if timer:
+            timer.count('found', len(items))
+            timer.count('parsed', len(items))
+        return [Product(source=source, availability="in_stock", **item) for item in items]
+
+    # ------------------------------------------------------------------
+    # Поиск JSON-блоков в HTML
+    # ------------------------------------------------------------------
+
+    def _iter_payloads(self, page_source: str) -> Iterator[Any]:
+        """Перебирает все найденные JSON-блоки страницы (от самых надёжных)"""
+        for match in JSON_LD_RE.finditer(page_source):
+            data = self._loads(match.group(1))
+            if data is not None:
+                yield data
+
+        for regex in (JSON_SCRIPT_RE, APIARY_RE):
+            for match in regex.finditer(page_source):
+                data = self._loads(match.group(1))
+                if data is not None:
+                    yield data
+
+        decoder = json.JSONDecoder()
+        for match in WINDOW_STATE_RE.finditer(page_source):
+            try:
+                data, _ = decoder.raw_decode(page_source, match.end())
+                yield data
+            except ValueError:
+                continue
+
+        for match in DATA_STATE_RE.finditer(page_source):
+            raw = match.group(1) if match.group(1) is not None else match.group(2)
+            if not raw or raw[0] not in '{[' and not raw.startswith('&'):
+                continue
+            data = self._loads(html.unescape(raw))
+            if data is not None:
+                yield data
+
+    def _loads(self, raw: str) -> Any:
+        """Безопасный json.loads (с учётом HTML-экранирования)"""
+        raw = (raw or '').strip()
+        if not raw:
+            return None
+        if raw.startswith('<!--'):
+            raw = raw[4:].rstrip('->').strip()
+        try:
+            return json.loads(raw)
+        except ValueError:
+            try:
+                return json.loads(html.unescape(raw))
+            except ValueError:
+                return None
+
+    # ------------------------------------------------------------------
+    # Поиск товаров внутри JSON
+    # ------------------------------------------------------------------
+
+    def _iter_product_nodes(self, data: Any, depth: int = 0) -> Iterator[Dict]:
+        """Обходит JSON и возвращает словари, похожие на товар"""
+        if depth > MAX_DEPTH:
+            return
+
+        if isinstance(data, dict):
+            if self._looks_like_product(data):
+                yield data
+                return
+            for value in data.values():
+                if isinstance(value, str) and value[:1] in '{[':
+                    # Ozon вкладывает состояние виджетов строкой JSON
+                    nested = self._loads(value)
+                    if nested is not None:
+                        yield from self._iter_product_nodes(nested, depth + 1)
+                elif isinstance(value, (dict, list)):
+                    yield from self._iter_product_nodes(value, depth + 1)
+
+        elif isinstance(data, list):
+            for value in data:
+                if isinstance(value, (dict, list)):
+                    yield from self._iter_product_nodes(value, depth + 1)
+
+    def _looks_like_product(self, node: Dict) -> bool:
+        """Эвристика: у узла есть название и цена (или это JSON-LD Product)"""
+        node_type = node.get('@type')
+        if node_type == 'Product' or (isinstance(node_type, list) and 'Product' in node_type):
+            return True
+        if 'mainState' in node and 'action' in node:
+            # Плитка поиска Ozon (searchResultsV2)
+            return True
+        has_title = any(isinstance(node.get(key), str) for key in TITLE_KEYS)
+        has_price = 'offers' in node or any(key in node for key in PRICE_KEYS)
+        return has_title and has_price
+
+    # ------------------------------------------------------------------
+    # Построение товара
+    # ------------------------------------------------------------------
+
+    def _build_product(self, node: Dict) -> Optional[Dict[str, Any]]:
+        """Конвертирует узел JSON в словарь товара"""
+        try:
+            if 'mainState' in node and 'action' in node:
+                fields = self._ozon_tile_fields(node)
+            else:
+                fields = self._generic_fields(node)
+        except Exception as e:
+            self.logger.debug(f"Ошибка разбора JSON-товара: {e}")
+            return None
+
+        title = (fields.get('title') or '').strip()
+        price = fields.get('price') or 0.0
+        url = self._absolute_url(fields.get('url') or '')
+        if not url and self.id_url_template and fields.get('id'):
+            url = self.id_url_template.format(id=fields['id'])
+
+        if len(title) < 5 or price <= 0 or not url:
+            return None
+
+        old_price = fields.get('old_price')
+        if old_price is not None and old_price <= price:
+            old_price = None
+
+        rating = fields.get('rating') or 0.0
+        if rating > 5.0:
+            rating = 0.0
+
+        return {
+            'title': html.unescape(title)[:200],
+            'price': price,
+            'old_price': old_price,
+            'url': url.split('?')[0],
+            'brand': fields.get('brand') or '',
+            'rating': rating,
+            'reviews_count': fields.get('reviews_count') or 0,
+            'image_url': self._absolute_url(fields.get('image_url') or ''),
+        }
+
+    def _generic_fields(self, node: Dict) -> Dict[str, Any]:
+        """Поля товара из JSON-LD Product / __NEXT_DATA__ / API-подобных структур"""
+        fields: Dict[str, Any] = {
+            'title': self._first_str(node, TITLE_KEYS),
+            'url': self._first_str(node, URL_KEYS),
+            'id': self._first_scalar(node, ID_KEYS),
+            'brand': self._brand(node),
+            'image_url': self._image(node),
+        }
+
+        offers = node.get('offers')
+        if isinstance(offers, list):
+            offers = offers[0] if offers else None
+        if isinstance(offers, dict):
+            fields['price'] = self._price_from(offers, ('price', 'lowPrice'))
+            fields['old_price'] = self._price_from(offers, ('highPrice',))
+            if not fields['url']:
+                fields['url'] = self._first_str(offers, URL_KEYS)
+        else:
+            fields['price'] = self._price_from(node, PRICE_KEYS)
+            fields['old_price'] = self._price_from(node, OLD_PRICE_KEYS)
+
+        rating_source = node.get('aggregateRating') if isinstance(node.get('aggregateRating'), dict) else node
+        fields['rating'] = self._to_float(self._first_scalar(rating_source, RATING_KEYS))
+        fields['reviews_count'] = int(self._to_float(self._first_scalar(rating_source, REVIEWS_KEYS)))
+        return fields
+
+    def _ozon_tile_fields(self, node: Dict) -> Dict[str, Any]:
+        """Поля плитки Ozon (mainState — список атомов textAtom/priceV2/labelList)"""
+        fields: Dict[str, Any] = {
+            'url': (node.get('action') or {}).get('link', ''),
+            'id': node.get('sku'),
+        }
+        prices: List[float] = []
+
+        for entry in node.get('mainState') or []:
+            atom = entry.get('atom') or {}
+            atom_type = atom.get('type')
+            if atom_type == 'textAtom' and not fields.get('title'):
+                fields['title'] = (atom.get('textAtom') or {}).get('text', '')
+            elif atom_type == 'priceV2':
+                for price_item in (atom.get('priceV2') or {}).get('price') or []:
+                    value = self._parse_price(price_item.get('text'))
+                    if value > 0:
+                        prices.append(value)
+            elif atom_type == 'labelList':
+                for label in (atom.get('labelList') or {}).get('items') or []:
+                    text = html.unescape(label.get('title') or '')
+                    if 'отзыв' in text.lower():
+                        fields['reviews_count'] = int(self._parse_price(text))
+                    elif re.fullmatch(r'\d(?:[.,]\d+)?', text.strip()):
+                        fields['rating'] = self._to_float(text.replace(',', '.'))
+
+        if prices:
+            fields['price'] = min(prices)
+            fields['old_price'] = max(prices) if len(prices) > 1 else None
+
+        images = ((node.get('tileImage') or {}).get('items') or [])
+        if images:
+            fields['image_url'] = ((images[0].get('image') or {}).get('link') or '')
+        return fields
+
+    # ------------------------------------------------------------------
+    # Вспомогательные функции
+    # ------------------------------------------------------------------
+
+    def _absolute_url(self, url: str) -> str:
+        if not url:
+            return ''
+        if url.startswith('//'):
+            return 'https:' + url
+        if url.startswith('http'):
+            return url
+        return f"{self.base_url}{url if url.startswith('/') else '/' + url}"
+
+    def _first_str(self, node: Dict, keys) -> str:
+        for key in keys:
+            value = node.get(key)
+            if isinstance(value, str) and value.strip():
+                return value.strip()
+        return ''
+
+    def _first_scalar(self, node: Dict, keys) -> Any:
+        for key in keys:
+            value = node.get(key)
+            if isinstance(value, (str, int, float)) and not isinstance(value, bool) and value != '':
+                return value
+        return None
+
+    def _brand(self, node: Dict) -> str:
+        for key in BRAND_KEYS:
+            value = node.get(key)
+            if isinstance(value, dict):
+                value = value.get('name')
+            if isinstance(value, str) and value.strip():
+                return value.strip()
+        return ''
+
+    def _image(self, node: Dict) -> str:
+        for key in IMAGE_KEYS:
+            value = node.get(key)
+            if isinstance(value, list):
+                value = value[0] if value else None
+            if isinstance(value, dict):
+                value = value.get('url') or value.get('link') or value.get('contentUrl')
+            if isinstance(value, str) and value.strip():
+                return value.strip()
+        return ''
+
+    def _price_from(self, node: Dict, keys) -> Optional[float]:
+        """Первая положительная цена по списку ключей"""
+        for key in keys:
+            value = node.get(key)
+            if isinstance(value, dict):
+                value = value.get('value', value.get('price', value.get('amount')))
+            if value is None or isinstance(value, bool):
+                continue
+            price = self._parse_price(value)
+            if price > 0:
+                return price / 100 if key in KOPECK_PRICE_KEYS else price
+        return None
+
+    def _parse_price(self, value: Any) -> float:
+        """Число из '12 990 ₽', '12990.00' или 12990"""
+        if isinstance(value, (int, float)):
+            return float(value)
+        if not isinstance(value, str):
+            return 0.0
+        match = PRICE_NUMBER_RE.search(value)
+        if not match:
+            return 0.0
+        number = re.sub(r'[\s\u00a0\u202f\u2009]', '', match.group(0)).replace(',', '.')
+        return self._to_float(number)
+
+    def _to_float(self, value: Any) -> float:
+        try:
+            return float(value) if value is not None else 0.0
+        except (TypeError, ValueError):
+            return 0.0
+
+
+def merge_products(structured: List[Product], dom: List[Product], max_products: int) -> List[Product]:
+    """Товары из JSON-данных, дополненные карточками из DOM без повторов (по ключу URL)"""
+    if not structured:
+        return dom
+    merged = list(structured)
+    seen = {product_key(product.url) for product in structured}
+    for product in dom:
+        if len(merged) >= max_products:
+            break
+        key = product_key(product.url)
+        if key not in seen:
+            seen.add(key)
+            merged.append(product)
+    return merged
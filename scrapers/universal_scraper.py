@@ -4,30 +4,24 @@
 На основе отчета по инспекции mr-moto.ru
 """
 
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
 import time
 import re
 import logging
-from dataclasses import dataclass
 from typing import List, Optional
 from urllib.parse import quote_plus
 import random
 
-@dataclass
-class Product:
-    title: str
-    price: float
-    old_price: Optional[float] = None
-    url: str = ""
-    source: str = ""
-    availability: str = "unknown"
-    brand: str = ""
-    image_url: str = ""
-
+from .antibot import BlockedError, check_driver
+from .html_parsing import make_soup, get_site_plan
+from .instrumentation import PhaseTimer
+from .product import Product
+from .driver_factory import get_driver_factory
+from .rate_limiter import get_rate_limiter
+from .scroll_controller import ScrollController
+from .selector_stats import get_selector_stats
 
 class UniversalScraper:
     """
@@ -110,28 +104,19 @@ class UniversalScraper:
         self.headless = headless
         self.driver = None
         self.logger = logging.getLogger(__name__)
+        self.rate_limiter = get_rate_limiter()
+        self.timer = PhaseTimer()  # замеры последнего поиска
         logging.basicConfig(level=logging.INFO)
     
-    def _init_driver(self):
-        """Инициализация драйвера"""
+    def _init_driver(self, site: str):
+        """Инициализация драйвера (профиль Chrome - отдельный для каждого сайта)"""
         if self.driver:
             return
         
         try:
-            options = uc.ChromeOptions()
-            
-            if self.headless:
-                options.add_argument('--headless=new')
-            
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-gpu')
-            options.add_argument('--window-size=1920,1080')
-            options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-            
-            self.driver = uc.Chrome(options=options)
-            self.driver.set_page_load_timeout(45)  # Увеличен timeout
+            self.driver = get_driver_factory().create(
+                site, headless=self.headless, page_load_timeout=45
+            )
             
             self.logger.info("✅ Chrome драйвер инициализирован")
             
@@ -149,127 +134,115 @@ class UniversalScraper:
             max_products: максимальное количество товаров
         """
         products = []
+        timer = self.timer = PhaseTimer()
         
         try:
-            self._init_driver()
-            
-            # Получаем конфигурацию сайта
-            config = self.SITES_CONFIG.get(site)
-            
-            if not config:
-                self.logger.warning(f"⚠️ Конфигурация для {site} не найдена. Используем универсальный подход.")
-                config = {
-                    'search_url': f'https://{site}/search?q={{query}}',
-                    'product_card_selectors': ['div.product', 'div.item', 'article'],
-                    'title_selectors': ['h3', 'h2', 'a.title', 'a.name'],
-                    'price_selectors': ['span.price', 'div.price', 'span.cost'],
-                }
+            self._init_driver(site)
+            timer.lap('driver_init')
             
             # Формируем URL
-            search_url = config['search_url'].format(query=quote_plus(query))
+            search_url = self.build_search_url(site, query)
             
             self.logger.info(f"🔍 Поиск на {site}: {query}")
             self.logger.info(f"📍 URL: {search_url}")
             
+            self.rate_limiter.acquire(search_url)
+            timer.lap('rate_limit')
             self.driver.get(search_url)
+            get_driver_factory().mark_first_page(site)
+            timer.lap('navigate')
             
             # Ждем загрузки
             time.sleep(random.uniform(2, 4))
+            timer.lap('wait')
+            check_driver(self.driver, site)
             
             # Прокручиваем
-            self._scroll_page()
+            self._scroll_page(site, max_products)
+            timer.lap('scroll')
             
             # Парсим
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            
-            # Ищем карточки товаров
-            cards = self._find_product_cards(soup, config.get('product_card_selectors', []))
-            
-            self.logger.info(f"📦 Найдено карточек: {len(cards)}")
-            
-            for card in cards[:max_products]:
-                try:
-                    product = self._parse_product_card(card, config, site)
-                    if product:
-                        products.append(product)
-                except Exception as e:
-                    self.logger.debug(f"Ошибка парсинга: {e}")
-                    continue
-            
-            self.logger.info(f"✅ Успешно спарсено: {len(products)} товаров")
+            html = self.driver.page_source
+            timer.lap('page_source')
+            products = self.parse_page(html, site, max_products, timer=timer)
             
+        except BlockedError:
+            raise
         except Exception as e:
             self.logger.error(f"❌ Ошибка поиска: {e}")
         
         return products
     
-    def _find_product_cards(self, soup, selectors):
-        """Ищет карточки товаров по списку селекторов"""
-        for selector in selectors or []:
-            cards = []
-            try:
-                cards = soup.select(selector)
-            except Exception:
-                # Падаем обратно на find_all для простых селекторов
-                if '.' in selector:
-                    tag, class_name = selector.split('.', 1)
-                    cards = soup.find_all(tag, class_=lambda x: x and class_name in str(x))
-                else:
-                    cards = soup.find_all(selector)
-            if cards:
-                return cards
+    def get_site_config(self, site: str) -> dict:
+        """Конфигурация селекторов сайта (или универсальная, если сайт неизвестен)"""
+        config = self.SITES_CONFIG.get(site)
         
-        # Если ничего не найдено, ищем универсально
-        cards = soup.find_all('div', class_=lambda x: x and any(
-            word in str(x).lower() for word in ['product', 'item', 'goods', 'catalog']
-        ))
+        if not config:
+            self.logger.warning(f"⚠️ Конфигурация для {site} не найдена. Используем универсальный подход.")
+            config = {
+                'search_url': f'https://{site}/search?q={{query}}',
+                'product_card_selectors': ['div.product', 'div.item', 'article'],
+                'title_selectors': ['h3', 'h2', 'a.title', 'a.name'],
+                'price_selectors': ['span.price', 'div.price', 'span.cost'],
+            }
         
-        return cards
+        return config
+    
+    def build_search_url(self, site: str, query: str) -> str:
+        """URL страницы поиска для сайта"""
+        return self.get_site_config(site)['search_url'].format(query=quote_plus(query))
     
-    def _extract_value_by_selectors(self, node, selectors):
-        """Возвращает текст/атрибут первого подходящего элемента по списку селекторов"""
-        if not selectors:
-            return ""
+    def parse_page(
+        self,
+        html: str,
+        site: str,
+        max_products: int = 20,
+        timer: Optional[PhaseTimer] = None,
+    ) -> List[Product]:
+        """
+        Извлекает товары из HTML страницы поиска
         
-        for selector in selectors:
-            attr = 'text'
-            css = selector
-            if isinstance(selector, dict):
-                css = selector.get('selector')
-                attr = selector.get('attr', 'text')
-            if not css:
-                continue
+        Используется и Selenium-путем, и статическим HTTP-движком
+        (timer - замеры фаз parse/convert и счетчики карточек)
+        """
+        timer = timer or PhaseTimer()
+        plan = get_site_plan(site, self.get_site_config(site))
+        products = []
+        
+        soup = make_soup(html)
+        
+        # Ищем карточки товаров
+        cards = plan.find_cards(soup)
+        
+        self.logger.info(f"📦 Найдено карточек: {len(cards)}")
+        timer.count('found', len(cards))
+        timer.lap('parse')
+        
+        for card in cards[:max_products]:
             try:
-                element = node.select_one(css)
-            except Exception:
-                element = None
-            if not element:
+                product = self._parse_product_card(card, plan, site)
+                if product:
+                    products.append(product)
+                    timer.count('parsed')
+                else:
+                    timer.count('rejected')
+            except Exception as e:
+                timer.count('rejected')
+                self.logger.debug(f"Ошибка парсинга: {e}")
                 continue
-            
-            if attr == 'text':
-                value = element.get_text(strip=True)
-            else:
-                value = element.get(attr)
-            
-            if value:
-                return str(value).strip()
+        timer.lap('convert')
         
-        return ""
+        self.logger.info(f"✅ Успешно спарсено: {len(products)} товаров")
+        
+        return products
     
-    def _scroll_page(self):
-        """Прокручивает страницу"""
-        try:
-            for i in range(2):
-                self.driver.execute_script(f"window.scrollTo(0, {1000 * (i + 1)});")
-                time.sleep(1)
-            
-            self.driver.execute_script("window.scrollTo(0, 300);")
-            time.sleep(0.5)
-            
-        except Exception as e:
-            self.logger.debug(f"Ошибка прокрутки: {e}")
+    def _scroll_page(self, site: str, max_products: int):
+        """Прокручивает страницу, пока не подгрузится max_products карточек"""
+        # Селекторы в порядке перебора парсером: считается первый сработавший
+        selectors = self.get_site_config(site).get('product_card_selectors') or ['div.product']
+        ScrollController(self.driver, get_selector_stats().rank(site, 'cards', selectors)).scroll_until(max_products)
     
-    def _parse_product_card(self, card, config, site) -> Optional[Product]:
+    def _parse_product_card(self, card, plan, site) -> Optional[Product]:
         """Парсит карточку товара"""
         try:
             # Ссылка на товар
@@ -284,7 +257,7 @@ class UniversalScraper:
             product_url = href.split('?')[0]
             
             # Название
-            title = self._extract_value_by_selectors(card, config.get('title_selectors'))
+            title = plan.title.extract(card)
             if not title:
                 title = link.get('title', '') or link.get_text(strip=True)
             
@@ -292,12 +265,12 @@ class UniversalScraper:
                 return None
             
             # Бренд (опционально)
-            brand = self._extract_value_by_selectors(card, config.get('brand_selectors'))
+            brand = plan.brand.extract(card)
             
             # Цена
             price = 0.0
             old_price = None
-            price_text = self._extract_value_by_selectors(card, config.get('price_selectors'))
+            price_text = plan.price.extract(card)
             if price_text:
                 price = self._extract_price(price_text)
             
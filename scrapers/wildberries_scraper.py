@@ -3,32 +3,34 @@ Selenium скрапер для Wildberries
 На основе детального отчета по инспекции сайта
 """
 
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from bs4 import BeautifulSoup
 import time
 import re
 import logging
-from dataclasses import dataclass
 from typing import List, Optional
 from urllib.parse import quote
 import random
 
-@dataclass
-class Product:
-    title: str
-    price: float
-    old_price: Optional[float] = None
-    url: str = ""
-    source: str = "Wildberries"
-    availability: str = "unknown"
-    brand: str = ""
-    rating: float = 0.0
-    reviews_count: int = 0
-    image_url: str = ""
+from .antibot import BlockedError, check_driver
+from .html_parsing import make_soup
+from .instrumentation import PhaseTimer
+from .product import Product
+from .driver_factory import get_driver_factory
+from .rate_limiter import get_rate_limiter
+from .scroll_controller import ScrollController
+from .structured_data import StructuredDataExtractor, merge_products
+
+# Классы элементов карточки (компилируются один раз, а не для каждой карточки)
+NAME_CLASS_RE = re.compile('product-card__name|goods-name')
+BRAND_CLASS_RE = re.compile('product-card__brand|brand-name')
+PRICE_CLASS_RE = re.compile('price__lower-price|price-current')
+OLD_PRICE_CLASS_RE = re.compile('price__del|price-old')
+RATING_CLASS_RE = re.compile('address-rate-mini|product-card__rating|rating')
+SELLER_RATING_CLASS_RE = re.compile('address-rate-mini')
+REVIEWS_CLASS_RE = re.compile('product-card__count|reviews-count')
 
 
 class WildberriesScraper:
@@ -37,10 +39,22 @@ class WildberriesScraper:
     Обходит Cloudflare и корректно извлекает данные
     """
     
+    # Карточка товара на странице поиска (для подсчета при прокрутке)
+    CARD_SELECTOR = "article.product-card, div[data-nm-id]"
+    
+    # Сколько страниц выдачи открывать, если на первой не хватило товаров
+    MAX_PAGES = 3
+    
     def __init__(self, headless: bool = True):
         self.headless = headless
         self.driver = None
         self.logger = logging.getLogger(__name__)
+        self.rate_limiter = get_rate_limiter()
+        self.timer = PhaseTimer()  # замеры последнего поиска
+        self.structured_extractor = StructuredDataExtractor(
+            'https://www.wildberries.ru',
+            id_url_template='https://www.wildberries.ru/catalog/{id}/detail.aspx',
+        )
         logging.basicConfig(level=logging.INFO)
     
     def _init_driver(self):
@@ -49,21 +63,9 @@ class WildberriesScraper:
             return
         
         try:
-            options = uc.ChromeOptions()
-            
-            if self.headless:
-                options.add_argument('--headless=new')
-            
-            # Настройки для обхода детектирования
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-gpu')
-            options.add_argument('--window-size=1920,1080')
-            options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-            
-            self.driver = uc.Chrome(options=options)
-            self.driver.set_page_load_timeout(45)  # Увеличен timeout
+            self.driver = get_driver_factory().create(
+                'wildberries', headless=self.headless, page_load_timeout=45
+            )
             
             self.logger.info("✅ Chrome драйвер инициализирован")
             
@@ -83,9 +85,12 @@ class WildberriesScraper:
             список найденных товаров
         """
         products = []
+        structured = []
+        timer = self.timer = PhaseTimer()
         
         try:
             self._init_driver()
+            timer.lap('driver_init')
             
             # Формируем URL поиска
             search_url = f"https://www.wildberries.ru/catalog/0/search.aspx?search={quote(query)}"
@@ -94,60 +99,97 @@ class WildberriesScraper:
             self.logger.info(f"📍 URL: {search_url}")
             
             # Открываем страницу
+            self.rate_limiter.acquire(search_url)
+            timer.lap('rate_limit')
             self.driver.get(search_url)
+            get_driver_factory().mark_first_page('wildberries')
+            timer.lap('navigate')
             
             # Ждем загрузки (обход Cloudflare)
             time.sleep(random.uniform(3, 5))
-            
-            # Прокручиваем для загрузки товаров
-            self._scroll_page()
-            
-            # Парсим страницу
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            
-            # Ищем карточки товаров
-            # Wildberries использует data-nm-id для идентификации товаров
-            cards = soup.find_all('article', class_='product-card')
-            
-            if not cards:
-                # Альтернативный поиск
-                cards = soup.find_all('div', {'data-nm-id': True})
-            
-            self.logger.info(f"📦 Найдено карточек: {len(cards)}")
-            
-            for card in cards[:max_products]:
-                try:
-                    product = self._parse_product_card(card)
-                    if product:
-                        products.append(product)
-                except Exception as e:
-                    self.logger.debug(f"Ошибка парсинга карточки: {e}")
-                    continue
+            timer.lap('wait')
+            check_driver(self.driver, 'wildberries')
+            
+            # Сначала пробуем встроенные JSON-данные (JSON-LD, состояние страницы)
+            structured = self.structured_extractor.extract_products(self.driver, "Wildberries", max_products, timer)
+            timer.lap('parse')
+            if len(structured) >= max_products:
+                self.logger.info(f"✅ Успешно спарсено из JSON-данных: {len(structured)} товаров")
+                return structured
+            if structured:
+                # Данных меньше, чем нужно - добираем карточки из DOM
+                self.logger.info(f"📦 Из JSON-данных: {len(structured)} товаров, дополняем из DOM")
+            
+            seen_urls = set()
+            for page in range(1, self.MAX_PAGES + 1):
+                if page > 1:
+                    page_url = f"{search_url}&page={page}"
+                    self.logger.info(f"📄 Страница {page}: {page_url}")
+                    self.rate_limiter.acquire(page_url)
+                    timer.lap('rate_limit')
+                    self.driver.get(page_url)
+                    timer.lap('navigate')
+                    time.sleep(random.uniform(3, 5))
+                    timer.lap('wait')
+                    check_driver(self.driver, 'wildberries')
+                
+                # Прокручиваем для загрузки товаров
+                self._scroll_page(max_products - len(products))
+                timer.lap('scroll')
+                
+                # Парсим страницу
+                html = self.driver.page_source
+                timer.lap('page_source')
+                soup = make_soup(html)
+                
+                # Ищем карточки товаров
+                # Wildberries использует data-nm-id для идентификации товаров
+                cards = soup.find_all('article', class_='product-card')
+                
+                if not cards:
+                    # Альтернативный поиск
+                    cards = soup.find_all('div', {'data-nm-id': True})
+                
+                self.logger.info(f"📦 Найдено карточек: {len(cards)}")
+                timer.count('found', len(cards))
+                timer.lap('parse')
+                
+                added = 0
+                for card in cards:
+                    if len(products) >= max_products:
+                        break
+                    try:
+                        product = self._parse_product_card(card)
+                        if not product:
+                            timer.count('rejected')
+                        elif product.url not in seen_urls:
+                            seen_urls.add(product.url)
+                            products.append(product)
+                            timer.count('parsed')
+                            added += 1
+                    except Exception as e:
+                        timer.count('rejected')
+                        self.logger.debug(f"Ошибка парсинга карточки: {e}")
+                        continue
+                
+                timer.lap('convert')
+                
+                # Товаров хватает или следующая страница ничего не добавила
+                if len(products) >= max_products or not added:
+                    break
             
             self.logger.info(f"✅ Успешно спарсено: {len(products)} товаров")
             
+        except BlockedError:
+            raise
         except Exception as e:
             self.logger.error(f"❌ Ошибка поиска: {e}")
         
-        return products
+        return merge_products(structured, products, max_products)
     
-    def _scroll_page(self):
-        """Прокручивает страницу для загрузки товаров"""
-        try:
-            # Прокручиваем постепенно
-            scroll_pause = 1.5
-            scroll_height = 1000
-            
-            for i in range(3):
-                self.driver.execute_script(f"window.scrollTo(0, {scroll_height * (i + 1)});")
-                time.sleep(scroll_pause)
-            
-            # Возвращаемся наверх
-            self.driver.execute_script("window.scrollTo(0, 500);")
-            time.sleep(1)
-            
-        except Exception as e:
-            self.logger.debug(f"Ошибка прокрутки: {e}")
+    def _scroll_page(self, max_products: int):
+        """Прокручивает страницу, пока не подгрузится max_products карточек"""
+        ScrollController(self.driver, self.CARD_SELECTOR).scroll_until(max_products)
     
     def _parse_product_card(self, card) -> Optional[Product]:
         """
@@ -172,11 +214,11 @@ class WildberriesScraper:
                 return None
             
             # Название
-            name_elem = card.find(class_=re.compile('product-card__name|goods-name'))
+            name_elem = card.find(class_=NAME_CLASS_RE)
             title = name_elem.get_text(strip=True) if name_elem else ""
             
             # Бренд
-            brand_elem = card.find(class_=re.compile('product-card__brand|brand-name'))
+            brand_elem = card.find(class_=BRAND_CLASS_RE)
             brand = brand_elem.get_text(strip=True) if brand_elem else ""
             
             # Полное название
@@ -193,13 +235,13 @@ class WildberriesScraper:
             old_price = None
             
             # Цена со скидкой
-            price_elem = card.find(class_=re.compile('price__lower-price|price-current'))
+            price_elem = card.find(class_=PRICE_CLASS_RE)
             if price_elem:
                 price_text = price_elem.get_text(strip=True)
                 price = self._extract_price(price_text)
             
             # Старая цена
-            old_price_elem = card.find(class_=re.compile('price__del|price-old'))
+            old_price_elem = card.find(class_=OLD_PRICE_CLASS_RE)
             if old_price_elem:
                 old_price_text = old_price_elem.get_text(strip=True)
                 old_price = self._extract_price(old_price_text)
@@ -210,10 +252,10 @@ class WildberriesScraper:
             # Рейтинг продавца
             rating = 0.0
             # Ищем по конкретному классу: address-rate-mini address-rate-mini--sm
-            rating_elem = card.find('span', class_=re.compile('address-rate-mini'))
+            rating_elem = card.find('span', class_=SELLER_RATING_CLASS_RE)
             if not rating_elem:
                 # Альтернативный поиск
-                rating_elem = card.find(class_=re.compile('address-rate-mini|product-card__rating|rating'))
+                rating_elem = card.find(class_=RATING_CLASS_RE)
             
             if rating_elem:
                 rating_text = rating_elem.get_text(strip=True)
@@ -232,7 +274,7 @@ class WildberriesScraper:
             reviews_elem = card.find('span', class_='product-card__count')
             if not reviews_elem:
                 # Альтернативный поиск
-                reviews_elem = card.find(class_=re.compile('product-card__count|reviews-count'))
+                reviews_elem = card.find(class_=REVIEWS_CLASS_RE)
             
             if reviews_elem:
                 reviews_text = reviews_elem.get_text(strip=True)
@@ -3,40 +3,62 @@ Selenium скрапер для Яндекс Маркет
 На основе полной документации для парсера Яндекс Маркет
 """
 
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
 import time
 import re
 import logging
-from dataclasses import dataclass
 from typing import List, Optional
 from urllib.parse import quote
 import random
 
-@dataclass
-class Product:
-    title: str
-    price: float
-    old_price: Optional[float] = None
-    url: str = ""
-    source: str = "Яндекс Маркет"
-    availability: str = "unknown"
-    brand: str = ""
-    rating: float = 0.0
-    reviews_count: int = 0
-    image_url: str = ""
-
+from .antibot import BlockedError, check_driver
+from .html_parsing import make_soup
+from .instrumentation import PhaseTimer
+from .product import Product
+from .driver_factory import get_driver_factory
+from .rate_limiter import get_rate_limiter
+from .scroll_controller import ScrollController
+from .selector_stats import get_selector_stats
+from .structured_data import StructuredDataExtractor, merge_products
 
 class YandexMarketScraper:
     """Selenium скрапер для Яндекс Маркет"""
     
+    # Ссылки на товары (считаются уникальные href при прокрутке)
+    CARD_SELECTOR = "a[href*='/product/'], a[href*='/card/']"
+    
+    # Селекторы ссылок и названий; порядок перебора берется из статистики срабатываний
+    LINK_SELECTORS = (
+        "a[href*='/product/']",
+        "a[href*='/card/']",
+        "a[href*='market.yandex.ru/product']",
+        "a[href*='/catalog']",
+        "article a[href*='/product']",
+        "article a[href*='/card']",
+        "[data-zone-name='snippet-card'] a",
+        "[data-zone-name='productSnippet'] a",
+        "[data-zone-name*='snippet'] a",
+        "[data-auto*='snippet'] a",
+    )
+    TITLE_SELECTORS = (
+        "[data-auto='snippet-title']",
+        "[data-auto*='title']",
+        "h3, h4, h2",
+        ".snippet-title",
+        ".product-title",
+        "[class*='title']",
+        "[class*='name']",
+    )
+    
     def __init__(self, headless: bool = True):
         self.headless = headless
         self.driver = None
         self.logger = logging.getLogger(__name__)
+        self.rate_limiter = get_rate_limiter()
+        self.timer = PhaseTimer()  # замеры последнего поиска
+        self.structured_extractor = StructuredDataExtractor('https://market.yandex.ru')
         logging.basicConfig(level=logging.INFO)
     
     def _init_driver(self):
@@ -45,20 +67,9 @@ class YandexMarketScraper:
             return
         
         try:
-            options = uc.ChromeOptions()
-            
-            if self.headless:
-                options.add_argument('--headless=new')
-            
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-gpu')
-            options.add_argument('--window-size=1920,1080')
-            options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-            
-            self.driver = uc.Chrome(options=options)
-            self.driver.set_page_load_timeout(45)  # Увеличен timeout
+            self.driver = get_driver_factory().create(
+                'yandex_market', headless=self.headless, page_load_timeout=45
+            )
             
             self.logger.info("✅ Chrome драйвер инициализирован")
             
@@ -69,9 +80,12 @@ class YandexMarketScraper:
     def search(self, query: str, max_products: int = 20) -> List[Product]:
         """Поиск товаров на Яндекс Маркет"""
         products = []
+        structured = []
+        timer = self.timer = PhaseTimer()
         
         try:
             self._init_driver()
+            timer.lap('driver_init')
             
             # Яндекс Маркет URL
             search_url = f"https://market.yandex.ru/search?text={quote(query)}"
@@ -79,18 +93,32 @@ class YandexMarketScraper:
             self.logger.info(f"🔍 Поиск на Яндекс Маркет: {query}")
             self.logger.info(f"📍 URL: {search_url}")
             
+            self.rate_limiter.acquire(search_url)
+            timer.lap('rate_limit')
             self.driver.get(search_url)
+            get_driver_factory().mark_first_page('yandex_market')
+            timer.lap('navigate')
             
             # Ждем загрузки (Яндекс может показывать капчу)
             time.sleep(random.uniform(4, 6))
-            
-            # Проверяем капчу
-            if "captcha" in self.driver.current_url.lower():
-                self.logger.warning("⚠️ Обнаружена капча. Требуется ручное решение.")
-                time.sleep(10)  # Даем время на решение
-            
+            timer.lap('wait')
+
+            # Капча: не ждем решения - запрос откладывается менеджером
+            check_driver(self.driver, 'yandex_market')
+
+            # Сначала пробуем встроенные JSON-данные (JSON-LD, состояние страницы)
+            structured = self.structured_extractor.extract_products(self.driver, "Яндекс Маркет", max_products, timer)
+            timer.lap('parse')
+            if len(structured) >= max_products:
+                self.logger.info(f"✅ Успешно спарсено из JSON-данных: {len(structured)} товаров")
+                return structured
+            if structured:
+                # Данных меньше, чем нужно - добираем карточки из DOM
+                self.logger.info(f"📦 Из JSON-данных: {len(structured)} товаров, дополняем из DOM")
+
             # Прокручиваем
-            self._scroll_page()
+            self._scroll_page(max_products)
+            timer.lap('scroll')
             
             # Сначала пробуем извлечь через Selenium (более надежно для динамического контента)
             try:
@@ -108,42 +136,33 @@ class YandexMarketScraper:
                     # Если не дождались, продолжаем - возможно элементы уже загружены
                     pass
                 
-                # Ищем ссылки на товары напрямую - пробуем разные варианты
+                # Ищем ссылки на товары напрямую - сначала селекторами, которые чаще срабатывали
+                selector_stats = get_selector_stats()
+                selector_stats.begin_run('yandex_market')
                 link_elements = []
-                selectors = [
-                    "a[href*='/product/']",
-                    "a[href*='/card/']",
-                    "a[href*='market.yandex.ru/product']",
-                    "a[href*='/catalog']",
-                    "article a[href*='/product']",
-                    "article a[href*='/card']",
-                    "[data-zone-name='snippet-card'] a",
-                    "[data-zone-name='productSnippet'] a",
-                    "[data-zone-name*='snippet'] a",
-                    "[data-auto*='snippet'] a"
-                ]
-                
-                for selector in selectors:
-                    try:
-                        found = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                        if found:
-                            link_elements.extend(found)
-                    except:
-                        continue
-                
-                # Убираем дубликаты
                 seen_hrefs = set()
-                unique_links = []
-                for link in link_elements:
+                for selector in selector_stats.rank('yandex_market', 'links', self.LINK_SELECTORS):
+                    # Ссылок сверх max_products * 2 все равно не обрабатываем
+                    if len(link_elements) >= max_products * 2:
+                        break
                     try:
-                        href = link.get_attribute('href')
-                        if href and href not in seen_hrefs and ('/product/' in href or '/card/' in href):
-                            seen_hrefs.add(href)
-                            unique_links.append(link)
+                        found = self.driver.find_elements(By.CSS_SELECTOR, selector)
                     except:
                         continue
-                
-                link_elements = unique_links
+                    
+                    # Учитываем только новые ссылки на товары (без дубликатов)
+                    added = 0
+                    for link in found:
+                        try:
+                            href = link.get_attribute('href')
+                            if href and href not in seen_hrefs and ('/product/' in href or '/card/' in href):
+                                seen_hrefs.add(href)
+                                link_elements.append(link)
+                                added += 1
+                        except:
+                            continue
+                    selector_stats.observe('yandex_market', 'links', selector, added > 0, added)
+                title_selectors = selector_stats.rank('yandex_market', 'title', self.TITLE_SELECTORS)
                 
                 if link_elements:
                     seen_urls = set()
@@ -167,6 +186,7 @@ class YandexMarketScraper:
                             if href in seen_urls:
                                 continue
                             seen_urls.add(href)
+                            timer.count('found')
                             
                             # Пробуем извлечь данные напрямую через Selenium
                             try:
@@ -197,16 +217,7 @@ class YandexMarketScraper:
                                                     parent = link_elem.find_element(By.XPATH, "./ancestor::*[contains(@class, 'card') or contains(@class, 'item')][1]")
                                         
                                         if parent:
-                                            # Пробуем разные селекторы для названия
-                                            title_selectors = [
-                                                "[data-auto='snippet-title']",
-                                                "[data-auto*='title']",
-                                                "h3, h4, h2",
-                                                ".snippet-title",
-                                                ".product-title",
-                                                "[class*='title']",
-                                                "[class*='name']"
-                                            ]
+                                            # Пробуем селекторы названия, начиная с исторически лучшего
                                             for selector in title_selectors:
                                                 try:
                                                     title_elems = parent.find_elements(By.CSS_SELECTOR, selector)
@@ -215,7 +226,9 @@ class YandexMarketScraper:
                                                         if len(elem_text) > 10 and len(elem_text) < 200:
                                                             title = elem_text
                                                             break
-                                                    if title and len(title) > 5:
+                                                    found_title = bool(title and len(title) > 5)
+                                                    selector_stats.observe('yandex_market', 'title', selector, found_title)
+                                                    if found_title:
                                                         break
                                                 except:
                                                     continue
@@ -348,7 +361,7 @@ class YandexMarketScraper:
                                         
                                         if parent:
                                             card_html = parent.get_attribute('outerHTML')
-                                            soup_card = BeautifulSoup(card_html, 'html.parser')
+                                            soup_card = make_soup(card_html)
                                             product = self._parse_product_card(soup_card, href=href)
                                             # ВАЖНО: Проверяем лимит ПЕРЕД добавлением товара
                                             if product and product.price > 0 and len(products) < max_products:
@@ -470,7 +483,7 @@ class YandexMarketScraper:
                                     
                                     if parent:
                                         card_html = parent.get_attribute('outerHTML')
-                                        soup_card = BeautifulSoup(card_html, 'html.parser')
+                                        soup_card = make_soup(card_html)
                                         product = self._parse_product_card(soup_card, href=href)
                                         # ВАЖНО: Проверяем лимит ПЕРЕД добавлением товара
                                         if product and len(products) < max_products:
@@ -488,10 +501,16 @@ class YandexMarketScraper:
                 
             except Exception as e:
                 pass
+            # Ссылки, из которых не получился товар, считаем отклоненными
+            timer.count('parsed', len(products))
+            timer.count('rejected', timer.counters.get('found', 0) - len(products))
+            timer.lap('convert')
             
             # Если через Selenium ничего не нашли или не набрали нужное количество, используем BeautifulSoup (старый метод)
             if len(products) < max_products:
-                soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+                html = self.driver.page_source
+                timer.lap('page_source')
+                soup = make_soup(html)
                 
                 # Яндекс Маркет использует data-zone-name для элементов
                 cards = []
@@ -563,6 +582,8 @@ class YandexMarketScraper:
                 cards = unique_cards
                 
                 self.logger.info(f"📦 Найдено карточек: {len(cards)}")
+                timer.count('found', len(cards))
+                timer.lap('parse')
                 
                 # Обрабатываем карточки до достижения лимита
                 for card in cards:
@@ -575,31 +596,29 @@ class YandexMarketScraper:
                         # ВАЖНО: Проверяем лимит ПЕРЕД добавлением товара
                         if product and len(products) < max_products:
                             products.append(product)
+                            timer.count('parsed')
                             if len(products) >= max_products:
                                 break
+                        else:
+                            timer.count('rejected')
                     except Exception as e:
+                        timer.count('rejected')
                         self.logger.debug(f"Ошибка парсинга карточки: {e}")
                         continue
+                timer.lap('convert')
             
             self.logger.info(f"✅ Успешно спарсено: {len(products)} товаров")
             
+        except BlockedError:
+            raise
         except Exception as e:
             self.logger.error(f"❌ Ошибка поиска: {e}")
         
-        return products
+        return merge_products(structured, products, max_products)
     
-    def _scroll_page(self):
-        """Прокручивает страницу"""
-        try:
-            for i in range(3):
-                self.driver.execute_script(f"window.scrollTo(0, {1000 * (i + 1)});")
-                time.sleep(1.5)
-            
-            self.driver.execute_script("window.scrollTo(0, 500);")
-            time.sleep(1)
-            
-        except Exception as e:
-            pass
+    def _scroll_page(self, max_products: int):
+        """Прокручивает страницу, пока не подгрузится max_products карточек"""
+        ScrollController(self.driver, self.CARD_SELECTOR, unique_href=True).scroll_until(max_products)
     
     def _parse_product_card(self, card, href: str = None) -> Optional[Product]:
         """
@@ -8,6 +8,7 @@ import json
 from datetime import datetime
 from main_system import CompetitiveAnalysisSystem
 from commerceml_parser import CommerceMLParser
+from scrapers.driver_factory import get_driver_factory
 import logging
 from flask_socketio import SocketIO, emit
 
@@ -32,6 +33,9 @@ logger = logging.getLogger(__name__)
 # Глобальная переменная для системы
 analysis_system = None
 
+# Режим браузера: SCRAPER_HEADLESS=0 - Chrome с окном (анализ и фоновый запуск)
+BROWSER_HEADLESS = os.getenv('SCRAPER_HEADLESS', '1').lower() not in ('0', 'false', 'no')
+
 @app.route('/')
 def index():
     """Главная страница"""
@@ -56,13 +60,27 @@ def serve_static(path):
         logger.error(f"Ошибка при загрузке файла {path}: {e}")
         return f"Ошибка сервера: {str(e)}", 500
 
-def emit_progress(stage, message, progress=None):
-    """Отправка прогресса через WebSocket"""
+def emit_progress(stage, message, progress=None, delta=None):
+    """Отправка прогресса через WebSocket (delta - частичный результат для интерфейса)"""
     data = {'stage': stage, 'message': message}
     if progress is not None:
         data['progress'] = progress
+    if delta is not None:
+        data['delta'] = delta
     socketio.emit('progress_update', data)
 
+def make_analysis_sink():
+    """Приемник событий scrape_competitors: каждое событие уходит клиенту отдельной дельтой"""
+    def on_event(event, data):
+        if event == 'site_result':
+            # Парсинг занимает диапазон 20-60% общего прогресса
+            progress = 20 + 40 * data['completed'] / max(data['total'], 1)
+            message = f"{data['site']}: «{data['query']}» - найдено {data['found']} ({data['completed']}/{data['total']})"
+            emit_progress('scraping', message, progress, {'type': event, **data})
+        elif event == 'match':
+            emit_progress('scraping', f"Совпадения для «{data['query']}»: {len(data['matches'])}", None, {'type': event, **data})
+    return on_event
+
 @app.route('/api/upload-xml', methods=['POST'])
 def upload_xml():
     """Загрузка и парсинг XML или Excel файла из 1С"""
@@ -82,9 +100,9 @@ def upload_xml():
         
         # Определяем расширение файла
         file_ext = os.path.splitext(file.filename)[1].lower()
-        if file_ext not in ['.xlsx', '.xls', '.xml']:
+        if file_ext not in ['.xlsx', '.xls', '.xml', '.mxl']:
             emit_progress('error', 'Неподдерживаемый формат файла')
-            return jsonify({'error': 'Поддерживаются только файлы Excel (.xlsx, .xls) и XML'}), 400
+            return jsonify({'error': 'Поддерживаются только файлы 1С (.mxl), Excel (.xlsx, .xls) и XML'}), 400
             
         temp_filename = f'temp_upload{file_ext}'
         temp_path = os.path.join('data', temp_filename)
@@ -97,7 +115,7 @@ def upload_xml():
         file.save(temp_path)
         
         # Создаем новую систему
-        analysis_system = CompetitiveAnalysisSystem()
+        analysis_system = CompetitiveAnalysisSystem(headless=BROWSER_HEADLESS)
         
         # Загружаем файл в зависимости от расширения
         emit_progress('parse', 'Обработка файла...', 30)
@@ -213,6 +231,8 @@ def run_analysis():
         threshold = data.get('threshold', 0.85)
         max_products = data.get('max_products', 5)  # Количество товаров из 1С
         selected_sites = data.get('sites', None)  # Выбранные сайты
+        force_refresh = data.get('force_refresh', False)  # Игнорировать кеш результатов
+        incremental = data.get('incremental', False)  # Обновить весь каталог в пределах бюджета
         
         logger.info(f"Параметры анализа: порог={threshold}, товаров={max_products}, сайты={selected_sites}")
         
@@ -221,10 +241,20 @@ def run_analysis():
         emit_progress('scraping', f'Парсинг {max_products} товаров...', 20)
         
         try:
-            stats = analysis_system.scrape_competitors(
-                sites=selected_sites,
-                max_products_from_1c=max_products
-            )
+            if incremental:
+                stats = analysis_system.refresh_catalog(
+                    sites=selected_sites,
+                    max_requests=data.get('max_requests', 50),
+                    max_seconds=data.get('max_seconds')
+                )
+            else:
+                stats = analysis_system.scrape_competitors(
+                    sites=selected_sites,
+                    max_products_from_1c=max_products,
+                    force_refresh=force_refresh,
+                    on_event=make_analysis_sink(),
+                    match_threshold=threshold
+                )
             logger.info(f"Парсинг завершен: {stats}")
             emit_progress('matching', 'Сопоставление товаров...', 60)
         except Exception as e:
@@ -267,7 +297,8 @@ def run_analysis():
             return jsonify({
                 'success': True,
                 'report': report_data,
-                'report_path': report_path
+                'report_path': report_path,
+                'scrape_stats': analysis_system.last_run_stats
             })
         except Exception as e:
             logger.error(f"Ошибка при генерации отчета: {e}")
@@ -423,6 +454,30 @@ def update_matching_config():
         logger.error(f"Ошибка при обновлении конфигурации: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/price-history', methods=['GET'])
+def price_history():
+    """Траектории цен по товару 1С (product_id), запросу (query) или ссылке (url)"""
+    global analysis_system
+    
+    if not analysis_system or not analysis_system.price_history:
+        return jsonify({'error': 'История цен недоступна'}), 400
+    
+    try:
+        days = float(request.args.get('days', 30))
+        offers = analysis_system.price_history.trajectory(
+            product_id=request.args.get('product_id'),
+            query=request.args.get('query'),
+            url=request.args.get('url'),
+            days=days,
+        )
+        return jsonify({'success': True, 'days': days, 'offers': offers})
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Ошибка при чтении истории цен: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Получение статуса системы"""
@@ -436,13 +491,28 @@ def get_status():
             'matches': 0
         })
     
+    scraper_status = analysis_system.scraper_manager.get_status()
     return jsonify({
         'initialized': True,
         'products_loaded': len(analysis_system.products_1c),
         'scraped_products': len(analysis_system.scraped_products),
-        'matches': len(analysis_system.matches)
+        'matches': len(analysis_system.matches),
+        'scrape_cache': scraper_status['cache'],
+        'rate_limits': scraper_status['rate_limits'],
+        'circuit_breakers': scraper_status['circuit_breakers'],
+        'drivers': scraper_status['drivers'],
+        'scrape_metrics': scraper_status['metrics']
     })
 
+def prelaunch_browsers():
+    """Заранее запускает Chrome для маркетплейсов, чтобы первый анализ не ждал"""
+    if os.getenv('SCRAPER_SHARED_BROWSER', '').lower() in ('1', 'true', 'yes'):
+        return
+    sites = os.getenv('SCRAPER_PRELAUNCH', 'wildberries,ozon,avito,yandex_market')
+    sites = [site.strip() for site in sites.split(',') if site.strip() and site.strip() != '0']
+    if sites:
+        get_driver_factory().prelaunch(sites, headless=BROWSER_HEADLESS)
+
 def cleanup_resources():
     """Очистка ресурсов при завершении сервера"""
     global analysis_system
@@ -451,6 +521,7 @@ def cleanup_resources():
             logger.info('🧹 Закрываем браузеры...')
             analysis_system.scraper_manager.close_all()
             logger.info('✅ Браузеры закрыты')
+        get_driver_factory().close()
     except Exception as e:
         logger.error(f'⚠️ Ошибка при очистке ресурсов: {e}')
 
@@ -497,6 +568,9 @@ if __name__ == '__main__':
             traceback.print_exc()
             exit(1)
         
+        # Chrome для маркетплейсов стартует в фоне, пока сервер ждет первый запрос
+        prelaunch_browsers()
+        
         print('\n🟢 Сервер запускается...\n')
         # Используем use_reloader=False чтобы избежать проблем с перезагрузкой
         socketio.run(